@@ -0,0 +1,2 @@
+# 🧪 性能基准测试
+# Benchmark Suite
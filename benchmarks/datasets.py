@@ -0,0 +1,141 @@
+# 🧪 基准测试数据集 - 按学科形态生成任意规模的合成数据
+# Benchmark Datasets - Synthetic data shaped like data/examples, at any size
+
+"""
+每种形态对应 data/examples 中的一个示例（列名、数据类型、数值规律一致），
+行数与列数可以任意放大：超出示例列数的部分追加为同类测量通道。
+
+    make_dataset("physics", rows=100_000, cols=20)
+"""
+
+from pathlib import Path
+from typing import Callable, Dict
+import numpy as np
+import pandas as pd
+
+
+def _extra_channels(rng: np.random.Generator, base: np.ndarray, count: int,
+                    prefix: str) -> Dict[str, np.ndarray]:
+    """追加与基准列相关的测量通道（线性关系 + 噪声）"""
+    columns = {}
+    for i in range(count):
+        slope = rng.uniform(0.5, 2.0)
+        columns[f"{prefix}{i + 1}"] = base * slope + rng.normal(0, 0.05 * (abs(base).mean() + 1), base.size)
+    return columns
+
+
+def physics(rng: np.random.Generator, rows: int) -> Dict[str, np.ndarray]:
+    """欧姆定律：电压、电流、电阻"""
+    voltage = np.linspace(1.0, 10.0, rows)
+    current = voltage / 50.0 + rng.normal(0, 0.0005, rows)
+    return {"电压(V)": voltage, "电流(A)": current, "电阻(Ω)": voltage / current}
+
+
+def chemistry(rng: np.random.Generator, rows: int) -> Dict[str, np.ndarray]:
+    """滴定：样品编号（文本）、体积、浓度"""
+    return {
+        "样品编号": np.array([f"S{i + 1}" for i in range(rows)], dtype=object),
+        "体积(mL)": rng.normal(25.0, 0.4, rows),
+        "浓度(M)": np.full(rows, 0.100) + rng.normal(0, 0.001, rows),
+    }
+
+
+def biology(rng: np.random.Generator, rows: int) -> Dict[str, np.ndarray]:
+    """细胞增殖：时间、细胞数（指数增长）、死亡数"""
+    hours = np.arange(rows, dtype=float) * 6
+    cells = 10 * np.exp(0.1 * np.minimum(hours, 120)) * rng.lognormal(0, 0.05, rows)
+    return {"时间(h)": hours, "细胞数(×10^4)": cells, "死亡数": rng.poisson(cells * 0.02).astype(float)}
+
+
+def cs_algorithm(rng: np.random.Generator, rows: int) -> Dict[str, np.ndarray]:
+    """排序算法：规模 n、O(n²) 与 O(n log n) 耗时"""
+    n = np.geomspace(100, 1e6, rows)
+    return {
+        "n": n,
+        "冒泡排序(ms)": 4.5e-5 * n ** 2 * rng.lognormal(0, 0.05, rows),
+        "快速排序(ms)": 2e-4 * n * np.log2(n) * rng.lognormal(0, 0.05, rows),
+    }
+
+
+def engineering(rng: np.random.Generator, rows: int) -> Dict[str, np.ndarray]:
+    """材料拉伸：样本编号、应力、应变（线弹性 + 屈服）"""
+    strain = np.linspace(0.1, 5.0, rows)
+    stress = np.where(strain < 2.0, 500 * strain, 1000 + 50 * (strain - 2.0)) + rng.normal(0, 5, rows)
+    return {
+        "样本编号": np.array([f"A{i + 1}" for i in range(rows)], dtype=object),
+        "应力(MPa)": stress,
+        "应变(%)": strain,
+    }
+
+
+def sensors(rng: np.random.Generator, rows: int) -> Dict[str, np.ndarray]:
+    """多通道传感器：等间隔时间 + 正弦通道"""
+    t = np.arange(rows, dtype=float) * 0.01
+    return {"时间(s)": t, "通道1": np.sin(t) + rng.normal(0, 0.05, rows)}
+
+
+SHAPES: Dict[str, Callable[[np.random.Generator, int], Dict[str, np.ndarray]]] = {
+    "physics": physics,
+    "chemistry": chemistry,
+    "biology": biology,
+    "cs_algorithm": cs_algorithm,
+    "engineering": engineering,
+    "sensors": sensors,
+}
+
+# 形态对应的报告模板
+SHAPE_TEMPLATES = {
+    "physics": "physics_basic",
+    "chemistry": "chemistry_basic",
+    "biology": "biology_basic",
+    "cs_algorithm": "cs_algorithm",
+    "engineering": "engineering_basic",
+    "sensors": "physics_basic",
+}
+
+
+def make_dataset(shape: str, rows: int, cols: int = 0, seed: int = 0) -> pd.DataFrame:
+    """生成合成数据集
+
+    Args:
+        shape: 形态名称（见 SHAPES）
+        rows: 行数
+        cols: 总列数；小于该形态的基本列数时截取（至少 2 列），大于时追加通道
+        seed: 随机种子，相同参数生成相同数据
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"未知数据形态: {shape}（可选: {', '.join(SHAPES)}）")
+    rng = np.random.default_rng(seed)
+    columns = SHAPES[shape](rng, rows)
+    if cols:
+        names = list(columns)
+        if cols < len(names):
+            columns = {name: columns[name] for name in names[:max(cols, 2)]}
+        elif cols > len(names):
+            numeric = [v for v in columns.values() if v.dtype.kind == 'f']
+            columns.update(_extra_channels(rng, numeric[-1], cols - len(names), "测量"))
+    return pd.DataFrame(columns)
+
+
+def dataset_width(shape: str, cols: int = 0) -> int:
+    """make_dataset(shape, rows, cols) 的实际列数（只生成一行）"""
+    base = len(SHAPES[shape](np.random.default_rng(0), 1))
+    if not cols:
+        return base
+    return max(cols, 2) if cols < base else cols
+
+
+def write_dataset(data: pd.DataFrame, path: str) -> str:
+    """按扩展名写入 CSV / XLSX / JSON"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    ext = target.suffix.lower()
+    if ext == '.csv':
+        data.to_csv(target, index=False)
+    elif ext == '.xlsx':
+        data.to_excel(target, index=False)
+    elif ext == '.json':
+        data.to_json(target, orient='records', force_ascii=False)
+    else:
+        raise ValueError(f"不支持格式: {ext}")
+    return str(target)
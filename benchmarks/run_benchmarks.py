@@ -0,0 +1,508 @@
+# 🧪 性能基准测试 - 报告生成热点路径计时 / 基线对比
+# Benchmark Suite - Timing report generation hot paths against baselines
+
+"""
+用合成数据（见 datasets.py）对加载、统计摘要、数据验证、各图表方法、
+HTML / Markdown / Word / PDF 生成以及批量吞吐量计时；另在新解释器中
+测量启动耗时（cli.py --help 预算 300ms，超出时列出最慢的导入）。
+
+每个用例先运行一次预热（记为 first，即冷启动耗时），再重复运行取中位数。
+结果写入 JSON，可保存为基线，之后的运行与基线逐项对比：
+
+    python benchmarks/run_benchmarks.py --preset quick --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --preset quick --compare benchmarks/baseline.json
+
+只运行部分用例：
+
+    python benchmarks/run_benchmarks.py --cases "chart.*" --shapes sensors --rows 1000000
+
+基线与运行环境（CPU、库版本）相关，应在同一台机器上对比。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import warnings
+import contextlib
+import platform
+import statistics
+import subprocess
+import tempfile
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+
+# 通过包名导入，避免与 HuggingFace 的 datasets 包重名
+from benchmarks.datasets import SHAPES, SHAPE_TEMPLATES, dataset_width, make_dataset, write_dataset
+
+
+# 预设：(形态, 行数, 列数)，列数 0 表示该形态的原始列数
+PRESETS = {
+    "quick": {
+        "shapes": ["physics", "chemistry", "sensors"],
+        "rows": [10, 1_000, 100_000],
+        "cols": [0, 20],
+    },
+    "full": {
+        "shapes": list(SHAPES),
+        "rows": [10, 1_000, 100_000, 1_000_000, 10_000_000],
+        "cols": [2, 20, 200],
+    },
+}
+DEFAULT_MAX_CELLS = 20_000_000
+
+
+@dataclass
+class Scenario:
+    """一组基准数据"""
+    shape: str
+    rows: int
+    cols: int
+    data: pd.DataFrame
+    csv_path: str
+    workdir: Path
+    state: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"{self.shape}/{self.rows}x{self.data.shape[1]}"
+
+    @property
+    def template(self) -> str:
+        return SHAPE_TEMPLATES[self.shape]
+
+    @property
+    def numeric(self) -> List[str]:
+        return self.data.select_dtypes(include='number').columns.tolist()
+
+
+# 用例：接收场景，完成准备工作后返回待计时的无参函数；返回 None 表示不适用
+
+def case_load_parse(s: Scenario):
+    from src.generators.data_cache import read_data_file
+    return lambda: read_data_file(s.csv_path)
+
+
+def case_load_cached(s: Scenario):
+    from src.generators.data_cache import DataCache
+    cache = DataCache(cache_dir=str(s.workdir / "cache"))
+    return lambda: cache.load(s.csv_path)
+
+
+def case_summarize(s: Scenario):
+    from src.generators.report_generator import ReportGenerator
+    return lambda: ReportGenerator(s.template).summarize_data(s.data)
+
+
+def case_validate(s: Scenario):
+    from src.generators.pdf_generator import DataValidator
+    return lambda: DataValidator().validate(s.data)
+
+
+def case_recommend(s: Scenario):
+    from src.generators.data_profile import recommend_charts
+    return lambda: recommend_charts(s.data)
+
+
+def _chart_case(chart_type: str):
+    def case(s: Scenario):
+        from src.generators.chart_generator import ChartGenerator, ChartConfig
+        if len(s.numeric) < 2:
+            return None
+        x, y = s.numeric[0], s.numeric[1]
+        return lambda: ChartGenerator(s.data).generate(x, [y], ChartConfig(chart_type=chart_type))
+    return case
+
+
+def case_chart_grid(s: Scenario):
+    from src.generators.chart_generator import ChartGenerator, ChartConfig
+    if len(s.numeric) < 3:
+        return None
+    x, ys = s.numeric[0], s.numeric[1:9]
+    return lambda: ChartGenerator(s.data).generate(x, ys, ChartConfig(layout="grid"))
+
+
+def case_fit_regressions(s: Scenario):
+    from src.generators.chart_generator import ChartGenerator
+    if len(s.numeric) < 2:
+        return None
+    x, ys = s.numeric[0], s.numeric[1:]
+    return lambda: ChartGenerator(s.data).fit_regressions(x, ys)
+
+
+def case_regression(s: Scenario):
+    from src.generators.chart_generator import ChartGenerator
+    if len(s.numeric) < 2:
+        return None
+    x, y = s.numeric[0], s.numeric[1]
+    return lambda: ChartGenerator(s.data).generate_regression(x, y)
+
+
+def case_weighted_regression(s: Scenario):
+    from src.generators.chart_generator import ChartGenerator
+    if len(s.numeric) < 2:
+        return None
+    x, y = s.numeric[0], s.numeric[1]
+    return lambda: ChartGenerator(s.data).generate_weighted_regression(x, y)
+
+
+def case_error_analysis(s: Scenario):
+    from src.generators.chart_generator import ChartGenerator
+    if len(s.numeric) < 2:
+        return None
+    x, y = s.numeric[0], s.numeric[1]
+    return lambda: ChartGenerator(s.data).generate_error_analysis(x, y)
+
+
+def _prepared_report(s: Scenario):
+    """渲染用的报告生成器（图表只生成一次，供各输出格式共用）"""
+    if "report" not in s.state:
+        from src.generators.report_generator import ReportGenerator
+        gen = ReportGenerator(s.template)
+        gen.summarize_data(s.data)
+        gen.add_recommended_charts(s.data)
+        s.state["report"] = gen
+        s.state["html"] = gen.generate_report("基准测试", "bench", "bench", s.data)
+    return s.state["report"], s.state["html"]
+
+
+def case_html(s: Scenario):
+    gen, _ = _prepared_report(s)
+    return lambda: gen.generate_report("基准测试", "bench", "bench", s.data)
+
+
+def case_markdown(s: Scenario):
+    gen, html = _prepared_report(s)
+    path = str(s.workdir / "report.md")
+    return lambda: gen.save_markdown(html, path)
+
+
+def case_docx(s: Scenario):
+    from src.generators.word_generator import WordReportGenerator
+    from src.generators.data_profile import recommend_charts
+    configs = recommend_charts(s.data)
+    path = str(s.workdir / "report.docx")
+
+    def run():
+        gen = WordReportGenerator(s.template)
+        gen.add_chart_specs(s.data, configs)
+        gen.generate_report(title="基准测试", author="bench", group="bench", data_summary={})
+        gen.save(path)
+    return run
+
+
+def case_pdf(s: Scenario):
+    from src.generators.pdf_generator import PDFGenerator
+    generator = PDFGenerator()
+    if generator.engine == "html":
+        return None
+    _, html = _prepared_report(s)
+    path = str(s.workdir / "report.pdf")
+    return lambda: generator.generate_from_html(html, path)
+
+
+def case_template_fill(s: Scenario):
+    """用户模板填充：每行数据填一份（最多 1 万份，模拟全班提交）"""
+    from src.generators.template_engine import TemplateEngine
+    engine = TemplateEngine()
+    template = engine.load_template(str(PROJECT_ROOT / "templates" / "custom_template.md"))
+    records = s.data.head(10_000).astype(str).to_dict("records")
+    return lambda: [engine.fill_template(template, {"title": s.shape, **row}) for row in records]
+
+
+CASES: Dict[str, Callable[[Scenario], Optional[Callable[[], Any]]]] = {
+    "load.parse": case_load_parse,
+    "load.cached": case_load_cached,
+    "summarize": case_summarize,
+    "validate": case_validate,
+    "recommend": case_recommend,
+    "chart.line": _chart_case("line"),
+    "chart.scatter": _chart_case("scatter"),
+    "chart.bar": _chart_case("bar"),
+    "chart.histogram": _chart_case("histogram"),
+    "chart.grid": case_chart_grid,
+    "chart.fit_regressions": case_fit_regressions,
+    "chart.regression": case_regression,
+    "chart.weighted_regression": case_weighted_regression,
+    "chart.error_analysis": case_error_analysis,
+    "report.html": case_html,
+    "report.markdown": case_markdown,
+    "report.docx": case_docx,
+    "report.pdf": case_pdf,
+    "template.fill": case_template_fill,
+}
+
+
+def measure(fn: Callable[[], Any], repeat: int, budget: float) -> Dict[str, float]:
+    """预热一次后重复计时；总时间超过预算时减少重复次数（生成器的输出被静默）"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        fn()
+        first = time.perf_counter() - start
+        runs = repeat if first * repeat <= budget else max(1, int(budget / max(first, 1e-9)))
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "runs": len(samples),
+        "first": first,
+    }
+
+
+def bench_batch(shape: str, rows: int, files: int, jobs: int, workdir: Path) -> Dict[str, float]:
+    """批量吞吐量：files 个同形态文件，输出 HTML + Word"""
+    from src.generators.batch_processor import BatchReportGenerator, BatchTask
+
+    tasks = []
+    for i in range(files):
+        path = write_dataset(make_dataset(shape, rows, seed=i), str(workdir / "batch_in" / f"{shape}_{i}.csv"))
+        tasks.append(BatchTask(data_path=path, title=f"{shape}_{i}", template=SHAPE_TEMPLATES[shape],
+                               output_format="html,docx"))
+    batch = BatchReportGenerator(str(workdir / "batch_out"), incremental=False)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = batch.process_batch(tasks, parallel=jobs != 1, max_workers=jobs or None,
+                                      use_processes=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "median": elapsed,
+        "runs": 1,
+        "tasks": files,
+        "failed": sum(1 for r in results if not r.success),
+        "tasks_per_s": files / elapsed if elapsed else 0.0,
+    }
+
+
+# 启动耗时：短命令行调用应远低于预算
+STARTUP_BUDGET = 0.3
+STARTUP_COMMANDS = {
+    "startup.interpreter": ["-c", "pass"],
+    "startup.cli_help": ["cli.py", "--help"],
+    "startup.import_src": ["-c", "import src"],
+    "startup.import_report_generator": ["-c", "from src.generators.report_generator import ReportGenerator"],
+}
+
+
+def bench_startup(args: List[str], repeat: int, budget: float) -> Dict[str, float]:
+    """在新解释器中运行命令并计时（包含解释器自身启动）"""
+    command = [sys.executable] + args
+    return measure(lambda: subprocess.run(command, cwd=PROJECT_ROOT, check=True,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+                   repeat, budget)
+
+
+def slowest_imports(args: List[str], top: int = 8) -> List[tuple]:
+    """用 -X importtime 找出累计导入耗时最多的顶层模块"""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=PROJECT_ROOT,
+                          capture_output=True, text=True)
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("   "):
+            modules.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(modules, key=lambda m: -m[1])[:top]
+
+
+def environment() -> Dict[str, Any]:
+    """记录运行环境，便于判断结果是否可比"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "commit": commit,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float, min_delta: float) -> List[Dict[str, Any]]:
+    """逐项与基线对比中位数
+
+    变慢超过 threshold（比例）且绝对差超过 min_delta 秒记为 regression，
+    同样幅度变快记为 improved。
+    """
+    rows = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        ratio = current["median"] / base["median"] if base["median"] else float("inf")
+        delta = current["median"] - base["median"]
+        status = "ok"
+        if abs(delta) >= min_delta:
+            if ratio > 1 + threshold:
+                status = "regression"
+            elif ratio < 1 / (1 + threshold):
+                status = "improved"
+        rows.append({"key": key, "baseline": base["median"], "current": current["median"],
+                     "ratio": ratio, "status": status})
+    return rows
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+def parse_list(text: str, cast=str) -> List:
+    """逗号分隔列表；整数允许下划线分组（1_000_000）"""
+    items = [item.strip() for item in text.split(',') if item.strip()]
+    return [int(item.replace('_', '')) for item in items] if cast is int else items
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="🧪 报告生成性能基准测试")
+    parser.add_argument('--preset', choices=list(PRESETS), default='quick', help='预设规模（默认: quick）')
+    parser.add_argument('--shapes', default='', help=f'数据形态，逗号分隔: {",".join(SHAPES)}')
+    parser.add_argument('--rows', default='', help='行数，逗号分隔（如 10,1000,1_000_000）')
+    parser.add_argument('--cols', default='', help='列数，逗号分隔；0 表示原始列数')
+    parser.add_argument('--cases', default='*', help='要运行的用例（glob，逗号分隔，如 "chart.*,report.html"）')
+    parser.add_argument('--max-cells', type=int, default=DEFAULT_MAX_CELLS, help='跳过行数×列数超过该值的组合')
+    parser.add_argument('--repeat', type=int, default=5, help='每个用例重复次数（默认: 5）')
+    parser.add_argument('--budget', type=float, default=5.0, help='每个用例的计时预算（秒），超出时减少重复')
+    parser.add_argument('--batch-files', type=int, default=8, help='批量吞吐量测试的文件数（0 跳过）')
+    parser.add_argument('--batch-rows', type=int, default=10_000, help='批量测试只在行数不超过该值时运行')
+    parser.add_argument('--jobs', type=int, default=0, help='批量测试并发进程数（默认自动）')
+    parser.add_argument('--output', '-o', default='', help='结果 JSON 路径（默认 output/benchmarks/bench-<时间>.json）')
+    parser.add_argument('--save-baseline', default='', help='同时把结果保存为基线')
+    parser.add_argument('--compare', default='', help='与基线 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定变慢的比例阈值（默认: 0.2）')
+    parser.add_argument('--min-delta', type=float, default=0.002, help='忽略小于该秒数的差异（默认: 0.002）')
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET,
+                        help='cli.py --help 启动耗时预算（秒，默认: 0.3）')
+    parser.add_argument('--fail-on-regression', action='store_true', help='存在性能退化时返回非零退出码')
+    args = parser.parse_args(argv)
+    
+    # 缺字体等绘图警告与计时无关
+    warnings.filterwarnings("ignore", category=UserWarning)
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    preset = PRESETS[args.preset]
+    shapes = parse_list(args.shapes) or preset["shapes"]
+    rows_list = parse_list(args.rows, int) or preset["rows"]
+    cols_list = parse_list(args.cols, int) or preset["cols"]
+    patterns = parse_list(args.cases)
+    cases = {name: case for name, case in CASES.items() if any(fnmatch(name, p) for p in patterns)}
+
+    results: Dict[str, Dict[str, float]] = {}
+    over_budget = False
+    startup = {name: cmd for name, cmd in STARTUP_COMMANDS.items() if any(fnmatch(name, p) for p in patterns)}
+    if startup:
+        print("\n🚀 启动耗时")
+        for name, command in startup.items():
+            stats = bench_startup(command, args.repeat, args.budget)
+            results[name] = stats
+            print(f"   {name:<34} {format_seconds(stats['median']):>10}  (min {format_seconds(stats['min'])})")
+        cli = results.get("startup.cli_help")
+        if cli and cli["median"] > args.startup_budget:
+            over_budget = True
+            print(f"   ❌ cli.py --help 超出 {format_seconds(args.startup_budget)} 预算，导入耗时最多的模块:")
+            for module, seconds in slowest_imports(STARTUP_COMMANDS["startup.cli_help"]):
+                print(f"      {module:<40} {format_seconds(seconds):>10}")
+    
+    with tempfile.TemporaryDirectory(prefix="smart-lab-bench-") as tmp:
+        root = Path(tmp)
+        # 不污染用户的数据缓存
+        os.environ["SMART_LAB_CACHE_DIR"] = str(root / "data-cache")
+
+        run_batch = args.batch_files and any(fnmatch("batch.throughput", p) for p in patterns)
+        for shape in (shapes if cases or run_batch else []):
+            for rows in rows_list:
+                for cols in (cols_list if cases else []):
+                    if rows * dataset_width(shape, cols) > args.max_cells:
+                        print(f"⏭️ {shape}/{rows}x{cols}: 超过 --max-cells，跳过")
+                        continue
+                    workdir = root / f"{shape}_{rows}_{cols}"
+                    data = make_dataset(shape, rows, cols)
+                    csv_path = write_dataset(data, str(workdir / "data.csv"))
+                    scenario = Scenario(shape, rows, cols, data, csv_path, workdir)
+                    print(f"\n📊 {scenario.key}")
+                    for name, case in cases.items():
+                        key = f"{name}|{scenario.key}"
+                        if key in results:
+                            continue
+                        fn = case(scenario)
+                        if fn is None:
+                            continue
+                        stats = measure(fn, args.repeat, args.budget)
+                        results[key] = stats
+                        print(f"   {name:<28} {format_seconds(stats['median']):>10}  "
+                              f"(min {format_seconds(stats['min'])}, {stats['runs']} 次)")
+
+                if run_batch and rows <= args.batch_rows:
+                    key = f"batch.throughput|{shape}/{rows}x{args.batch_files}"
+                    stats = bench_batch(shape, rows, args.batch_files, args.jobs, root / f"batch_{shape}_{rows}")
+                    results[key] = stats
+                    print(f"   {'batch.throughput':<28} {stats['tasks_per_s']:>8.2f} 个/s "
+                          f"({args.batch_files} 个文件, {format_seconds(stats['median'])})")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "args": vars(args),
+        "results": results,
+        "startup_budget": {"limit": args.startup_budget, "exceeded": over_budget},
+    }
+    output = Path(args.output or PROJECT_ROOT / "output" / "benchmarks" / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding='utf-8')
+    print(f"\n💾 结果已保存: {output}")
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding='utf-8')
+        print(f"📌 基线已保存: {args.save_baseline}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        if baseline.get("environment", {}).get("cpu_count") != os.cpu_count():
+            print("⚠️ 基线来自不同 CPU 配置的机器，对比结果仅供参考")
+        rows = compare(results, baseline.get("results", {}), args.threshold, args.min_delta)
+        icons = {"ok": "  ", "regression": "🔺", "improved": "🟢"}
+        print(f"\n📈 与基线对比 ({args.compare}):")
+        for row in sorted(rows, key=lambda r: -r["ratio"]):
+            print(f"   {icons[row['status']]} {row['key']:<50} {format_seconds(row['baseline']):>10} → "
+                  f"{format_seconds(row['current']):>10}  ×{row['ratio']:.2f}")
+        regressions = [r for r in rows if r["status"] == "regression"]
+        print(f"\n   退化 {len(regressions)} 项，改善 {sum(r['status'] == 'improved' for r in rows)} 项，"
+              f"共对比 {len(rows)} 项")
+        if regressions and args.fail_on_regression:
+            return 1
+    if over_budget and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,28 +13,61 @@ from datetime import datetime
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.generators.report_generator import ReportGenerator
-from src.generators.chart_generator import ChartGenerator, ChartConfig
+# 生成器（pandas / matplotlib）在解析参数后才导入，--help 等命令可以立即返回
 
-def setup_chinese_font():
-    """设置中文字体支持"""
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
+def setup_chinese_font(font: str = ""):
+    """设置中文字体支持（查找结果缓存，matplotlib 在首次绘图时才加载）
     
-    # 尝试设置中文字体
-    fonts = [
-        'SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei',
-        'Noto Sans CJK SC', 'DejaVu Sans'
-    ]
+    --font 同时写入环境变量 SMART_LAB_FONT，子进程（批量任务、渲染进程池、
+    HTTP 服务的工作进程，Windows 上均为 spawn 启动）继承同一设置。
+    """
+    from src.generators.fonts import configure_font, resolve_font
     
-    for font in fonts:
-        try:
-            plt.rcParams['font.sans-serif'] = [font]
-            plt.rcParams['axes.unicode_minus'] = False
-            break
-        except:
-            continue
+    if font:
+        if os.path.isfile(font):
+            font = os.path.abspath(font)
+        os.environ["SMART_LAB_FONT"] = font
+        configure_font(font)
+    return resolve_font()
+
+def submit_to_server(args, parser) -> int:
+    """把单文件任务提交给常驻服务，或停止服务"""
+    from src.generators.report_daemon import DaemonClient, DaemonError, DaemonUnavailable, parse_address
+    
+    client = DaemonClient(parse_address(args.address) if args.address else None)
+    try:
+        if args.stop_server:
+            client.shutdown()
+            print("👋 已通知报告服务停止")
+            return 0
+        if not args.data:
+            parser.error("--submit 需要 --data")
+        output = Path(args.output)
+        result = client.submit({
+            "data_path": args.data,
+            "title": args.title or Path(args.data).stem,
+            "author": args.author,
+            "group": args.group,
+            "template": args.template,
+            "output_format": args.formats,
+            "ai_analysis": args.ai,
+            "output_dir": str(output.parent),
+            "output_name": output.stem,
+        })
+    except DaemonError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        if isinstance(e, DaemonUnavailable) and not args.stop_server:
+            print("   先启动服务: python cli.py --serve", file=sys.stderr)
+        return 1
+    
+    if not result["success"]:
+        print(f"❌ 生成失败: {result['error']}", file=sys.stderr)
+        return 1
+    for path in result["output_files"]:
+        print(path if args.quiet else f"✅ {path}")
+    if not args.quiet:
+        print(f"⏱️ 服务端耗时 {result['duration']:.2f}s")
+    return 0
 
 def main():
     parser = argparse.ArgumentParser(
@@ -54,6 +87,27 @@ def main():
                 --x "电压" --y "电流" \\
                 --chart-type scatter \\
                 --title "实验报告"
+                
+  # 多通道数据：一张子图网格
+  python cli.py --data sensors.csv \\
+                --x "时间" --y "通道1,通道2,通道3,通道4" \\
+                --layout grid
+                
+  # 批量：递归扫描，4 进程并行，输出 HTML 和 Word
+  python cli.py --batch --dir data/ -r --jobs 4 --formats html,docx
+  
+  # 批量：单个任务最多 5 分钟、2GB 内存
+  python cli.py --batch --timeout 300 --max-memory 2048
+  
+  # 剖析单次生成，输出 Chrome trace（chrome://tracing 或 Perfetto 打开）
+  python cli.py --data data.csv --title "实验报告" --profile chrome
+  
+  # 常驻服务：启动一次，之后每次提交只需毫秒级开销
+  python cli.py --serve &
+  python cli.py --submit --data data.csv --title "实验报告" -o output/report.html
+  
+  # HTTP 服务：多名学生并发提交，4 个工作进程
+  python cli.py --http --port 8000 --jobs 4
         """
     )
     
@@ -74,11 +128,13 @@ def main():
     
     # 图表参数
     parser.add_argument('--x', '-x', default='', help='X轴列名')
-    parser.add_argument('--y', '-y', default='', help='Y轴列名')
+    parser.add_argument('--y', '-y', default='', help='Y轴列名（多列用逗号分隔）')
     parser.add_argument('--chart-type', '-c', 
-                       default='scatter',
+                       default=None,
                        choices=['line', 'scatter', 'bar', 'histogram'],
-                       help='图表类型')
+                       help='图表类型（默认：指定列时为 scatter，否则自动推荐）')
+    parser.add_argument('--layout', default='single', choices=['single', 'grid'],
+                       help='多个 Y 列时的布局：single 同一坐标系 / grid 子图网格')
     parser.add_argument('--chart-title', default='', help='图表标题')
     parser.add_argument('--no-chart', action='store_true', help='不生成图表')
     
@@ -93,99 +149,172 @@ def main():
     parser.add_argument('--conclusion', default='', help='实验结论')
     parser.add_argument('--error-analysis', default='', help='误差分析')
     parser.add_argument('--quiet', '-q', action='store_true', help='安静模式（减少输出）')
+    parser.add_argument('--clear-cache', action='store_true', help='清空数据解析缓存')
+    parser.add_argument('--font', default='', help='图表中文字体：字体文件路径或字体名（默认自动查找并缓存）')
+    
+    # AI 分析参数
+    parser.add_argument('--ai', action='store_true', help='使用 AI 分析数据并生成结论（流式输出）')
+    parser.add_argument('--ai-provider', default='openai',
+                       choices=['openai', 'claude', 'qwen', 'zhipu', 'baidu', 'local'],
+                       help='AI 提供商（默认: openai）')
+    parser.add_argument('--ai-model', default='', help='AI 模型名称（默认按提供商选择）')
     
     # 批量处理参数
     parser.add_argument('--batch', '-b', action='store_true', help='批量处理模式：处理目录下所有数据文件')
     parser.add_argument('--dir', '-D', default='data/examples', help='批量处理时扫描的目录（默认: data/examples）')
     parser.add_argument('--output-dir', '-O', default='output/batch', help='批量处理时输出目录（默认: output/batch）')
+    parser.add_argument('--force', action='store_true', help='批量处理时忽略增量清单，全部重新生成')
+    parser.add_argument('--jobs', '-j', type=int, default=0, help='批量处理并行进程数（默认: 按 CPU 与可用内存自动确定）')
+    parser.add_argument('--timeout', type=float, default=None, help='批量处理单个任务的超时时间（秒），超时终止')
+    parser.add_argument('--max-memory', type=int, default=None, help='批量处理单个任务的常驻内存上限（MB），超限即终止该任务')
+    parser.add_argument('--formats', default='html,md', help='批量输出格式，逗号分隔: html,docx,pdf,md（默认: html,md）')
+    parser.add_argument('--recursive', '-r', action='store_true', help='递归扫描子目录（输出镜像目录结构）')
+    parser.add_argument('--include', default='*.csv,*.xlsx,*.json', help='包含的文件模式，逗号分隔')
+    parser.add_argument('--exclude', default='', help='排除的文件模式，逗号分隔（匹配相对路径或文件名）')
+    parser.add_argument('--resume', action='store_true', help='继续上次中断的批量运行')
+    parser.add_argument('--retry-failed', action='store_true', help='只重试上次失败的任务（failed_tasks.json）')
+    
+    # 常驻服务
+    parser.add_argument('--serve', action='store_true', help='启动常驻报告服务（预热模块，通过本地套接字接收 JSON 任务）')
+    parser.add_argument('--submit', action='store_true', help='把单文件任务提交给常驻服务（输出格式取 --formats）')
+    parser.add_argument('--stop-server', action='store_true', help='停止常驻报告服务')
+    parser.add_argument('--http', action='store_true', help='启动 HTTP 报告服务（任务队列 + 进程池，并发数取 --jobs）')
+    parser.add_argument('--host', default='127.0.0.1', help='HTTP 服务监听地址（默认: 127.0.0.1）')
+    parser.add_argument('--port', type=int, default=8000, help='HTTP 服务端口（默认: 8000）')
+    parser.add_argument('--max-upload', type=float, default=100, help='HTTP 服务单个上传文件上限（MB，默认: 100）')
+    parser.add_argument('--upload-ttl', type=float, default=24, help='HTTP 服务未被引用的上传文件保留时长（小时，默认: 24）')
+    parser.add_argument('--output-root', default='', help='常驻服务允许写入的根目录，提交的输出路径须在其中（默认: 启动时的当前目录）')
+    parser.add_argument('--address', default='', help='常驻服务地址：套接字路径或 host:port（默认 ~/.cache/smart-lab-report/daemon.sock）')
+    
+    # 性能剖析
+    parser.add_argument('--profile', choices=['cprofile', 'chrome', 'otel'],
+                        help='剖析本次运行: cProfile 统计 / Chrome trace JSON / OpenTelemetry span 文件')
+    parser.add_argument('--profile-output', default='', help='剖析结果输出路径（默认 output/profile-<时间>.*）')
     
     args = parser.parse_args()
     
+    # 性能剖析：整个运行期间启用
+    if args.profile:
+        from src.generators.profiling import profile_run
+        with profile_run(args.profile, args.profile_output or None):
+            return run(args, parser)
+    return run(args, parser)
+
+
+def run(args, parser) -> int:
+    """执行解析后的命令"""
+    # 常驻服务客户端：不导入任何生成模块
+    if args.submit or args.stop_server:
+        return submit_to_server(args, parser)
+    
+    # 清空数据解析缓存
+    if args.clear_cache:
+        from src.generators.data_cache import get_data_cache
+        cache = get_data_cache()
+        removed = cache.clear()
+        print(f"🧹 已清空数据缓存: {removed} 个文件 ({cache.cache_dir})")
+        if not args.batch and not args.data:
+            sys.exit(0)
+    
     # 设置中文字体
-    setup_chinese_font()
+    setup_chinese_font(args.font)
+    
+    # 常驻服务
+    if args.serve:
+        from src.generators.report_daemon import ReportDaemon, DaemonError, parse_address
+        
+        daemon = ReportDaemon(parse_address(args.address) if args.address else None,
+                              output_dir=args.output_dir, output_root=args.output_root or None,
+                              quiet=args.quiet)
+        try:
+            daemon.serve_forever()
+        except DaemonError as e:
+            print(f"❌ {e}")
+            return 1
+        return 0
+    
+    # HTTP 服务
+    if args.http:
+        from src.generators.report_service import ReportService
+        
+        ReportService(args.host, args.port, workers=args.jobs or None,
+                      max_upload_mb=args.max_upload, upload_ttl=args.upload_ttl * 3600,
+                      quiet=args.quiet).run()
+        return 0
     
     # 批量处理模式
     if args.batch:
-        from pathlib import Path
-        import glob
+        from src.generators.batch_processor import BatchReportGenerator, tasks_from_directory, parse_formats
         
         print("📦 批量处理模式启动")
         print("=" * 50)
         
         input_dir = Path(args.dir)
         output_dir = Path(args.output_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 查找数据文件
-        data_files = list(input_dir.glob('*.csv')) + list(input_dir.glob('*.xlsx')) + list(input_dir.glob('*.json'))
-        
-        if not data_files:
-            print(f"❌ 目录中没有找到数据文件: {input_dir}")
+        try:
+            parse_formats(args.formats)
+        except ValueError as e:
+            print(f"❌ {e}")
             sys.exit(1)
         
-        print(f"📂 扫描目录: {input_dir}")
-        print(f"📄 找到 {len(data_files)} 个数据文件")
+        batch = BatchReportGenerator(str(output_dir))
+        if args.retry_failed:
+            tasks = batch.load_failed_tasks()
+            if not tasks:
+                print(f"✅ 没有需要重试的失败任务: {output_dir / batch.journal.DEAD_LETTER_FILE}")
+                sys.exit(0)
+            print(f"🔁 重试 {len(tasks)} 个失败任务")
+        else:
+            # 查找数据文件
+            tasks = tasks_from_directory(
+                str(input_dir),
+                patterns=[p.strip() for p in args.include.split(',') if p.strip()],
+                exclude=[p.strip() for p in args.exclude.split(',') if p.strip()],
+                recursive=args.recursive,
+                template=args.template,
+                author=args.author or "批量生成",
+                group=args.group or "批量处理",
+                output_format=args.formats,
+            )
+            if not tasks:
+                print(f"❌ 目录中没有找到数据文件: {input_dir}")
+                sys.exit(1)
+            print(f"📂 扫描目录: {input_dir}{'（递归）' if args.recursive else ''}")
+            print(f"📄 找到 {len(tasks)} 个数据文件")
+        print(f"⚙️ 并行进程: {args.jobs or '自动'}  输出格式: {args.formats}")
         print("=" * 50)
         
-        success = 0
-        failed = 0
-        
-        for filepath in data_files:
-            print(f"\n📄 处理: {filepath.name}")
-            
-            try:
-                # 自动匹配模板
-                name = filepath.name.lower()
-                if '欧姆' in name or '电压' in name or '物理' in name:
-                    template = 'physics_basic'
-                elif '滴定' in name or '化学' in name:
-                    template = 'chemistry_basic'
-                elif '细胞' in name or '生物' in name:
-                    template = 'biology_basic'
-                elif '算法' in name or '计算机' in name:
-                    template = 'cs_algorithm'
-                elif '材料' in name or '工程' in name:
-                    template = 'engineering_basic'
-                else:
-                    template = args.template
-                
-                # 生成报告
-                generator = ReportGenerator(template)
-                data = generator.load_data(str(filepath))
-                generator.summarize_data(data)
-                
-                # 自动选择图表列
-                numeric_cols = data.select_dtypes(include=['number']).columns.tolist()
-                if len(numeric_cols) >= 2:
-                    chart_config = ChartConfig(
-                        title=f"{numeric_cols[1]} vs {numeric_cols[0]}",
-                        chart_type='scatter'
-                    )
-                    generator.add_chart(data, numeric_cols[0], numeric_cols[1], chart_config)
-                
-                report = generator.generate_report(
-                    title=filepath.stem,
-                    author=args.author or "批量生成",
-                    group=args.group or "批量处理",
-                    data=data
-                )
-                
-                output_path = output_dir / f"{filepath.stem}.html"
-                generator.save_report(report, str(output_path))
-                
-                print(f"   ✅ {filepath.name} → {output_path.name}")
-                success += 1
-                
-            except Exception as e:
-                print(f"   ❌ 处理失败: {e}")
-                failed += 1
+        # 剖析时默认在本进程内运行，保证各任务的 span 被记录
+        in_process = bool(args.profile) and args.jobs in (0, 1)
+        batch.process_batch(
+            tasks,
+            parallel=args.jobs != 1 and not in_process,
+            max_workers=args.jobs or None,
+            use_processes=not in_process,
+            timeout=args.timeout,
+            memory_limit_mb=args.max_memory,
+            force=args.force or args.retry_failed,
+            resume=args.resume,
+            progress=not args.quiet,
+        )
+        batch_report = batch.generate_report()
+        summary = batch_report["summary"]
         
         print("\n" + "=" * 50)
-        print(f"📊 批量处理完成!")
-        print(f"   ✅ 成功: {success}")
-        print(f"   ❌ 失败: {failed}")
+        print(f"📊 批量处理完成! 用时 {summary['total_time']}")
+        print(f"   ✅ 成功: {summary['success'] - summary['skipped']}")
+        print(f"   ⏭️ 跳过（未变化）: {summary['skipped']}")
+        print(f"   ❌ 失败: {summary['failed']}")
+        stages = sorted(batch_report["stages"].items(), key=lambda item: -item[1]["total"])
+        if stages:
+            print("   ⏱️ 耗时分布: " + "  ".join(
+                f"{name} {stage['share']:.0%} (p95 {stage['p95']:.2f}s)" for name, stage in stages[:4]))
+            print(f"   🧠 峰值内存: {summary['peak_rss_mb']:.0f} MB")
+            print(f"   📈 指标: {batch.metrics_files['json']}")
+        if summary['failed']:
+            print(f"   📝 失败列表: {output_dir / batch.journal.DEAD_LETTER_FILE}（--retry-failed 重试）")
         print(f"   📂 输出目录: {output_dir}")
-        sys.exit(0)
+        sys.exit(1 if summary['failed'] else 0)
     
     # 单文件处理模式
     if not args.data or not args.title:
@@ -196,90 +325,9 @@ def main():
         print("  python cli.py --batch                    # 批量处理")
         parser.print_help()
         sys.exit(1)
-        from pathlib import Path
-        import glob
-        
-        print("📦 批量处理模式启动")
-        print("=" * 50)
-        
-        input_dir = Path(args.dir)
-        output_dir = Path(args.output_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 查找数据文件
-        data_files = list(input_dir.glob('*.csv')) + list(input_dir.glob('*.xlsx')) + list(input_dir.glob('*.json'))
-        
-        if not data_files:
-            print(f"❌ 目录中没有找到数据文件: {input_dir}")
-            sys.exit(1)
-        
-        print(f"📂 扫描目录: {input_dir}")
-        print(f"📄 找到 {len(data_files)} 个数据文件")
-        print("=" * 50)
-        
-        success = 0
-        failed = 0
-        
-        for filepath in data_files:
-            print(f"\n📄 处理: {filepath.name}")
-            
-            try:
-                # 自动匹配模板
-                name = filepath.name.lower()
-                if '欧姆' in name or '电压' in name or '物理' in name:
-                    template = 'physics_basic'
-                elif '滴定' in name or '化学' in name:
-                    template = 'chemistry_basic'
-                elif '细胞' in name or '生物' in name:
-                    template = 'biology_basic'
-                elif '算法' in name or '计算机' in name:
-                    template = 'cs_algorithm'
-                elif '材料' in name or '工程' in name:
-                    template = 'engineering_basic'
-                else:
-                    template = args.template
-                
-                # 生成报告
-                generator = ReportGenerator(template)
-                data = generator.load_data(str(filepath))
-                generator.summarize_data(data)
-                
-                # 自动选择图表列
-                numeric_cols = data.select_dtypes(include=['number']).columns.tolist()
-                if len(numeric_cols) >= 2:
-                    chart_config = ChartConfig(
-                        title=f"{numeric_cols[1]} vs {numeric_cols[0]}",
-                        chart_type='scatter'
-                    )
-                    generator.add_chart(data, numeric_cols[0], numeric_cols[1], chart_config)
-                
-                report = generator.generate_report(
-                    title=filepath.stem,
-                    author=args.author or "批量生成",
-                    group=args.group or "批量处理",
-                    data=data
-                )
-                
-                output_path = output_dir / f"{filepath.stem}.html"
-                generator.save_report(report, str(output_path))
-                
-                print(f"   ✅ {filepath.name} → {output_path.name}")
-                success += 1
-                
-            except Exception as e:
-                print(f"   ❌ 处理失败: {e}")
-                failed += 1
-        
-        print("\n" + "=" * 50)
-        print(f"📊 批量处理完成!")
-        print(f"   ✅ 成功: {success}")
-        print(f"   ❌ 失败: {failed}")
-        print(f"   📂 输出目录: {output_dir}")
-        sys.exit(0)
     
-    # 单文件处理模式
-    
-    # 批量处理模式
+    from src.generators.report_generator import ReportGenerator
+    from src.generators.chart_generator import ChartConfig
     
     try:
         if not args.quiet:
@@ -307,20 +355,63 @@ def main():
             if not args.quiet:
                 print("📈 生成图表...")
             
-            # 智能选择列
-            x_col = args.x or (numeric_cols[0] if numeric_cols else None)
-            y_col = args.y or (numeric_cols[1] if len(numeric_cols) > 1 else (numeric_cols[0] if numeric_cols else None))
-            
-            if x_col and y_col:
-                chart_config = ChartConfig(
-                    title=args.chart_title or f"{y_col} vs {x_col}",
-                    chart_type=args.chart_type,
-                    xlabel=x_col,
-                    ylabel=y_col
-                )
-                generator.add_chart(data, x_col, y_col, chart_config)
+            if args.x or args.y:
+                # 用户指定列
+                x_col = args.x or (numeric_cols[0] if numeric_cols else None)
+                y_cols = [c.strip() for c in args.y.split(',') if c.strip()]
+                if not y_cols:
+                    y_cols = [c for c in numeric_cols if c != x_col][:1]
+                
+                if x_col and y_cols:
+                    chart_config = ChartConfig(
+                        title=args.chart_title or ("" if len(y_cols) > 1 else f"{y_cols[0]} vs {x_col}"),
+                        chart_type=args.chart_type or 'scatter',
+                        xlabel=x_col,
+                        ylabel=y_cols[0],
+                        layout=args.layout
+                    )
+                    generator.add_charts(data, x_col, y_cols, chart_config)
+                    if not args.quiet:
+                        print(f"   图表: {x_col} → {', '.join(y_cols)}")
+            else:
+                # 未指定列：按数据画像自动推荐（自变量、折线/散点、分布直方图）
+                generator.add_recommended_charts(data, chart_type=args.chart_type)
                 if not args.quiet:
-                    print(f"   图表: {x_col} → {y_col}")
+                    for chart in generator.charts:
+                        config = chart["config"]
+                        if config.chart_type == "histogram":
+                            print(f"   图表: {', '.join(config.y_cols)} 分布 (histogram)")
+                        else:
+                            print(f"   图表: {config.x_col} → {', '.join(config.y_cols)} ({config.chart_type})")
+        
+        # AI 分析（流式输出）
+        ai_conclusion = ""
+        if args.ai:
+            from src.generators.ai_engine import AILabAnalyzer, AIConfig
+            
+            print("🤖 AI 分析中...")
+            analyzer = AILabAnalyzer(AIConfig(
+                provider=args.ai_provider,
+                model=args.ai_model or AILabAnalyzer.DEFAULT_MODELS[args.ai_provider]
+            ))
+            streamed = []
+            
+            def on_token(text):
+                streamed.append(text)
+                print(text, end='', flush=True)
+            
+            result = analyzer.analyze_phenomenon(data, args.title, on_token=on_token)
+            print()
+            if result.fallback:
+                # 本地分析没有流式输出，直接打印结果；中途失败时标明已输出的片段作废
+                if streamed:
+                    print("⚠️ AI 输出中断，以上内容不完整已作废，改用本地分析")
+                else:
+                    print("⚠️ AI 不可用，已使用本地分析")
+                print(f"   现象: {result.phenomenon}")
+                print(f"   趋势: {result.trend}")
+                print(f"   异常: {result.anomaly}")
+            ai_conclusion = result.conclusion
         
         # 生成报告
         if not args.quiet:
@@ -331,7 +422,7 @@ def main():
             author=args.author,
             group=args.group,
             data=data,
-            conclusion=args.conclusion or "请根据实验结果填写结论...",
+            conclusion=args.conclusion or ai_conclusion or "请根据实验结果填写结论...",
             error_analysis=args.error_analysis or "请分析实验误差来源..."
         )
         
@@ -3,6 +3,7 @@
 
 import sys
 import os
+import threading
 from pathlib import Path
 
 # 路径设置
@@ -27,12 +28,13 @@ except ImportError:
     print("=" * 60)
     sys.exit(1)
 
-# 数据处理
-PANDAS_AVAILABLE = True
-try:
-    import pandas as pd
-except ImportError:
-    PANDAS_AVAILABLE = False
+# 数据处理（只检查是否安装，首次加载数据时才导入，加快窗口启动）
+import importlib.util
+PANDAS_AVAILABLE = importlib.util.find_spec("pandas") is not None
+
+
+class GenerationCancelled(Exception):
+    """用户取消了报告生成"""
 
 
 class LabReportApp:
@@ -41,6 +43,7 @@ class LabReportApp:
     def __init__(self):
         self.data_file = None
         self.template = "physics_basic"
+        self._cancel = None  # 生成进行中时为 threading.Event
         
         # 模板映射
         self.templates = {
@@ -152,7 +155,9 @@ class LabReportApp:
         status_section = [
             [sg.Text("ℹ️ 状态", font=('Microsoft YaHei', 10, 'bold'))],
             [sg.Text(key='-STATUS-', size=(70, 1), text_color='#0066CC',
-                    text='准备就绪，请选择数据文件')]
+                    text='准备就绪，请选择数据文件')],
+            [sg.ProgressBar(100, orientation='h', size=(45, 12), key='-PROGRESS-',
+                           bar_color=('#27AE60', '#E0E0E0'))]
         ]
         
         log_section = [
@@ -169,6 +174,12 @@ class LabReportApp:
                         font=('Microsoft YaHei', 12, 'bold'),
                         size=(15, 1),
                         pad=(10, 5)),
+                sg.Button("⏹️ 取消", key='-CANCEL-', 
+                        font=('Microsoft YaHei', 11),
+                        size=(8, 1),
+                        pad=(10, 5),
+                        disabled=True,
+                        tooltip='在当前步骤完成后停止生成'),
                 sg.Button("🧪 AI 分析", key='-AI_ANALYZE-', 
                         button_color=('white', '#3498DB'), 
                         font=('Microsoft YaHei', 11),
@@ -224,13 +235,13 @@ class LabReportApp:
         
         ext = Path(filepath).suffix.lower()
         
+        if ext not in ('.csv', '.xlsx'):
+            return None, f"不支持的文件格式: {ext}"
+        
         try:
-            if ext == '.csv':
-                df = pd.read_csv(filepath)
-            elif ext == '.xlsx':
-                df = pd.read_excel(filepath)
-            else:
-                return None, f"不支持的文件格式: {ext}"
+            # 解析结果缓存：反复加载同一文件时毫秒级返回
+            from src.generators.data_cache import load_dataframe
+            df = load_dataframe(filepath)
             
             self.data_file = filepath
             return df, None
@@ -290,90 +301,196 @@ class LabReportApp:
         self.log(window, f"✅ 已加载 {subject} 示例: {filename}", 'success')
     
     def generate_report(self, window, values):
-        """生成报告"""
+        """生成报告：在后台线程中运行，界面保持响应，可随时取消"""
+        if self._cancel is not None:
+            return
         if not self.data_file:
             self.log(window, "请先选择数据文件！", 'warning')
             return
         
-        # 获取输入
-        title = values['-TITLE-'] or "实验报告"
-        author = values['-AUTHOR-']
-        group = values['-GROUP-']
-        
-        # 获取模板
+        # 在界面线程中读取输入，后台线程不访问控件
         template_name = values['-TEMPLATE-']
         template_key = "physics_basic"
         for k, v in self.templates.items():
             if v == template_name:
                 template_key = k
                 break
+        job = {
+            "data_file": self.data_file,
+            "title": values['-TITLE-'] or "实验报告",
+            "author": values['-AUTHOR-'],
+            "group": values['-GROUP-'],
+            "template_key": template_key,
+            "template_name": template_name,
+            "output_dir": values['-OUTPUT_DIR-'] or str(BASE_DIR / "output"),
+            "docx": values['-OUTPUT_DOCX-'],
+            "html": values['-OUTPUT_HTML-'],
+        }
+        
+        self._cancel = threading.Event()
+        window['-GENERATE-'].update(disabled=True)
+        window['-CANCEL-'].update(disabled=False)
+        window['-PROGRESS-'].update(0)
+        window['-STATUS-'].update(f"⏳ 正在生成: {job['title']}")
+        threading.Thread(target=self._generate_worker, args=(window, job, self._cancel),
+                         daemon=True).start()
+    
+    def _generate_worker(self, window, job, cancel):
+        """后台线程：逐步生成，通过 write_event_value 回传日志与进度"""
+        def progress(message, level='info', percent=None):
+            window.write_event_value('-GEN_PROGRESS-', (message, level, percent))
         
-        # 输出目录
-        output_dir = values['-OUTPUT_DIR-'] or str(BASE_DIR / "output")
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        def checkpoint():
+            # 每个步骤之间检查取消请求（步骤内部无法中断）
+            if cancel.is_set():
+                raise GenerationCancelled()
         
-        self.log(window, f"开始生成报告: {title}")
-        self.log(window, f"模板: {template_name}")
-        self.log(window, f"输出目录: {output_dir}")
+        try:
+            title, output_dir = job["title"], job["output_dir"]
+            Path(output_dir).mkdir(parents=True, exist_ok=True)
+            
+            progress(f"开始生成报告: {title}", percent=0)
+            progress(f"模板: {job['template_name']}")
+            progress(f"输出目录: {output_dir}")
+            
+            # 加载数据
+            df, error = self.load_data(job["data_file"])
+            if error:
+                raise RuntimeError(f"数据加载失败: {error}")
+            progress(f"数据加载成功: {df.shape[0]} 行 × {df.shape[1]} 列", 'success', 10)
+            
+            # 获取数值列
+            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+            
+            if not numeric_cols:
+                progress("未找到数值列，无法生成图表", 'warning')
+            checkpoint()
+            
+            # 生成 Word 报告
+            if job["docx"]:
+                progress("生成 Word 报告...")
+                try:
+                    from src.generators.word_generator import WordReportGenerator
+                    
+                    word_gen = WordReportGenerator(job["template_key"])
+                    word_gen.generate_report(
+                        title=title,
+                        author=job["author"],
+                        group=job["group"],
+                        conclusion="请根据实验结果填写结论...",
+                        data_summary={}
+                    )
+                    
+                    output_path = Path(output_dir) / f"{title}.docx"
+                    word_gen.save(str(output_path))
+                    progress(f"✅ Word 报告已保存: {output_path.name}", 'success')
+                    
+                except Exception as e:
+                    progress(f"Word 生成失败: {e}", 'error')
+            progress("", percent=50)
+            checkpoint()
+            
+            # 生成 HTML 报告
+            if job["html"]:
+                progress("生成 HTML 报告...")
+                try:
+                    from src.generators.report_generator import ReportGenerator
+                    
+                    gen = ReportGenerator(job["template_key"])
+                    gen.summarize_data(df)
+                    report = gen.generate_report(title, job["author"], job["group"], df)
+                    
+                    output_path = Path(output_dir) / f"{title}.html"
+                    gen.save_report(report, str(output_path))
+                    progress(f"✅ HTML 报告已保存: {output_path.name}", 'success')
+                    
+                except Exception as e:
+                    progress(f"HTML 生成失败: {e}", 'error')
+            
+            window.write_event_value('-GEN_DONE-', ("done", output_dir))
+        except GenerationCancelled:
+            window.write_event_value('-GEN_DONE-', ("cancelled", job["output_dir"]))
+        except Exception as e:
+            window.write_event_value('-GEN_DONE-', ("error", str(e)))
+    
+    def update_generation(self, window, message, level, percent):
+        """后台线程的进度事件（在界面线程中执行）"""
+        if message:
+            self.log(window, message, level)
+        if percent is not None:
+            window['-PROGRESS-'].update(percent)
+    
+    def finish_generation(self, window, status, detail):
+        """生成结束：恢复按钮状态"""
+        self._cancel = None
+        window['-GENERATE-'].update(disabled=False)
+        window['-CANCEL-'].update(disabled=True)
+        if status == "done":
+            window['-PROGRESS-'].update(100)
+            window['-STATUS-'].update("✅ 报告生成完成")
+            self.log(window, "=" * 40, 'info')
+            self.log(window, "🎉 报告生成完成！", 'success')
+            self.log(window, f"📂 输出目录: {detail}", 'info')
+            self.log(window, "=" * 40, 'info')
+        elif status == "cancelled":
+            window['-PROGRESS-'].update(0)
+            window['-STATUS-'].update("⏹️ 已取消")
+            self.log(window, "已取消生成（已完成的文件保留）", 'warning')
+        else:
+            window['-PROGRESS-'].update(0)
+            window['-STATUS-'].update("❌ 生成失败")
+            self.log(window, detail, 'error')
+    
+    def start_ai_analysis(self, window, values):
+        """在后台线程中运行 AI 分析，流式输出到日志"""
+        if not self.data_file:
+            self.log(window, "请先选择数据文件！", 'warning')
+            return
         
-        # 加载数据
         df, error = self.load_data(self.data_file)
         if error:
             self.log(window, f"数据加载失败: {error}", 'error')
             return
         
-        self.log(window, f"数据加载成功: {df.shape[0]} 行 × {df.shape[1]} 列", 'success')
-        
-        # 获取数值列
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        
-        if not numeric_cols:
-            self.log(window, "未找到数值列，无法生成图表", 'warning')
-        
-        # 生成 Word 报告
-        if values['-OUTPUT_DOCX-']:
-            self.log(window, "生成 Word 报告...")
-            try:
-                from src.generators.word_generator import WordReportGenerator
-                
-                word_gen = WordReportGenerator(template_key)
-                doc = word_gen.generate_report(
-                    title=title,
-                    author=author,
-                    group=group,
-                    conclusion="请根据实验结果填写结论...",
-                    data_summary={}
-                )
-                
-                output_path = Path(output_dir) / f"{title}.docx"
-                word_gen.save(str(output_path))
-                self.log(window, f"✅ Word 报告已保存: {output_path.name}", 'success')
-                
-            except Exception as e:
-                self.log(window, f"Word 生成失败: {e}", 'error')
+        title = values['-TITLE-'] or "实验报告"
+        window['-AI_ANALYZE-'].update(disabled=True)
+        self.log(window, "AI 分析中...")
         
-        # 生成 HTML 报告
-        if values['-OUTPUT_HTML-']:
-            self.log(window, "生成 HTML 报告...")
+        def worker():
             try:
-                from src.generators.report_generator import ReportGenerator
+                from src.generators.ai_engine import AILabAnalyzer
                 
-                gen = ReportGenerator(template_key)
-                gen.summarize_data(df)
-                report = gen.generate_report(title, author, group, df)
+                analyzer = AILabAnalyzer()
+                if not analyzer._available:
+                    window.write_event_value('-AI_TOKEN-', "⚠️ 未配置 API Key，使用本地分析\n")
+                streamed = []
                 
-                output_path = Path(output_dir) / f"{title}.html"
-                gen.save_report(report, str(output_path))
-                self.log(window, f"✅ HTML 报告已保存: {output_path.name}", 'success')
+                def on_token(text):
+                    streamed.append(text)
+                    window.write_event_value('-AI_TOKEN-', text)
                 
+                result = analyzer.analyze_phenomenon(df, title, on_token=on_token)
+                window.write_event_value('-AI_DONE-', (result, bool(streamed)))
             except Exception as e:
-                self.log(window, f"HTML 生成失败: {e}", 'error')
+                window.write_event_value('-AI_DONE-', (e, False))
         
-        # 完成
-        self.log(window, "=" * 40, 'info')
-        self.log(window, "🎉 报告生成完成！", 'success')
-        self.log(window, f"📂 输出目录: {output_dir}", 'info')
-        self.log(window, "=" * 40, 'info')
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def finish_ai_analysis(self, window, result, streamed: bool):
+        """AI 分析完成"""
+        window['-AI_ANALYZE-'].update(disabled=False)
+        window['-LOG-'].update("\n", append=True)
+        if isinstance(result, Exception):
+            self.log(window, f"AI 分析失败: {result}", 'error')
+            return
+        if result.fallback:
+            if streamed:
+                self.log(window, "AI 输出中断，以上内容不完整已作废，改用本地分析", 'warning')
+            # 本地分析无流式输出，直接显示结果
+            self.log(window, f"现象: {result.phenomenon}")
+            self.log(window, f"趋势: {result.trend}")
+            self.log(window, f"异常: {result.anomaly}")
+        self.log(window, f"结论: {result.conclusion}", 'success')
     
     def run(self):
         """运行应用"""
@@ -383,6 +500,8 @@ class LabReportApp:
             event, values = window.read()
             
             if event in (sg.WIN_CLOSED, '-EXIT-'):
+                if self._cancel is not None:
+                    self._cancel.set()
                 break
             
             elif event == '-FILE-':
@@ -422,6 +541,18 @@ class LabReportApp:
             elif event == '-GENERATE-':
                 self.generate_report(window, values)
             
+            elif event == '-CANCEL-':
+                if self._cancel is not None:
+                    self._cancel.set()
+                    window['-CANCEL-'].update(disabled=True)
+                    window['-STATUS-'].update("⏳ 正在取消（当前步骤完成后停止）...")
+            
+            elif event == '-GEN_PROGRESS-':
+                self.update_generation(window, *values[event])
+            
+            elif event == '-GEN_DONE-':
+                self.finish_generation(window, *values[event])
+            
             elif event == '-CLEAR-':
                 window['-FILE-'].update('')
                 window['-TITLE-'].update('实验报告')
@@ -434,7 +565,13 @@ class LabReportApp:
                 self.log(window, "已清空所有输入")
             
             elif event == '-AI_ANALYZE-':
-                self.log(window, "AI 分析功能需要 API Key，请在代码中配置", 'warning')
+                self.start_ai_analysis(window, values)
+            
+            elif event == '-AI_TOKEN-':
+                window['-LOG-'].update(values[event], append=True)
+            
+            elif event == '-AI_DONE-':
+                self.finish_ai_analysis(window, *values[event])
         
         window.close()
 
@@ -4,14 +4,60 @@
 __version__ = "1.0.0"
 __author__ = "KINGSTON-115"
 
-from .core.engine import LabReportGenerator, ReportConfig, ExperimentData
-from .generators.report_generator import ReportGenerator, ReportTemplate
-from .generators.chart_generator import ChartGenerator, ChartConfig
-from .generators.word_generator import WordReportGenerator
-from .generators.template_engine import TemplateEngine, UserTemplate
-from .generators.ai_engine import AILabAnalyzer, AIConfig, AnalysisResult
-from .generators.pdf_generator import PDFGenerator, PDFConfig, DataValidator
-from .generators.batch_processor import BatchReportGenerator, BatchTask, ReportPreview
+import importlib
+from typing import TYPE_CHECKING
+
+# 延迟导入（PEP 562）：访问属性时才加载对应模块，
+# 避免 import src 时就拉起 pandas / matplotlib / python-docx
+_LAZY_EXPORTS = {
+    "LabReportGenerator": ".core.engine",
+    "ReportConfig": ".core.engine",
+    "ExperimentData": ".core.engine",
+    "ReportGenerator": ".generators.report_generator",
+    "ReportTemplate": ".generators.report_generator",
+    "ChartGenerator": ".generators.chart_generator",
+    "ChartConfig": ".generators.chart_generator",
+    "WordReportGenerator": ".generators.word_generator",
+    "TemplateEngine": ".generators.template_engine",
+    "UserTemplate": ".generators.template_engine",
+    "AILabAnalyzer": ".generators.ai_engine",
+    "AIConfig": ".generators.ai_engine",
+    "AnalysisResult": ".generators.ai_engine",
+    "LocalStatAnalyzer": ".generators.local_analysis",
+    "PDFGenerator": ".generators.pdf_generator",
+    "PDFConfig": ".generators.pdf_generator",
+    "DataValidator": ".generators.pdf_generator",
+    "BatchReportGenerator": ".generators.batch_processor",
+    "BatchTask": ".generators.batch_processor",
+    "ReportPreview": ".generators.batch_processor",
+    "SharedDataHandle": ".generators.shared_data",
+}
+
+if TYPE_CHECKING:
+    from .core.engine import LabReportGenerator, ReportConfig, ExperimentData
+    from .generators.report_generator import ReportGenerator, ReportTemplate
+    from .generators.chart_generator import ChartGenerator, ChartConfig
+    from .generators.word_generator import WordReportGenerator
+    from .generators.template_engine import TemplateEngine, UserTemplate
+    from .generators.ai_engine import AILabAnalyzer, AIConfig, AnalysisResult
+    from .generators.local_analysis import LocalStatAnalyzer
+    from .generators.pdf_generator import PDFGenerator, PDFConfig, DataValidator
+    from .generators.batch_processor import BatchReportGenerator, BatchTask, ReportPreview
+    from .generators.shared_data import SharedDataHandle
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # 之后的访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
 
 __all__ = [
     # Core
@@ -30,6 +76,7 @@ __all__ = [
     "AILabAnalyzer",
     "AIConfig",
     "AnalysisResult",
+    "LocalStatAnalyzer",
     # PDF & Batch
     "PDFGenerator",
     "PDFConfig",
@@ -37,4 +84,5 @@ __all__ = [
     "BatchReportGenerator",
     "BatchTask",
     "ReportPreview",
+    "SharedDataHandle",
 ]
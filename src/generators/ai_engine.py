@@ -12,13 +12,19 @@
 """
 
 import os
+import io
 import json
+import math
+import threading
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, Iterator, Callable
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
 
+from .profiling import traced
+
 # 环境变量读取
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY", "")
@@ -26,6 +32,16 @@ QWEN_API_KEY = os.environ.get("QWEN_API_KEY", "")
 ZHIPU_API_KEY = os.environ.get("ZHIPU_API_KEY", "")
 BAIDU_API_KEY = os.environ.get("BAIDU_API_KEY", "")
 
+# 各提供商数据提示词的默认 token 预算（仅数据部分，不含任务说明）
+DEFAULT_TOKEN_BUDGETS = {
+    "openai": 3000,
+    "claude": 6000,
+    "qwen": 3000,
+    "zhipu": 3000,
+    "baidu": 2000,
+    "local": 1500,
+}
+
 
 @dataclass
 class AIConfig:
@@ -37,6 +53,8 @@ class AIConfig:
     temperature: float = 0.7
     max_tokens: int = 2000
     timeout: int = 60
+    token_budget: int = 0  # 数据提示词 token 上限，0 表示使用提供商默认值
+    pool_size: int = 10    # 每个共享客户端的 HTTP 连接池大小
     
     def __post_init__(self):
         # 自动从环境变量获取 API Key
@@ -72,6 +90,212 @@ class AnalysisResult:
     suggestion: str = ""           # 改进建议
     confidence: float = 0.0       # 置信度
     raw_response: str = ""         # 原始响应
+    details: Dict[str, Any] = field(default_factory=dict)  # 结构化分析结果（本地分析）
+    fallback: bool = False         # 是否为本地降级分析（流式输出中断时之前的片段作废）
+
+
+# 进程级 LLM 客户端注册表：(provider, base_url, api_key, timeout, pool_size) -> SDK 客户端
+# 同一进程内配置相同的分析器共享客户端及其 keep-alive 连接池
+_CLIENT_REGISTRY: Dict[tuple, Any] = {}
+_CLIENT_LOCK = threading.Lock()
+
+
+def _build_client(provider: str, api_key: str, base_url: str,
+                  timeout: float, pool_size: int):
+    """创建带连接池的 SDK 客户端"""
+    try:
+        import httpx
+        http_client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=60.0
+            )
+        )
+    except ImportError:
+        http_client = None
+    
+    if provider == "claude":
+        try:
+            from anthropic import Anthropic
+        except ImportError:
+            raise ImportError("请安装 Anthropic: pip install anthropic")
+        return Anthropic(api_key=api_key, timeout=timeout, http_client=http_client)
+    
+    try:
+        from openai import OpenAI
+    except ImportError:
+        raise ImportError("请安装 OpenAI: pip install openai")
+    return OpenAI(api_key=api_key, base_url=base_url or None,
+                  timeout=timeout, http_client=http_client)
+
+
+def get_shared_client(provider: str, api_key: str, base_url: str = "",
+                      timeout: float = 60, pool_size: int = 10):
+    """获取（或创建）进程内共享的 LLM 客户端
+
+    timeout 与 pool_size 是客户端创建时固定的设置，也作为注册表键的一部分：
+    设置不同的调用方得到各自的客户端，而不是沿用先创建的那个。
+    """
+    key = (provider, base_url or "", api_key or "", float(timeout), int(pool_size))
+    with _CLIENT_LOCK:
+        client = _CLIENT_REGISTRY.get(key)
+        if client is None:
+            client = _build_client(provider, api_key, base_url, timeout, pool_size)
+            _CLIENT_REGISTRY[key] = client
+    return client
+
+
+def clear_client_registry():
+    """关闭并清空所有共享客户端"""
+    with _CLIENT_LOCK:
+        clients = list(_CLIENT_REGISTRY.values())
+        _CLIENT_REGISTRY.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+def _reset_registry_after_fork():
+    # 连接池不能跨 fork 复用，子进程重新建立
+    global _CLIENT_LOCK
+    _CLIENT_LOCK = threading.Lock()
+    _CLIENT_REGISTRY.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_registry_after_fork)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数
+
+    中日韩字符约 1 字符 1 token，其余字符约 4 字符 1 token。
+    """
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class DataPromptCompactor:
+    """数据提示词压缩器 - 在 token 预算内挑选有代表性的数据
+
+    行的优先级：首尾行 > 各数值列极值 > 变化点 > 均匀分层采样。
+    数据以紧凑 CSV 输出，而非带填充的 to_string。
+    """
+    
+    MAX_CANDIDATE_ROWS = 200   # 参与挑选的候选行上限
+    MAX_STAT_COLUMNS = 40      # 统计摘要最多列出的数值列数
+    
+    def __init__(self, token_budget: int = 2000):
+        self.token_budget = max(int(token_budget), 200)
+    
+    def select_rows(self, data: pd.DataFrame, max_rows: int) -> List[int]:
+        """按优先级返回代表性行的位置（去重，未排序）"""
+        n = len(data)
+        if n == 0 or max_rows <= 0:
+            return []
+        if n <= max_rows:
+            return list(range(n))
+        
+        picked: Dict[int, None] = {}
+        
+        def take(positions):
+            for pos in positions:
+                if len(picked) >= max_rows:
+                    return
+                picked.setdefault(int(pos), None)
+        
+        take([0, n - 1])
+        
+        numeric = data.select_dtypes(include=['number'])
+        if not numeric.empty:
+            values = numeric.to_numpy(dtype=float)
+            finite = np.isfinite(values)
+            if finite.any():
+                # 极值行
+                take(np.nanargmin(np.where(finite, values, np.inf), axis=0))
+                take(np.nanargmax(np.where(finite, values, -np.inf), axis=0))
+                
+                # 变化点：归一化后二阶差分绝对值最大的行
+                if n >= 3:
+                    span = np.nanmax(values, axis=0) - np.nanmin(values, axis=0)
+                    span[~np.isfinite(span) | (span == 0)] = 1.0
+                    scaled = np.nan_to_num(values / span)
+                    curvature = np.abs(np.diff(scaled, n=2, axis=0)).sum(axis=1)
+                    k = min(max_rows, len(curvature))
+                    top = np.argpartition(-curvature, k - 1)[:k]
+                    top = top[np.argsort(-curvature[top], kind='stable')]
+                    take(top[curvature[top] > 0] + 1)
+        
+        # 分层采样填充剩余名额
+        take(np.linspace(0, n - 1, num=max_rows).round().astype(int))
+        return list(picked)
+    
+    def compact(self, data: pd.DataFrame, title: str = "") -> str:
+        """生成预算内的数据描述"""
+        if data is None or data.empty:
+            return "无数据"
+        
+        columns = data.columns.tolist()
+        numeric_cols = data.select_dtypes(include=['number']).columns.tolist()
+        
+        # 统计摘要：describe 一次性计算
+        stats = []
+        if numeric_cols:
+            desc = data[numeric_cols[:self.MAX_STAT_COLUMNS]].describe().T
+            for col, row in desc.iterrows():
+                stats.append(f"- {col}: 均值={row['mean']:.4g}, 标准差={row['std']:.4g}, "
+                             f"范围=[{row['min']:.4g}, {row['max']:.4g}]")
+        
+        # 统计部分最多占预算的 60%，超出时按列数减半
+        shown = len(stats)
+        while True:
+            lines = stats[:shown]
+            if shown < len(numeric_cols):
+                lines.append(f"- ……另有 {len(numeric_cols) - shown} 个数值列")
+            preview = f"数据形状: {data.shape[0]} 行 × {data.shape[1]} 列\n"
+            preview += "列名: " + ", ".join(map(str, columns)) + "\n"
+            preview += "统计摘要:\n" + "\n".join(lines)
+            if shown <= 1 or estimate_tokens(preview) <= self.token_budget * 0.6:
+                break
+            shown //= 2
+        
+        remaining = self.token_budget - estimate_tokens(title) - estimate_tokens(preview)
+        
+        # 候选行一次性序列化，再按优先级在预算内累加
+        candidates = self.select_rows(data, self.MAX_CANDIDATE_ROWS)
+        buffer = io.StringIO()
+        data.iloc[sorted(candidates)].to_csv(buffer, index=False, float_format='%.6g')
+        header, *lines = buffer.getvalue().splitlines()
+        line_of = dict(zip(sorted(candidates), lines))
+        
+        remaining -= estimate_tokens(header)
+        chosen = []
+        for pos in candidates:
+            cost = estimate_tokens(line_of[pos]) + 1
+            if cost > remaining and chosen:
+                break
+            chosen.append(pos)
+            remaining -= cost
+        chosen.sort()
+        
+        raw = "\n".join([header] + [line_of[pos] for pos in chosen])
+        note = f"（CSV，选取 {len(chosen)}/{len(data)} 行：首尾、极值、变化点及均匀采样）"
+        
+        return f"""
+## 实验数据
+{title}
+
+{preview}
+
+## 原始数据（部分）{note}
+{raw}
+"""
 
 
 class BaseLLMProvider(ABC):
@@ -81,37 +305,57 @@ class BaseLLMProvider(ABC):
     def chat(self, messages: List[Dict], **kwargs) -> str:
         """发送对话请求"""
         pass
+    
+    def chat_stream(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """流式对话请求，逐段产出文本
 
+        默认实现退化为一次性返回完整结果，子类可覆盖为真正的流式接口。
+        """
+        yield self.chat(messages, **kwargs)
 
-class OpenAIProvider(BaseLLMProvider):
-    """OpenAI 提供商"""
+
+class OpenAICompatibleProvider(BaseLLMProvider):
+    """OpenAI 兼容接口提供商基类（OpenAI / 通义千问 / 智谱 / 百度千帆 / Ollama）"""
     
     def __init__(self, config: AIConfig):
         self.config = config
         self._client = None
     
+    @abstractmethod
     def _get_client(self):
-        if self._client is None:
-            try:
-                from openai import OpenAI
-                self._client = OpenAI(
-                    api_key=self.config.api_key,
-                    base_url=self.config.base_url or None,
-                    timeout=self.config.timeout
-                )
-            except ImportError:
-                raise ImportError("请安装 OpenAI: pip install openai")
-        return self._client
+        """返回 OpenAI SDK 客户端"""
+        pass
     
-    def chat(self, messages: List[Dict], **kwargs) -> str:
+    def _create(self, messages: List[Dict], **kwargs):
         client = self._get_client()
-        response = client.chat.completions.create(
+        return client.chat.completions.create(
             model=self.config.model,
             messages=messages,
             temperature=self.config.temperature,
-            max_tokens=self.config.max_tokens
+            max_tokens=self.config.max_tokens,
+            **kwargs
         )
+    
+    def chat(self, messages: List[Dict], **kwargs) -> str:
+        response = self._create(messages)
         return response.choices[0].message.content
+    
+    def chat_stream(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        for chunk in self._create(messages, stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class OpenAIProvider(OpenAICompatibleProvider):
+    """OpenAI 提供商"""
+    
+    def _get_client(self):
+        if self._client is None:
+            self._client = get_shared_client(
+                "openai", self.config.api_key, self.config.base_url,
+                self.config.timeout, self.config.pool_size
+            )
+        return self._client
 
 
 class ClaudeProvider(BaseLLMProvider):
@@ -123,109 +367,99 @@ class ClaudeProvider(BaseLLMProvider):
     
     def _get_client(self):
         if self._client is None:
-            try:
-                from anthropic import Anthropic
-                self._client = Anthropic(
-                    api_key=self.config.api_key,
-                    timeout=self.config.timeout
-                )
-            except ImportError:
-                raise ImportError("请安装 Anthropic: pip install anthropic")
+            self._client = get_shared_client(
+                "claude", self.config.api_key, "",
+                self.config.timeout, self.config.pool_size
+            )
         return self._client
     
+    def _request_args(self, messages: List[Dict]) -> Dict:
+        # 转换消息格式：system 消息单独传递
+        system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+        args = {
+            "model": self.config.model,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature,
+            "messages": [m for m in messages if m["role"] != "system"],
+        }
+        if system:
+            args["system"] = system
+        return args
+    
     def chat(self, messages: List[Dict], **kwargs) -> str:
         client = self._get_client()
-        # 转换消息格式
-        content = [m["content"] for m in messages]
-        response = client.messages.create(
-            model=self.config.model,
-            max_tokens=self.config.max_tokens,
-            temperature=self.config.temperature,
-            messages=content
-        )
+        response = client.messages.create(**self._request_args(messages))
         return response.content[0].text
+    
+    def chat_stream(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        client = self._get_client()
+        with client.messages.stream(**self._request_args(messages)) as stream:
+            for text in stream.text_stream:
+                yield text
 
 
-class QwenProvider(BaseLLMProvider):
+class QwenProvider(OpenAICompatibleProvider):
     """阿里通义千问提供商"""
     
-    def __init__(self, config: AIConfig):
-        self.config = config
-        self._client = None
+    BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
     
     def _get_client(self):
         if self._client is None:
-            try:
-                from openai import OpenAI
-                self._client = OpenAI(
-                    api_key=self.config.api_key,
-                    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-                )
-            except ImportError:
-                raise ImportError("请安装 OpenAI SDK")
+            self._client = get_shared_client(
+                "qwen", self.config.api_key, self.BASE_URL,
+                self.config.timeout, self.config.pool_size
+            )
         return self._client
-    
-    def chat(self, messages: List[Dict], **kwargs) -> str:
-        client = self._get_client()
-        response = client.chat.completions.create(
-            model=self.config.model,
-            messages=messages,
-            temperature=self.config.temperature,
-            max_tokens=self.config.max_tokens
-        )
-        return response.choices[0].message.content
 
 
-class ZhipuProvider(BaseLLMProvider):
+class ZhipuProvider(OpenAICompatibleProvider):
     """智谱 AI 提供商"""
     
-    def __init__(self, config: AIConfig):
-        self.config = config
-        self._client = None
+    BASE_URL = "https://open.zhipu.ai.com/v4"
     
     def _get_client(self):
         if self._client is None:
-            try:
-                from openai import OpenAI
-                self._client = OpenAI(
-                    api_key=self.config.api_key,
-                    base_url="https://open.zhipu.ai.com/v4"
-                )
-            except ImportError:
-                raise ImportError("请安装 OpenAI SDK")
+            self._client = get_shared_client(
+                "zhipu", self.config.api_key, self.BASE_URL,
+                self.config.timeout, self.config.pool_size
+            )
         return self._client
+
+
+class BaiduProvider(OpenAICompatibleProvider):
+    """百度千帆提供商"""
     
-    def chat(self, messages: List[Dict], **kwargs) -> str:
-        client = self._get_client()
-        response = client.chat.completions.create(
-            model=self.config.model,
-            messages=messages,
-            temperature=self.config.temperature,
-            max_tokens=self.config.max_tokens
-        )
-        return response.choices[0].message.content
+    BASE_URL = "https://qianfan.baidubce.com/v2"
+    
+    def _get_client(self):
+        if self._client is None:
+            self._client = get_shared_client(
+                "baidu", self.config.api_key, self.BASE_URL,
+                self.config.timeout, self.config.pool_size
+            )
+        return self._client
 
 
-class LocalProvider(BaseLLMProvider):
+class LocalProvider(OpenAICompatibleProvider):
     """本地模型提供商 (Ollama)"""
     
-    def __init__(self, config: AIConfig):
-        self.config = config
+    def _get_client(self):
+        if self._client is None:
+            self._client = get_shared_client(
+                "local", "ollama", self.config.base_url or "http://localhost:11434/v1",
+                self.config.timeout, self.config.pool_size
+            )
+        return self._client
     
     def chat(self, messages: List[Dict], **kwargs) -> str:
         try:
-            from openai import OpenAI
-            client = OpenAI(
-                api_key="ollama",
-                base_url=self.config.base_url or "http://localhost:11434/v1"
-            )
-            response = client.chat.completions.create(
-                model=self.config.model,
-                messages=messages,
-                temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
-            )
-            return response.choices[0].message.content
+            return super().chat(messages, **kwargs)
+        except Exception as e:
+            raise ConnectionError(f"无法连接到本地模型: {e}")
+    
+    def chat_stream(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        try:
+            yield from super().chat_stream(messages, **kwargs)
         except Exception as e:
             raise ConnectionError(f"无法连接到本地模型: {e}")
 
@@ -238,6 +472,7 @@ class AILabAnalyzer:
         "claude": ClaudeProvider,
         "qwen": QwenProvider,
         "zhipu": ZhipuProvider,
+        "baidu": BaiduProvider,
         "local": LocalProvider,
     }
     
@@ -246,6 +481,7 @@ class AILabAnalyzer:
         "claude": "claude-3-sonnet-20240229",
         "qwen": "qwen-turbo",
         "zhipu": "glm-4",
+        "baidu": "ernie-3.5-8k",
         "local": "llama2",
     }
     
@@ -275,39 +511,34 @@ class AILabAnalyzer:
         messages = [{"role": "user", "content": "Hello"}]
         return self.provider.chat(messages)
     
+    def _token_budget(self) -> int:
+        """数据提示词的 token 预算"""
+        return self.config.token_budget or DEFAULT_TOKEN_BUDGETS.get(self.config.provider, 2000)
+    
     def _format_data_for_ai(self, data: pd.DataFrame, title: str = "") -> str:
-        """格式化数据给 AI"""
-        if data is None or data.empty:
-            return "无数据"
-        
-        # 基本统计
-        stats = []
-        numeric_cols = data.select_dtypes(include=['number']).columns
-        for col in numeric_cols:
-            col_data = data[col]
-            stats.append(f"- {col}: 均值={col_data.mean():.4f}, 标准差={col_data.std():.4f}, 范围=[{col_data.min()}, {col_data.max()}]")
-        
-        # 数据预览
-        preview = f"数据形状: {data.shape[0]} 行 × {data.shape[1]} 列\n"
-        preview += "列名: " + ", ".join(data.columns.tolist()) + "\n"
-        preview += "统计摘要:\n" + "\n".join(stats)
-        
-        # 原始数据（限制行数）
-        raw = data.head(10).to_string()
-        
-        return f"""
-## 实验数据
-{title}
-
-{preview}
-
-## 原始数据（部分）
-{raw}
-"""
+        """格式化数据给 AI（按 token 预算压缩）"""
+        return DataPromptCompactor(self._token_budget()).compact(data, title)
     
+    def _chat(self, messages: List[Dict],
+              on_token: Optional[Callable[[str], None]] = None) -> str:
+        """发送请求；提供 on_token 时走流式接口并逐段回调"""
+        if on_token is None:
+            return self.provider.chat(messages)
+        chunks = []
+        for chunk in self.provider.chat_stream(messages):
+            chunks.append(chunk)
+            on_token(chunk)
+        return "".join(chunks)
+    
+    @traced("ai.analyze_phenomenon")
     def analyze_phenomenon(self, data: pd.DataFrame, title: str = "",
-                           description: str = "") -> AnalysisResult:
-        """分析实验现象"""
+                           description: str = "",
+                           on_token: Optional[Callable[[str], None]] = None) -> AnalysisResult:
+        """分析实验现象
+        
+        Args:
+            on_token: 可选回调，流式接收模型输出的文本片段
+        """
         if not self._available:
             return self._fallback_analysis(data, title)
         
@@ -340,7 +571,7 @@ class AILabAnalyzer:
 """
         try:
             messages = [{"role": "user", "content": prompt}]
-            response = self.provider.chat(messages)
+            response = self._chat(messages, on_token)
             
             # 解析响应
             result = self._parse_response(response)
@@ -352,8 +583,10 @@ class AILabAnalyzer:
             print(f"❌ AI 分析失败: {e}")
             return self._fallback_analysis(data, title)
     
+    @traced("ai.generate_conclusion")
     def generate_conclusion(self, data: pd.DataFrame, experiment_type: str,
-                            title: str = "") -> str:
+                            title: str = "",
+                            on_token: Optional[Callable[[str], None]] = None) -> str:
         """生成实验结论"""
         if not self._available:
             return self._default_conclusion(data, experiment_type)
@@ -376,11 +609,12 @@ class AILabAnalyzer:
 """
         try:
             messages = [{"role": "user", "content": prompt}]
-            return self.provider.chat(messages)
+            return self._chat(messages, on_token)
         except Exception as e:
             print(f"❌ 结论生成失败: {e}")
             return self._default_conclusion(data, experiment_type)
     
+    @traced("ai.fill_template")
     def fill_template_content(self, template_fields: Dict[str, str],
                              data: pd.DataFrame, title: str = "") -> Dict[str, str]:
         """填充模板内容"""
@@ -441,36 +675,19 @@ class AILabAnalyzer:
         return result
     
     def _fallback_analysis(self, data: pd.DataFrame, title: str) -> AnalysisResult:
-        """降级分析（无 API 时）"""
+        """降级分析（无 API 时）：本地统计分析引擎"""
+        from .local_analysis import local_analysis_summary
+        
         result = AnalysisResult()
         
         if data is not None and not data.empty:
-            numeric_cols = data.select_dtypes(include=['number']).columns
-            if len(numeric_cols) >= 2:
-                x, y = numeric_cols[0], numeric_cols[1]
-                x_data, y_data = data[x], data[y]
-                
-                # 简单趋势分析
-                if x_data.diff().mean() > 0 and y_data.diff().mean() > 0:
-                    trend = "正相关趋势"
-                elif x_data.diff().mean() > 0 and y_data.diff().mean() < 0:
-                    trend = "负相关趋势"
-                else:
-                    trend = "无明显趋势"
-                
-                # 异常检测
-                from numpy import abs as np_abs
-                outliers = np_abs(y_data - y_data.mean()) > 2 * y_data.std()
-                outlier_count = outliers.sum()
-                
-                result.phenomenon = f"实验数据覆盖 {x} 范围为 {x_data.min():.2f} ~ {x_data.max():.2f}"
-                result.trend = trend
-                result.anomaly = f"检测到 {outlier_count} 个潜在异常点" if outlier_count > 0 else "未检测到明显异常"
-                result.conclusion = f"实验结果与{x}和{y}的关系相符"
-                result.suggestion = "建议增加数据点以提高拟合精度"
-                result.confidence = 0.7
+            texts, details = local_analysis_summary(data)
+            for key, value in texts.items():
+                setattr(result, key, value)
+            result.details = details
         
         result.raw_response = "（本地分析模式）"
+        result.fallback = True
         return result
     
     def _default_conclusion(self, data: pd.DataFrame, experiment_type: str) -> str:
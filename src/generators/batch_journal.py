@@ -0,0 +1,96 @@
+# 🧪 批量任务日志 - 断点续跑 / 失败任务死信列表
+# Batch Journal - Checkpointing, resume and dead-letter list
+
+"""
+每完成一个任务就向输出目录中的 .batch_journal.jsonl 追加一行并 fsync，
+批量运行中途崩溃或被杀死（例如某个巨大文件导致 OOM）时，已完成的进度
+不会丢失；--resume 时跳过日志中已成功的任务。
+
+最后一行可能因崩溃而只写了一半，读取时忽略无法解析的行。
+
+失败的任务汇总到 failed_tasks.json（死信列表），可以单独重试。
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, List, Any
+
+from .io_utils import atomic_write_text
+
+
+class BatchJournal:
+    """批量处理日志"""
+
+    FILE_NAME = ".batch_journal.jsonl"
+    DEAD_LETTER_FILE = "failed_tasks.json"
+
+    def __init__(self, output_dir: str):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / self.FILE_NAME
+        self.dead_letter_path = self.output_dir / self.DEAD_LETTER_FILE
+        self._lock = threading.Lock()
+
+    def start(self, resume: bool = False) -> Dict[str, Dict[str, Any]]:
+        """开始一次运行
+
+        Args:
+            resume: True 时保留日志并返回已完成的任务；否则清空日志
+
+        Returns:
+            {任务键: 日志记录}，只包含已成功（或跳过）的任务
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if resume:
+            return self.completed()
+        with self._lock:
+            self.path.write_text("", encoding='utf-8')
+        return {}
+
+    def records(self) -> List[Dict[str, Any]]:
+        """读取全部日志记录（忽略崩溃导致的残缺行）"""
+        try:
+            lines = self.path.read_text(encoding='utf-8').splitlines()
+        except OSError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def completed(self) -> Dict[str, Dict[str, Any]]:
+        """每个任务以最后一条记录为准，返回状态为成功的任务"""
+        latest: Dict[str, Dict[str, Any]] = {}
+        for record in self.records():
+            latest[record["key"]] = record
+        return {key: r for key, r in latest.items() if r.get("status") in ("success", "skipped")}
+
+    def append(self, record: Dict[str, Any]):
+        """追加一条记录并立即落盘"""
+        record = dict(record, time=time.time())
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def write_dead_letter(self, failed: List[Dict[str, Any]]):
+        """写入死信列表；没有失败任务时删除旧列表"""
+        if failed:
+            atomic_write_text(self.dead_letter_path,
+                              json.dumps(failed, ensure_ascii=False, indent=2, default=str))
+        elif self.dead_letter_path.exists():
+            self.dead_letter_path.unlink()
+
+    def load_dead_letter(self) -> List[Dict[str, Any]]:
+        """读取死信列表"""
+        try:
+            return json.loads(self.dead_letter_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return []
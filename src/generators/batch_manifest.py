@@ -0,0 +1,123 @@
+# 🧪 批量增量清单 - 只重新生成变化的报告
+# Batch Manifest - Incremental rebuilds for batch mode
+
+"""
+像构建系统一样处理批量任务：输出目录中保存一份清单，记录每个任务的
+输入内容哈希、模板版本、选项哈希和输出文件。再次运行时，三者都未变化
+且输出文件仍然存在的任务直接跳过。
+
+输入哈希按 (mtime_ns, size) 复用：文件未被触碰时不重新读取内容，
+因此对上千个文件的归档重跑只需 stat 一遍。
+"""
+
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from .data_cache import file_hash
+from .io_utils import atomic_write_text
+from .report_generator import ReportGenerator
+
+# 报告生成逻辑变化（影响所有输出）时递增
+RENDERER_VERSION = 1
+
+
+def template_version(template: str) -> str:
+    """模板版本：模板定义与渲染器版本的哈希"""
+    definition = ReportGenerator.TEMPLATE_REGISTRY.get(template)
+    payload = f"{RENDERER_VERSION}:{template}:{definition!r}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def options_hash(options: Dict[str, Any]) -> str:
+    """生成选项（标题、作者、格式等）的哈希"""
+    payload = json.dumps(options, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def task_key(data_path: str, output_key: str = "") -> str:
+    """任务键：输入文件绝对路径（同一输入生成多个报告时附加 output_key）"""
+    key = str(Path(data_path).resolve())
+    return f"{key}::{output_key}" if output_key else key
+
+
+class BatchManifest:
+    """批量处理清单"""
+
+    FILE_NAME = ".batch_manifest.json"
+
+    def __init__(self, output_dir: str):
+        self.path = Path(output_dir) / self.FILE_NAME
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            return data.get("entries", {})
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """原子写入清单"""
+        with self._lock:
+            payload = {"version": RENDERER_VERSION, "entries": self.entries}
+            text = json.dumps(payload, ensure_ascii=False, indent=1)
+        atomic_write_text(self.path, text)
+
+    @staticmethod
+    def _key(data_path: str, output_key: str = "") -> str:
+        return task_key(data_path, output_key)
+
+    def _input_hash(self, data_path: str, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        stat = Path(data_path).stat()
+        if previous and previous.get("mtime_ns") == stat.st_mtime_ns and previous.get("size") == stat.st_size:
+            digest = previous["input_hash"]
+        else:
+            digest = file_hash(Path(data_path))
+        return {"input_hash": digest, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def fingerprint(self, data_path: str, template: str, options: Dict[str, Any],
+                    output_key: str = "") -> Dict[str, Any]:
+        """计算任务指纹
+
+        Args:
+            output_key: 同一输入生成多个不同报告时用于区分（如标题）
+        """
+        previous = self.entries.get(self._key(data_path, output_key))
+        fp = self._input_hash(data_path, previous)
+        fp["template_version"] = template_version(template)
+        fp["options_hash"] = options_hash(options)
+        return fp
+
+    def is_up_to_date(self, data_path: str, fingerprint: Dict[str, Any], output_key: str = "") -> bool:
+        """输入、模板、选项均未变化且输出文件都存在"""
+        entry = self.entries.get(self._key(data_path, output_key))
+        if not entry:
+            return False
+        for field in ("input_hash", "template_version", "options_hash"):
+            if entry.get(field) != fingerprint[field]:
+                return False
+        outputs = entry.get("outputs", [])
+        if not outputs or not all(Path(p).exists() for p in outputs):
+            return False
+        # 仅被 touch 过（内容未变）：更新 stat，下次无需重新计算哈希
+        with self._lock:
+            entry["mtime_ns"], entry["size"] = fingerprint["mtime_ns"], fingerprint["size"]
+        return True
+
+    def outputs(self, data_path: str, output_key: str = "") -> List[str]:
+        return list(self.entries.get(self._key(data_path, output_key), {}).get("outputs", []))
+
+    def record(self, data_path: str, fingerprint: Dict[str, Any], outputs: List[str],
+               output_key: str = ""):
+        """记录成功生成的任务"""
+        with self._lock:
+            self.entries[self._key(data_path, output_key)] = dict(fingerprint, outputs=list(outputs))
+
+    def forget(self, data_path: str, output_key: str = ""):
+        """任务失败时移除旧记录，下次必定重新生成"""
+        with self._lock:
+            self.entries.pop(self._key(data_path, output_key), None)
@@ -4,17 +4,61 @@
 import os
 import sys
 import json
+import contextlib
+import contextvars
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, field, asdict
+from fnmatch import fnmatch
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import time
 
 from .report_generator import ReportGenerator
-from .word_generator import WordReportGenerator
 from .pdf_generator import PDFGenerator, DataValidator
-from .ai_engine import AILabAnalyzer
+from .data_profile import recommend_charts
+from .data_cache import load_dataframe
+from .shared_data import shared_frame
+from .chart_generator import default_render_workers
+from .batch_manifest import BatchManifest, task_key
+from .batch_journal import BatchJournal
+from .profiling import span, traced
+from .metrics import StageTimer, peak_rss_mb, export_metrics, summarize_stages
+from .batch_scheduler import TaskScheduler, estimate_task, order_by_cost, auto_workers
+from .io_utils import atomic_path
+
+
+# 模板自动匹配：文件名关键词 → 模板
+TEMPLATE_KEYWORDS = [
+    (('欧姆', '电压', '物理'), 'physics_basic'),
+    (('滴定', '化学'), 'chemistry_basic'),
+    (('细胞', '生物'), 'biology_basic'),
+    (('算法', '计算机'), 'cs_algorithm'),
+    (('材料', '工程'), 'engineering_basic'),
+]
+
+DEFAULT_PATTERNS = ('*.csv', '*.xlsx', '*.json')
+ALL_FORMATS = ('html', 'docx', 'pdf', 'md')
+
+
+def guess_template(filename: str, default: str = "physics_basic") -> str:
+    """根据文件名关键词匹配模板"""
+    name = filename.lower()
+    for keywords, template in TEMPLATE_KEYWORDS:
+        if any(k in name for k in keywords):
+            return template
+    return default
+
+
+def parse_formats(output_format: str) -> List[str]:
+    """解析输出格式：逗号分隔的 html,docx,pdf,md；all 等价于 docx,html,md"""
+    if output_format == "all":
+        return ["docx", "html", "md"]
+    formats = [f.strip().lower() for f in output_format.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in ALL_FORMATS]
+    if unknown:
+        raise ValueError(f"不支持的输出格式: {', '.join(unknown)}")
+    return formats
 
 
 @dataclass
@@ -25,9 +69,10 @@ class BatchTask:
     author: str = ""
     group: str = ""
     template: str = "physics_basic"
-    output_format: str = "all"  # docx, html, pdf, all
+    output_format: str = "all"  # 逗号分隔的 docx, html, pdf, md，或 all
     ai_analysis: bool = False
     ai_config: Dict = field(default_factory=dict)
+    output_name: str = ""  # 输出文件名（可含子目录，不含扩展名），默认使用标题
 
 
 @dataclass
@@ -38,16 +83,239 @@ class BatchResult:
     output_files: List[str] = field(default_factory=list)
     error: str = ""
     duration: float = 0.0
+    skipped: bool = False  # 增量模式下输入未变化，沿用已有输出
+    timings: Dict[str, float] = field(default_factory=dict)  # 各阶段耗时（秒）
+    peak_rss_mb: float = 0.0
+    missing_formats: List[str] = field(default_factory=list)  # 请求但未能生成的格式
+
+
+def tasks_from_directory(directory: str, patterns: List[str] = DEFAULT_PATTERNS,
+                         exclude: List[str] = (), recursive: bool = False,
+                         template: str = "physics_basic", author: str = "",
+                         group: str = "", output_format: str = "html") -> List[BatchTask]:
+    """扫描目录生成批量任务
+
+    Args:
+        patterns: 包含的 glob 模式
+        exclude: 排除的 glob 模式（匹配相对路径或文件名）
+        recursive: 是否递归子目录；递归时输出按相对路径镜像到子目录
+        template: 文件名无法匹配模板时使用的默认模板
+    """
+    root = Path(directory)
+    found = set()
+    for pattern in patterns:
+        found.update(root.rglob(pattern) if recursive else root.glob(pattern))
+
+    tasks = []
+    for path in sorted(p for p in found if p.is_file()):
+        relative = path.relative_to(root).as_posix()
+        if any(fnmatch(relative, pat) or fnmatch(path.name, pat) for pat in exclude):
+            continue
+        tasks.append(BatchTask(
+            data_path=str(path),
+            title=path.stem,
+            author=author,
+            group=group,
+            template=guess_template(path.name, template),
+            output_format=output_format,
+            output_name=str(Path(relative).with_suffix('')),
+        ))
+    return tasks
+
+
+def generate_task_outputs(task: BatchTask, output_dir: str) -> BatchResult:
+    """生成单个任务的全部输出（不涉及清单 / 日志，可在子进程中运行）
+
+    各阶段耗时记录在 result.timings，峰值内存记录在 result.peak_rss_mb。
+    """
+    with span("batch.task", title=task.title, data_path=task.data_path):
+        return _generate_task_outputs(task, output_dir)
+
+
+def _generate_task_outputs(task: BatchTask, output_dir: str) -> BatchResult:
+    start_time = time.time()
+    result = BatchResult(task=task, success=False)
+    timer = StageTimer()
+    resources = contextlib.ExitStack()
+
+    try:
+        formats = parse_formats(task.output_format)
+        base = Path(output_dir) / (task.output_name or task.title)
+
+        # 加载数据（只解析一次，带缓存）
+        with timer.stage("load"):
+            data = load_dataframe(task.data_path)
+
+        # 验证数据
+        with timer.stage("validate"):
+            validation = DataValidator().validate(data)
+        if not validation["valid"]:
+            raise ValueError(f"数据验证失败: {', '.join(validation['errors'])}")
+
+        # AI 分析（如果启用）
+        ai_content = {}
+        if task.ai_analysis:
+            with timer.stage("ai"):
+                from .ai_engine import AILabAnalyzer
+                analyzer = AILabAnalyzer()
+                if analyzer._available:
+                    ai_result = analyzer.analyze_phenomenon(data, task.title)
+                    ai_content = {
+                        "conclusion": ai_result.conclusion,
+                        "phenomenon": ai_result.phenomenon,
+                        "suggestion": ai_result.suggestion
+                    }
+
+        # 多进程渲染图表时大数据集只放入共享内存一次，Word 与 HTML 共用
+        chart_data = resources.enter_context(
+            shared_frame(data) if default_render_workers() > 1 else contextlib.nullcontext(data))
+
+        # 生成 Word
+        if "docx" in formats:
+            from .word_generator import WordReportGenerator  # python-docx 只在需要时导入
+            word_gen = WordReportGenerator(task.template)
+            with timer.stage("chart"):
+                word_gen.add_chart_specs(chart_data, recommend_charts(data))
+            with timer.stage("docx"):
+                word_gen.generate_report(
+                    title=task.title,
+                    author=task.author,
+                    group=task.group,
+                    conclusion=ai_content.get("conclusion", "请填写结论..."),
+                    data_summary={}
+                )
+                output_path = base.with_suffix(".docx")
+                word_gen.save(str(output_path))
+            result.output_files.append(str(output_path))
+
+        # 生成 HTML / Markdown / PDF（共用一次渲染）
+        if {"html", "md", "pdf"} & set(formats):
+            gen = ReportGenerator(task.template)
+            with timer.stage("summarize"):
+                gen.summarize_data(data)
+            with timer.stage("chart"):
+                gen.add_recommended_charts(chart_data)
+            with timer.stage("html"):
+                report = gen.generate_report(task.title, task.author, task.group, data)
+            if "html" in formats:
+                output_path = base.with_suffix(".html")
+                with timer.stage("io"):
+                    gen.save_report(report, str(output_path), markdown=False)
+                result.output_files.append(str(output_path))
+            if "md" in formats:
+                output_path = base.with_suffix(".md")
+                with timer.stage("io"):
+                    gen.save_markdown(report, str(output_path))
+                result.output_files.append(str(output_path))
+            if "pdf" in formats:
+                pdf_gen = PDFGenerator()
+                if pdf_gen.engine == "html":
+                    print("⚠️ PDF 引擎不可用（需安装 weasyprint 或 reportlab），跳过 PDF")
+                    result.missing_formats.append("pdf")
+                else:
+                    output_path = base.with_suffix(".pdf")
+                    with timer.stage("pdf"), atomic_path(output_path) as tmp:
+                        pdf_gen.generate_from_html(report, str(tmp))
+                    result.output_files.append(str(output_path))
+
+        # 缺少的格式不算完成，续跑 / 重试时重新生成
+        if result.missing_formats:
+            raise RuntimeError(f"未生成 {', '.join(result.missing_formats)}：PDF 引擎不可用"
+                               "（需安装 weasyprint 或 reportlab）")
+        result.success = True
+
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    finally:
+        resources.close()
+
+    result.duration = time.time() - start_time
+    result.timings = timer.timings
+    result.peak_rss_mb = peak_rss_mb()
+    return result
+
+
+def _batch_worker_init(quiet: bool = False):
+    """批量子进程初始化：子进程内图表顺序渲染，避免进程池嵌套"""
+    os.environ["SMART_LAB_RENDER_WORKERS"] = "1"
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+
+class BatchProgress:
+    """批量进度条（吞吐量 / 剩余时间）
+
+    终端中原地刷新；输出被重定向时每完成约 10% 打印一行。
+    """
+
+    def __init__(self, total: int, stream=None, width: int = 30):
+        self.total = total
+        self.stream = stream or sys.stderr
+        self.width = width
+        self.done = self.success = self.failed = self.skipped = 0
+        self.start = time.time()
+        self.interactive = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self._last_decile = -1
+
+    def update(self, result: BatchResult):
+        self.done += 1
+        if result.skipped:
+            self.skipped += 1
+        elif result.success:
+            self.success += 1
+        else:
+            self.failed += 1
+            self.message(f"❌ {result.task.title}: {result.error}")
+        self.render()
+
+    def message(self, text: str):
+        """在进度条上方输出一行"""
+        if self.interactive:
+            self.stream.write("\r\033[K")
+        self.stream.write(text + "\n")
+        self.render()
+
+    def line(self) -> str:
+        elapsed = max(time.time() - self.start, 1e-9)
+        rate = self.done / elapsed
+        remaining = (self.total - self.done) / rate if rate > 0 else 0
+        filled = int(self.width * self.done / self.total) if self.total else self.width
+        bar = "█" * filled + "░" * (self.width - filled)
+        percent = self.done / self.total * 100 if self.total else 100
+        eta = time.strftime("%H:%M:%S", time.gmtime(remaining))
+        return (f"📦 [{bar}] {self.done}/{self.total} {percent:5.1f}%  "
+                f"{rate:.2f} 个/s  ETA {eta}  ✅{self.success} ⏭️{self.skipped} ❌{self.failed}")
+
+    def render(self):
+        if self.interactive:
+            self.stream.write("\r\033[K" + self.line())
+            self.stream.flush()
+            return
+        decile = int(self.done * 10 / self.total) if self.total else 10
+        if decile != self._last_decile or self.done == self.total:
+            self._last_decile = decile
+            self.stream.write(self.line() + "\n")
+            self.stream.flush()
+
+    def close(self):
+        if self.interactive:
+            self.stream.write("\n")
+            self.stream.flush()
 
 
 class BatchReportGenerator:
     """批量报告生成器"""
     
-    def __init__(self, output_dir: str = "output/batch"):
+    def __init__(self, output_dir: str = "output/batch", incremental: bool = True):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.results: List[BatchResult] = []
         self.validator = DataValidator()
+        self.incremental = incremental
+        self.manifest = BatchManifest(str(self.output_dir))
+        self.journal = BatchJournal(str(self.output_dir))
+        self.force = False
+        self.metrics_files: Dict[str, str] = {}
     
     def load_tasks_from_csv(self, csv_path: str) -> List[BatchTask]:
         """从 CSV 加载批量任务"""
@@ -86,96 +354,190 @@ class BatchReportGenerator:
         
         return tasks
     
-    def process_single_task(self, task: BatchTask) -> BatchResult:
-        """处理单个任务"""
+    def _prepare(self, task: BatchTask) -> Tuple[Optional[Dict[str, Any]], Optional[BatchResult]]:
+        """增量检查，返回 (任务指纹, 无需生成时的结果)"""
+        if not self.incremental:
+            return None, None
         start_time = time.time()
-        result = BatchResult(task=task, success=False)
-        
         try:
-            # 验证数据
-            validation = self.validator.validate(
-                pd.read_csv(task.data_path) if task.data_path.endswith('.csv') 
-                else pd.read_excel(task.data_path)
-            )
-            
-            if not validation["valid"]:
-                result.error = f"数据验证失败: {', '.join(validation['errors'])}"
-                return result
-            
-            # 加载数据
-            data = pd.read_csv(task.data_path) if task.data_path.endswith('.csv') \
-                else pd.read_excel(task.data_path)
-            
-            # AI 分析（如果启用）
-            ai_content = {}
-            if task.ai_analysis:
-                analyzer = AILabAnalyzer()
-                if analyzer._available:
-                    ai_result = analyzer.analyze_phenomenon(data, task.title)
-                    ai_content = {
-                        "conclusion": ai_result.conclusion,
-                        "phenomenon": ai_result.phenomenon,
-                        "suggestion": ai_result.suggestion
-                    }
-            
-            # 生成 Word
-            if task.output_format in ['docx', 'all']:
-                word_gen = WordReportGenerator(task.template)
-                doc = word_gen.generate_report(
-                    title=task.title,
-                    author=task.author,
-                    group=task.group,
-                    conclusion=ai_content.get("conclusion", "请填写结论..."),
-                    data_summary={}
-                )
-                output_path = self.output_dir / f"{task.title}.docx"
-                word_gen.save(str(output_path))
-                result.output_files.append(str(output_path))
-            
-            # 生成 HTML
-            if task.output_format in ['html', 'all']:
-                gen = ReportGenerator(task.template)
-                gen.summarize_data(data)
-                report = gen.generate_report(task.title, task.author, task.group, data)
-                output_path = self.output_dir / f"{task.title}.html"
-                gen.save_report(report, str(output_path))
-                result.output_files.append(str(output_path))
-            
-            result.success = True
-            
-        except Exception as e:
-            result.error = str(e)
-        
-        result.duration = time.time() - start_time
+            fingerprint = self.manifest.fingerprint(
+                task.data_path, task.template, self._task_options(task), output_key=task.title)
+        except OSError as e:
+            return None, BatchResult(task=task, success=False, error=f"无法读取数据文件: {e}")
+        if not self.force and self.manifest.is_up_to_date(task.data_path, fingerprint, task.title):
+            return fingerprint, BatchResult(
+                task=task, success=True, skipped=True,
+                output_files=self.manifest.outputs(task.data_path, task.title),
+                duration=time.time() - start_time)
+        return fingerprint, None
+    
+    def _finish(self, task: BatchTask, result: BatchResult, fingerprint: Optional[Dict[str, Any]],
+                journal: bool = True):
+        """更新增量清单，并把任务结果追加到日志"""
+        if fingerprint is not None:
+            if result.success:
+                self.manifest.record(task.data_path, fingerprint, result.output_files, task.title)
+            else:
+                self.manifest.forget(task.data_path, task.title)
+        if journal:
+            status = "skipped" if result.skipped else ("success" if result.success else "failed")
+            self.journal.append({
+                "key": task_key(task.data_path, task.title),
+                "status": status,
+                "outputs": result.output_files,
+                "error": result.error,
+                "duration": round(result.duration, 4),
+                "fingerprint": fingerprint,
+            })
+    
+    def process_single_task(self, task: BatchTask) -> BatchResult:
+        """处理单个任务"""
+        fingerprint, ready = self._prepare(task)
+        if ready is not None:
+            return ready
+        result = generate_task_outputs(task, str(self.output_dir))
+        self._finish(task, result, fingerprint, journal=False)
         return result
     
+    @staticmethod
+    def _task_options(task: BatchTask) -> Dict[str, Any]:
+        """影响输出内容的任务选项（参与增量判断）"""
+        return {
+            "title": task.title,
+            "author": task.author,
+            "group": task.group,
+            "output_format": task.output_format,
+            "output_name": task.output_name,
+            "ai_analysis": task.ai_analysis,
+            "ai_config": task.ai_config,
+        }
+    
+    @traced("batch.run")
     def process_batch(self, tasks: List[BatchTask], parallel: bool = False, 
-                     max_workers: int = 4) -> List[BatchResult]:
-        """批量处理任务"""
+                     max_workers: Optional[int] = None, force: bool = False, resume: bool = False,
+                     use_processes: bool = False, progress: bool = False,
+                     timeout: Optional[float] = None, memory_limit_mb: Optional[int] = None) -> List[BatchResult]:
+        """批量处理任务
+        
+        待生成的任务按估计成本从高到低调度。每完成一个任务都写入日志
+        （.batch_journal.jsonl），失败任务汇总到 failed_tasks.json。
+        返回的结果保持输入顺序。
+        
+        Args:
+            parallel: 并行处理（默认线程池）
+            max_workers: 并发数，默认按 CPU 核数与可用内存自动确定
+            use_processes: 每个任务在独立子进程中运行
+            force: 忽略增量清单，全部重新生成
+            resume: 继续上次中断的运行，跳过日志中已完成的任务
+            progress: 显示进度条代替逐个任务的输出
+            timeout: 单个任务的墙钟时间上限（秒），超时的子进程被终止
+            memory_limit_mb: 单个任务的内存上限（MB）
+            
+        设置 timeout 或 memory_limit_mb 时任务总是在子进程中运行。
+        """
         self.results = []
+        self.force = force
+        completed = self.journal.start(resume=resume)
+        bar = BatchProgress(len(tasks)) if progress else None
         
-        if parallel:
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = {executor.submit(self.process_single_task, t): t for t in tasks}
-                for future in as_completed(futures):
-                    result = future.result()
-                    self.results.append(result)
-                    print(f"  {'✅' if result.success else '❌'} {result.task.title} ({result.duration:.2f}s)")
-        else:
-            for task in tasks:
-                print(f"  处理: {task.title}...")
-                result = self.process_single_task(task)
-                self.results.append(result)
-                print(f"  {'✅' if result.success else '❌'} {result.task.title} ({result.duration:.2f}s)")
-                if not result.success:
-                    print(f"     错误: {result.error}")
+        pending = []
+        fingerprints = {}
+        for task in tasks:
+            record = completed.get(task_key(task.data_path, task.title))
+            outputs = record.get("outputs", []) if record else []
+            if outputs and all(Path(p).exists() for p in outputs):
+                # 上次运行已完成：恢复清单记录
+                if self.incremental and record.get("fingerprint"):
+                    self.manifest.record(task.data_path, record["fingerprint"], outputs, task.title)
+                self._collect(BatchResult(task=task, success=True, skipped=True, output_files=outputs), bar)
+                continue
+            fingerprint, ready = self._prepare(task)
+            if ready is not None:
+                self._finish(task, ready, fingerprint)
+                self._collect(ready, bar)
+                continue
+            pending.append(task)
+            fingerprints[id(task)] = fingerprint
+        
+        # 最长任务优先
+        estimates = [estimate_task(task) for task in pending]
+        pending = order_by_cost(pending, estimates)
         
+        def finish(task: BatchTask, result: BatchResult):
+            self._finish(task, result, fingerprints[id(task)])
+            self._collect(result, bar)
+        
+        # 进度条模式下静默各生成器的逐条输出
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull if bar else sys.stdout):
+            if pending and (use_processes or timeout or memory_limit_mb):
+                def on_result(task, result, error, duration):
+                    if error is not None:
+                        result = BatchResult(task=task, success=False, error=error, duration=duration)
+                    result.task = task
+                    finish(task, result)
+                
+                scheduler = TaskScheduler(
+                    max_workers=max_workers if parallel else 1,
+                    timeout=timeout,
+                    memory_limit_mb=memory_limit_mb,
+                    initializer=_batch_worker_init,
+                    initargs=(bar is not None,),
+                )
+                scheduler.run(pending, generate_task_outputs, args=(str(self.output_dir),),
+                              on_result=on_result, estimates=sorted(estimates, key=lambda e: -e.cost))
+            elif parallel and len(pending) > 1:
+                workers = max_workers or auto_workers(estimates)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    # 每个任务复制当前上下文，使 batch.task span 挂在 batch.run 之下
+                    futures = {executor.submit(contextvars.copy_context().run, generate_task_outputs,
+                                               task, str(self.output_dir)): task
+                               for task in pending}
+                    for future in as_completed(futures):
+                        finish(futures[future], future.result())
+            else:
+                for task in pending:
+                    if bar is None:
+                        print(f"  处理: {task.title}...")
+                    finish(task, generate_task_outputs(task, str(self.output_dir)))
+        
+        if bar is not None:
+            bar.close()
+        if self.incremental:
+            self.manifest.save()
+        self.journal.write_dead_letter([
+            {"task": asdict(r.task), "error": r.error}
+            for r in self.results if not r.success
+        ])
+        order = {id(task): i for i, task in enumerate(tasks)}
+        self.results.sort(key=lambda r: order.get(id(r.task), len(tasks)))
+        self.metrics_files = export_metrics(self.results, str(self.output_dir))
         return self.results
     
+    def _collect(self, result: BatchResult, bar: Optional[BatchProgress]):
+        self.results.append(result)
+        if bar is not None:
+            bar.update(result)
+            return
+        print(f"  {self._status_icon(result)} {result.task.title} ({result.duration:.2f}s)")
+        if not result.success:
+            print(f"     错误: {result.error}")
+    
+    def load_failed_tasks(self) -> List[BatchTask]:
+        """读取死信列表中的失败任务，用于重试"""
+        return [BatchTask(**entry["task"]) for entry in self.journal.load_dead_letter()]
+    
+    @staticmethod
+    def _status_icon(result: BatchResult) -> str:
+        if result.skipped:
+            return "⏭️"
+        return "✅" if result.success else "❌"
+    
     def generate_report(self) -> Dict:
         """生成处理报告"""
         total = len(self.results)
         success = sum(1 for r in self.results if r.success)
+        skipped = sum(1 for r in self.results if r.skipped)
         failed = total - success
         total_time = sum(r.duration for r in self.results)
         
@@ -183,10 +545,14 @@ class BatchReportGenerator:
             "summary": {
                 "total": total,
                 "success": success,
+                "skipped": skipped,
                 "failed": failed,
                 "total_time": f"{total_time:.2f}s",
-                "avg_time": f"{total_time/total:.2f}s" if total > 0 else "0s"
+                "avg_time": f"{total_time/total:.2f}s" if total > 0 else "0s",
+                "peak_rss_mb": max((r.peak_rss_mb for r in self.results), default=0.0)
             },
+            "stages": summarize_stages([r for r in self.results if not r.skipped]),
+            "metrics_files": self.metrics_files,
             "failed_tasks": [
                 {"title": r.task.title, "error": r.error}
                 for r in self.results if not r.success
@@ -399,6 +765,8 @@ def batch_process(config_path: str, output_dir: str = "output/batch") -> Dict:
     print(f"   成功: {report['summary']['success']}")
     print(f"   失败: {report['summary']['failed']}")
     print(f"   用时: {report['summary']['total_time']}")
+    for name, stage in report['stages'].items():
+        print(f"   ⏱️ {name}: {stage['share']:.0%}  p50 {stage['p50']:.3f}s  p95 {stage['p95']:.3f}s")
     
     return report
 
@@ -0,0 +1,334 @@
+# 🧪 批量任务调度器 - 按成本排序 / 超时与内存限制 / 自动确定并发数
+# Batch Scheduler - Cost-aware ordering, per-task limits, auto-sized pool
+
+"""
+按输入顺序提交任务时，排在最后的大文件会让整个批次空等；卡住的 LLM
+调用会永久占用一个工作进程。本模块：
+
+- 根据文件大小和估算行数估计任务成本，成本最高的任务最先调度
+  （LPT 最长处理时间优先，缩短整体完成时间）
+- 每个任务在独立子进程中运行，超过墙钟时间限制即终止；设置内存上限时
+  父进程定期读取子进程的常驻内存，超限即终止（Linux 读 /proc，
+  Windows 调用 GetProcessMemoryInfo，其他平台需安装 psutil，无法读取时警告）
+- 并发数默认取 CPU 核数、可用内存可容纳的进程数、任务数三者的最小值
+"""
+
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing import Pipe, Process, connection
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+MB = 1024 * 1024
+
+# 成本模型（单位约为秒，仅用于相对排序）
+TASK_BASE_COST = 0.5        # 每种输出格式的固定开销（模板渲染、图表）
+ROW_COST = 2e-5             # 每行数据每种格式的开销
+AI_COST = 10.0              # 启用 AI 分析的额外开销
+
+# 内存模型：解析后的 DataFrame 通常是文件大小的数倍
+WORKER_BASE_MEMORY = 200 * MB
+MEMORY_EXPANSION = 8
+MEMORY_HEADROOM = 0.8       # 只使用可用内存的 80%
+MEMORY_POLL_INTERVAL = 0.2  # 检查子进程内存的间隔（秒）
+
+# 无法采样时每行的平均字节数
+BYTES_PER_ROW = {'.csv': 40, '.json': 80, '.xlsx': 20, '.xls': 40}
+SAMPLE_BYTES = 64 * 1024
+
+
+@dataclass
+class TaskEstimate:
+    """任务成本估计"""
+    size: int
+    rows: int
+    cost: float
+    memory: int
+
+
+def estimate_rows(data_path: str) -> int:
+    """估算数据行数：CSV 读取开头 64KB 按换行密度外推，其他格式按平均行宽"""
+    path = Path(data_path)
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return 0
+    ext = path.suffix.lower()
+    if ext == '.csv' and size:
+        with open(path, 'rb') as f:
+            sample = f.read(SAMPLE_BYTES)
+        lines = sample.count(b'\n')
+        if len(sample) >= size:
+            return max(lines - 1, 0)
+        if lines:
+            return int(size * lines / len(sample))
+    return size // BYTES_PER_ROW.get(ext, 40)
+
+
+def estimate_task(task) -> TaskEstimate:
+    """估计批量任务的成本与内存占用"""
+    from .batch_processor import parse_formats
+
+    try:
+        size = Path(task.data_path).stat().st_size
+    except OSError:
+        size = 0
+    rows = estimate_rows(task.data_path)
+    try:
+        nformats = len(parse_formats(task.output_format)) or 1
+    except ValueError:
+        nformats = 1
+    cost = nformats * (TASK_BASE_COST + rows * ROW_COST)
+    if task.ai_analysis:
+        cost += AI_COST
+    memory = WORKER_BASE_MEMORY + size * MEMORY_EXPANSION
+    return TaskEstimate(size=size, rows=rows, cost=cost, memory=memory)
+
+
+def order_by_cost(items: Sequence[Any], estimates: Sequence[TaskEstimate]) -> List[Any]:
+    """按估计成本从高到低排序（成本相同时保持原顺序）"""
+    order = sorted(range(len(items)), key=lambda i: -estimates[i].cost)
+    return [items[i] for i in order]
+
+
+def available_memory() -> Optional[int]:
+    """当前可用物理内存（字节），无法获取时返回 None"""
+    try:
+        with open('/proc/meminfo', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def auto_workers(estimates: Sequence[TaskEstimate], memory_limit_mb: Optional[int] = None) -> int:
+    """根据 CPU 核数与可用内存确定并发进程数"""
+    workers = min(os.cpu_count() or 1, max(len(estimates), 1))
+    available = available_memory()
+    if available and estimates:
+        per_worker = memory_limit_mb * MB if memory_limit_mb else max(e.memory for e in estimates)
+        workers = min(workers, int(available * MEMORY_HEADROOM // per_worker))
+    return max(workers, 1)
+
+
+def _windows_rss(pid: int) -> Optional[int]:
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                "PagefileUsage", "PeakPagefileUsage")]
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    # PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+    handle = kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+    if not handle:
+        return None
+    try:
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not kernel32.K32GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.WorkingSetSize
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _linux_private_memory(pid: int) -> Optional[int]:
+    # fork 出的子进程与父进程共享未改写的页面，只统计独占部分
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', encoding='ascii') as f:
+            fields = dict(line.split(':', 1) for line in f if line.startswith('Private_'))
+        return sum(int(value.split()[0]) for value in fields.values()) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(f'/proc/{pid}/statm', encoding='ascii') as f:
+            resident, shared = (int(v) for v in f.read().split()[1:3])
+        return (resident - shared) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def process_memory(pid: int) -> Optional[int]:
+    """进程占用的常驻内存（字节，Linux 上不含与父进程共享的页面），无法读取时返回 None"""
+    if os.name == "nt":
+        try:
+            return _windows_rss(pid)
+        except (OSError, AttributeError):
+            return None
+    if os.path.exists('/proc/self/statm'):
+        return _linux_private_memory(pid)
+    if PSUTIL_AVAILABLE:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    return None
+
+
+def memory_limit_supported() -> bool:
+    """当前平台能否读取子进程内存（--max-memory 是否生效）"""
+    return process_memory(os.getpid()) is not None
+
+
+def _child_main(conn, fn: Callable, item: Any, args: Tuple,
+                initializer: Optional[Callable], initargs: Tuple):
+    """子进程入口：运行任务，通过管道返回 (状态, 结果)"""
+    try:
+        if initializer is not None:
+            initializer(*initargs)
+        message = ("ok", fn(item, *args))
+    except MemoryError:
+        message = ("error", "内存不足")
+    except BaseException as e:
+        message = ("error", f"{type(e).__name__}: {e}")
+    try:
+        conn.send(message)
+    finally:
+        conn.close()
+
+
+@dataclass
+class _Running:
+    process: Process
+    conn: Any
+    item: Any
+    started: float
+    deadline: Optional[float]
+
+
+class TaskScheduler:
+    """子进程任务调度器
+
+    用法:
+        scheduler = TaskScheduler(max_workers=4, timeout=300, memory_limit_mb=2048)
+        scheduler.run(tasks, generate_task_outputs, args=(output_dir,),
+                      on_result=lambda task, value, error, duration: ...)
+
+    on_result 在父进程中按完成顺序调用；任务成功时 error 为 None，
+    失败、超时、内存超限或子进程崩溃时 value 为 None、error 为原因。
+
+    内存上限按子进程的常驻内存计算，父进程每 MEMORY_POLL_INTERVAL
+    秒检查一次；平台无法读取子进程内存时打印警告，上限不生效。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 memory_limit_mb: Optional[int] = None, grace: float = 2.0,
+                 initializer: Optional[Callable] = None, initargs: Tuple = ()):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.grace = grace
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def workers_for(self, estimates: Sequence[TaskEstimate]) -> int:
+        if self.max_workers:
+            return max(1, min(self.max_workers, len(estimates) or 1))
+        return auto_workers(estimates, self.memory_limit_mb)
+
+    def run(self, items: Sequence[Any], fn: Callable, args: Tuple = (),
+            on_result: Optional[Callable[[Any, Any, Optional[str], float], None]] = None,
+            estimates: Optional[Sequence[TaskEstimate]] = None) -> Dict[str, int]:
+        """按成本从高到低运行全部任务
+
+        返回统计 {workers, completed, failed, timed_out, over_memory}
+        """
+        if estimates is None:
+            estimates = [estimate_task(item) for item in items]
+        queue = deque(order_by_cost(list(items), estimates))
+        workers = self.workers_for(estimates)
+        memory_limit = self.memory_limit_mb * MB if self.memory_limit_mb else None
+        if memory_limit and not memory_limit_supported():
+            print(f"⚠️ 无法读取子进程内存占用（可安装 psutil），内存上限 {self.memory_limit_mb} MB 不生效")
+            memory_limit = None
+        stats = {"workers": workers, "completed": 0, "failed": 0, "timed_out": 0, "over_memory": 0}
+        running: List[_Running] = []
+
+        def report(entry: _Running, value: Any, error: Optional[str]):
+            stats["completed" if error is None else "failed"] += 1
+            if on_result is not None:
+                on_result(entry.item, value, error, time.time() - entry.started)
+
+        while queue or running:
+            while queue and len(running) < workers:
+                item = queue.popleft()
+                parent_conn, child_conn = Pipe(duplex=False)
+                process = Process(target=_child_main, daemon=True,
+                                  args=(child_conn, fn, item, args,
+                                        self.initializer, self.initargs))
+                process.start()
+                child_conn.close()
+                now = time.time()
+                running.append(_Running(process, parent_conn, item, now,
+                                        now + self.timeout if self.timeout else None))
+
+            deadlines = [r.deadline for r in running if r.deadline is not None]
+            wait_for = max(min(deadlines) - time.time(), 0) if deadlines else None
+            if memory_limit:
+                wait_for = MEMORY_POLL_INTERVAL if wait_for is None else min(wait_for, MEMORY_POLL_INTERVAL)
+            connection.wait([r.conn for r in running] + [r.process.sentinel for r in running], wait_for)
+
+            for entry in list(running):
+                message = None
+                if entry.conn.poll():
+                    try:
+                        message = entry.conn.recv()
+                    except (EOFError, OSError):
+                        message = None
+                elif entry.process.is_alive():
+                    rss = process_memory(entry.process.pid) if memory_limit else None
+                    if rss is not None and rss > memory_limit:
+                        self._kill(entry.process)
+                        stats["over_memory"] += 1
+                        running.remove(entry)
+                        entry.conn.close()
+                        report(entry, None, f"内存超过限制（{rss // MB} MB > {self.memory_limit_mb} MB）已终止")
+                        continue
+                    if entry.deadline is None or time.time() < entry.deadline:
+                        continue
+                    self._kill(entry.process)
+                    stats["timed_out"] += 1
+                    running.remove(entry)
+                    entry.conn.close()
+                    report(entry, None, f"超时（超过 {self.timeout:g}s）已终止")
+                    continue
+
+                entry.process.join()
+                running.remove(entry)
+                entry.conn.close()
+                if message is None:
+                    # 子进程未返回结果即退出（例如被系统 OOM 杀死）
+                    report(entry, None, f"子进程异常退出 (exit code {entry.process.exitcode})")
+                elif message[0] == "ok":
+                    report(entry, message[1], None)
+                else:
+                    report(entry, None, message[1])
+        return stats
+
+    def _kill(self, process: Process):
+        """先 SIGTERM，宽限期后仍未退出则 SIGKILL"""
+        process.terminate()
+        process.join(self.grace)
+        if process.is_alive():
+            process.kill()
+            process.join()
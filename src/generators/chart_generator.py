@@ -1,45 +1,47 @@
 # 🧪 图表生成器 - 自动绑定数据可视化
 # Chart Generator - Auto-bind data visualization
 
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # 无头模式
-
-# 设置支持中文的字体
-import matplotlib.font_manager as fm
 import os
 
-# 查找可用的中文字体
-CHINESE_FONTS = [
-    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',  # 文泉驿正黑
-    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',  # Noto Sans CJK
-]
-
-FONT_PATH = None
-for font_path in CHINESE_FONTS:
-    if os.path.exists(font_path):
-        FONT_PATH = font_path
-        break
-
-if FONT_PATH:
-    # 注册字体
-    fm.fontManager.addfont(FONT_PATH)
-    prop = fm.FontProperties(fname=FONT_PATH)
-    FONT_NAME = prop.get_name()
-    plt.rcParams['font.sans-serif'] = [FONT_NAME]
-    plt.rcParams['axes.unicode_minus'] = False
-else:
-    FONT_NAME = 'DejaVu Sans'
-    plt.rcParams['font.sans-serif'] = ['DejaVu Sans']
-    plt.rcParams['axes.unicode_minus'] = False
+from .fonts import apply_font
+
+FONT_NAME = 'DejaVu Sans'
+_PYPLOT = None
+
+
+def _pyplot():
+    """首次绘图时才导入 matplotlib（无头模式）并注册中文字体
+
+    matplotlib 导入约需数百毫秒，延迟到真正绘图时，避免拖慢 CLI 启动。
+    中文字体的查找结果缓存在磁盘上（见 fonts.py）。
+    """
+    global _PYPLOT, FONT_NAME
+    if _PYPLOT is None:
+        import matplotlib
+        matplotlib.use('Agg')  # 无头模式
+        import matplotlib.pyplot as plt
+
+        FONT_NAME = apply_font(plt).name
+        _PYPLOT = plt
+    return _PYPLOT
+
+
 import numpy as np
 import pandas as pd
 from pathlib import Path
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import base64
+import atexit
+import threading
+import contextlib
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
 
+from .shared_data import SharedDataHandle, resolve_data, shared_frame
+from .io_utils import atomic_write_bytes
+from .profiling import traced
+
 @dataclass
 class ChartConfig:
     """图表配置"""
@@ -53,21 +55,28 @@ class ChartConfig:
     grid: bool = True
     legend: bool = True
     save_path: str = ""
+    layout: str = "single"  # single: 所有序列画在同一坐标系; grid: 每个序列一个子图
+    ncols: int = 0  # grid 布局列数，0 表示自动（约为 √N）
+    sharex: bool = True  # grid 布局是否共享 X 轴
+    x_col: str = ""  # 推荐图表时预先选定的列，配合 ChartGenerator.render 使用
+    y_cols: List[str] = field(default_factory=list)
 
 class ChartGenerator:
     """图表生成器 - 自动从数据生成专业图表"""
     
     CHART_STYLES = {
-        "default": plt.style.available[0] if plt.style.available else "default",
+        "default": "default",
         "science": "science",
         "ggplot": "ggplot",
         "seaborn": "seaborn-v0_8-whitegrid"
     }
     
     def __init__(self, data: pd.DataFrame):
-        self.data = data
+        """data 可以是 DataFrame 或 SharedDataHandle（共享内存映射，不复制）"""
+        self.data = resolve_data(data)
         self.figures = []
         
+    @traced("chart.generate")
     def generate(self, x_col: str, y_cols: List[str], config: ChartConfig = None) -> Dict[str, str]:
         """自动生成图表
         
@@ -79,30 +88,18 @@ class ChartGenerator:
         Returns:
             Dict: {"image_base64": "...", "save_path": "..."}
         """
+        plt = _pyplot()
         config = config or ChartConfig()
+        if config.layout == "grid" and len(y_cols) > 1:
+            return self.generate_grid(x_col, y_cols, config)
         
-        # 设置样式
-        if config.style != "default" and config.style in self.CHART_STYLES:
-            try:
-                plt.style.use(self.CHART_STYLES[config.style])
-            except:
-                pass
-        
+        self._apply_style(config)
         fig, ax = plt.subplots(figsize=config.figsize)
         
         x = self.data[x_col]
         
         for y_col in y_cols:
-            y = self.data[y_col]
-            
-            if config.chart_type == "line":
-                ax.plot(x, y, color=config.color, label=y_col, linewidth=2, marker='o', markersize=4)
-            elif config.chart_type == "scatter":
-                ax.scatter(x, y, color=config.color, label=y_col, s=50, alpha=0.7)
-            elif config.chart_type == "bar":
-                ax.bar(x, y, color=config.color, label=y_col, alpha=0.7)
-            elif config.chart_type == "histogram":
-                ax.hist(y, bins=20, color=config.color, alpha=0.7, label=y_col)
+            self._draw_series(ax, x, self.data[y_col], y_col, config)
         
         # 设置标签
         ax.set_title(config.title or f"{y_cols[0]} vs {x_col}", fontsize=14, fontweight='bold')
@@ -115,22 +112,94 @@ class ChartGenerator:
             ax.legend()
         
         plt.tight_layout()
+        return self._export(fig, config)
+    
+    def render(self, config: ChartConfig) -> Dict[str, str]:
+        """按配置中预选的 x_col / y_cols 生成图表（用于 recommend_charts 的结果）"""
+        return self.generate(config.x_col, config.y_cols, config)
+    
+    @traced("chart.grid")
+    def generate_grid(self, x_col: str, y_cols: List[str], config: ChartConfig = None) -> Dict[str, str]:
+        """小多图布局：N 个序列画在同一张图的子图网格中
         
-        # 保存或返回 base64
-        result = {}
+        只创建一次 Figure、一次 PNG 编码；使用固定间距代替 tight_layout 求解，
+        多通道数据的渲染时间和输出体积都远小于逐个生成单图。
         
+        Returns:
+            Dict: {"image_base64": "...", "save_path": "..."}
+        """
+        plt = _pyplot()
+        config = config or ChartConfig(layout="grid")
+        self._apply_style(config)
+        
+        n = len(y_cols)
+        ncols = config.ncols or int(np.ceil(np.sqrt(n)))
+        ncols = max(1, min(ncols, n))
+        nrows = int(np.ceil(n / ncols))
+        width = min(config.figsize[0] / 2 * ncols, 16)
+        height = min(config.figsize[1] / 2.5 * nrows, 24)
+        
+        fig, axes = plt.subplots(nrows, ncols, figsize=(width, height), squeeze=False,
+                                 sharex=config.sharex,
+                                 gridspec_kw={"hspace": 0.45, "wspace": 0.3})
+        x = self.data[x_col]
+        
+        for i, ax in enumerate(axes.flat):
+            if i >= n:
+                ax.set_visible(False)
+                continue
+            y_col = y_cols[i]
+            self._draw_series(ax, x, self.data[y_col], y_col, config, markersize=2)
+            ax.set_title(y_col, fontsize=10)
+            ax.tick_params(labelsize=8)
+            if config.grid:
+                ax.grid(True, linestyle='--', alpha=0.5)
+            # 共享 X 轴时只有每列最下方的可见子图显示刻度标签
+            if config.sharex and i + ncols < n:
+                ax.tick_params(labelbottom=False)
+            else:
+                ax.tick_params(labelbottom=True)
+                xlabel = y_col if config.chart_type == "histogram" else config.xlabel or x_col
+                ax.set_xlabel(xlabel, fontsize=9)
+        
+        fig.suptitle(config.title or f"{len(y_cols)} 个通道 vs {x_col}", fontsize=14, fontweight='bold')
+        return self._export(fig, config)
+    
+    def _apply_style(self, config: ChartConfig):
+        """设置样式"""
+        if config.style != "default" and config.style in self.CHART_STYLES:
+            try:
+                _pyplot().style.use(self.CHART_STYLES[config.style])
+            except:
+                pass
+    
+    @staticmethod
+    def _draw_series(ax, x, y, label: str, config: ChartConfig, markersize: int = 4):
+        """按图表类型绘制单个序列"""
+        if config.chart_type == "line":
+            ax.plot(x, y, color=config.color, label=label, linewidth=2, marker='o', markersize=markersize)
+        elif config.chart_type == "scatter":
+            ax.scatter(x, y, color=config.color, label=label, s=50 * (markersize / 4) ** 2, alpha=0.7)
+        elif config.chart_type == "bar":
+            ax.bar(x, y, color=config.color, label=label, alpha=0.7)
+        elif config.chart_type == "histogram":
+            ax.hist(y, bins=20, color=config.color, alpha=0.7, label=label)
+    
+    def _export(self, fig, config: ChartConfig) -> Dict[str, str]:
+        """PNG 只编码一次，同一份字节同时用于保存文件和 base64"""
+        plt = _pyplot()
+        buffer = BytesIO()
+        fig.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+        png = buffer.getvalue()
+        
+        result = {}
         if config.save_path:
             save_path = Path(config.save_path)
-            save_path.parent.mkdir(parents=True, exist_ok=True)
-            fig.savefig(save_path, dpi=150, bbox_inches='tight')
+            atomic_write_bytes(save_path, png)
             result["save_path"] = str(save_path)
             print(f"✅ 图表已保存: {save_path}")
         
-        # 转换为 base64
-        buffer = BytesIO()
-        fig.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-        buffer.seek(0)
-        img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
+        img_base64 = base64.b64encode(png).decode('utf-8')
         result["image_base64"] = f"data:image/png;base64,{img_base64}"
         
         self.figures.append(fig)
@@ -138,26 +207,99 @@ class ChartGenerator:
         
         return result
     
-    def generate_regression(self, x_col: str, y_col: str, degree: int = 1) -> Dict:
-        """自动拟合回归线"""
-        from numpy.polynomial import polynomial as P
+    @traced("chart.fit")
+    def fit_regressions(self, x_col: str, y_cols: List[str],
+                        degrees: List[int] = (1, 2, 3, 4, 5)) -> Dict[str, Dict[int, Dict]]:
+        """批量多项式回归：多个次数 × 多个 y 列一次求解
         
-        x = self.data[x_col].values
-        y = self.data[y_col].values
+        共享一个 Vandermonde 矩阵（x 先缩放到 [-1, 1] 以改善条件数），
+        对其做一次 QR 分解；各次数的子问题即 Q、R 的前若干列，
+        所有 y 列作为堆叠的右端项同时求解。
+        
+        Returns:
+            {y_col: {degree: {"coefficients", "std_errors", "r_squared",
+                              "adj_r_squared", "equation"}}}
+            系数按 np.polyfit 约定从高次到低次排列。次数最高为 n - 1；
+            此时曲线恰好过所有点（R² = 1），没有剩余自由度，
+            adj_r_squared 与 std_errors 为 NaN
+        """
+        x = self.data[x_col].to_numpy(dtype=float)
+        Y = self.data[list(y_cols)].to_numpy(dtype=float).reshape(len(x), len(y_cols))
+        mask = np.isfinite(x) & np.isfinite(Y).all(axis=1)
+        x, Y = x[mask], Y[mask]
+        n = len(x)
+        
+        results: Dict[str, Dict[int, Dict]] = {col: {} for col in y_cols}
+        degrees = sorted(d for d in set(degrees) if 0 <= d <= n - 1)
+        if not degrees:
+            return results
+        max_deg = degrees[-1]
+        
+        # x 缩放: t = (x - m) / h
+        m = (x.max() + x.min()) / 2
+        h = (x.max() - x.min()) / 2 or 1.0
+        V = np.vander((x - m) / h, max_deg + 1, increasing=True)
+        q, r = np.linalg.qr(V)
+        qty = q.T @ Y
         
-        # 拟合
-        coeffs = np.polyfit(x, y, degree)
-        y_fit = np.polyval(coeffs, x)
+        # 缩放基到原始基的变换: coef_x = T @ coef_t
+        from math import comb
+        T = np.zeros((max_deg + 1, max_deg + 1))
+        for j in range(max_deg + 1):
+            for i in range(j + 1):
+                T[i, j] = comb(j, i) * (-m) ** (j - i) / h ** j
         
-        # 计算 R²
-        ss_res = np.sum((y - y_fit) ** 2)
-        ss_tot = np.sum((y - np.mean(y)) ** 2)
-        r_squared = 1 - (ss_res / ss_tot)
+        ss_tot = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+        
+        for d in degrees:
+            p = d + 1
+            r_d = r[:p, :p]
+            # x 有重复值时 R 可能奇异，用最小二乘解代替直接求解
+            coef_t = np.linalg.lstsq(r_d, qty[:p], rcond=None)[0]
+            resid = Y - V[:, :p] @ coef_t
+            rss = (resid ** 2).sum(axis=0)
+            dof = n - p
+            
+            with np.errstate(invalid='ignore', divide='ignore'):
+                if dof > 0:
+                    r2 = np.where(ss_tot > 0, 1 - rss / ss_tot, 1.0)
+                    adj_r2 = 1 - (1 - r2) * (n - 1) / dof
+                else:
+                    # 精确插值：R² = 1，调整 R² 与参数误差无定义
+                    r2 = np.ones(len(y_cols))
+                    adj_r2 = np.full(len(y_cols), np.nan)
+            
+            # 参数协方差: sigma² (RᵀR)⁻¹，变换回原始基
+            r_inv = np.linalg.pinv(r_d)
+            T_d = T[:p, :p]
+            cov_unit = T_d @ (r_inv @ r_inv.T) @ T_d.T
+            sigma2 = rss / dof if dof > 0 else np.full(len(y_cols), np.nan)
+            coef_x = T_d @ coef_t
+            se_x = np.sqrt(np.outer(np.diag(cov_unit), sigma2))
+            
+            for j, col in enumerate(y_cols):
+                coeffs = coef_x[::-1, j]
+                results[col][d] = {
+                    "coefficients": coeffs.tolist(),
+                    "std_errors": se_x[::-1, j].tolist(),
+                    "r_squared": float(r2[j]),
+                    "adj_r_squared": float(adj_r2[j]),
+                    "equation": f"y = {' + '.join([f'{c:.4f}x^{i}' for i, c in enumerate(coeffs[::-1])])}",
+                }
+        
+        return results
+    
+    def plot_regression(self, x_col: str, y_col: str, fit: Dict, save_path: str = "") -> str:
+        """绘制回归结果，返回 base64 图片"""
+        plt = _pyplot()
+        x = self.data[x_col].values
+        y = self.data[y_col].values
+        x_line = np.linspace(np.nanmin(x), np.nanmax(x), 200)
+        y_line = np.polyval(fit["coefficients"], x_line)
         
-        # 绘图
         fig, ax = plt.subplots(figsize=(8, 6))
         ax.scatter(x, y, color='blue', label='原始数据', alpha=0.7)
-        ax.plot(x, y_fit, color='red', linewidth=2, label=f'拟合曲线 (R²={r_squared:.4f})')
+        ax.plot(x_line, y_line, color='red', linewidth=2, label=f'拟合曲线 (R²={fit["r_squared"]:.4f})')
         
         ax.set_xlabel(x_col)
         ax.set_ylabel(y_col)
@@ -166,43 +308,241 @@ class ChartGenerator:
         
         buffer = BytesIO()
         fig.savefig(buffer, format='png', dpi=150)
-        buffer.seek(0)
-        img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-        
         plt.close(fig)
         
-        return {
-            "coefficients": coeffs.tolist(),
-            "r_squared": r_squared,
-            "equation": f"y = {' + '.join([f'{c:.4f}x^{i}' for i, c in enumerate(coeffs[::-1])])}",
-            "image_base64": f"data:image/png;base64,{img_base64}"
-        }
+        if save_path:
+            Path(save_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(save_path).write_bytes(buffer.getvalue())
+        
+        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        return f"data:image/png;base64,{img_base64}"
     
-    def generate_error_analysis(self, x_col: str, y_col: str) -> Dict:
-        """自动误差分析"""
-        x = self.data[x_col].values
+    def generate_regression(self, x_col: str, y_col: str, degree: int = 1,
+                            plot: bool = True) -> Dict:
+        """自动拟合回归线"""
+        fit = self.fit_regressions(x_col, [y_col], [degree])[y_col].get(degree)
+        if fit is None:
+            raise ValueError(f"数据点不足，无法进行 {degree} 次拟合")
+        
+        result = dict(fit)
+        if plot:
+            result["image_base64"] = self.plot_regression(x_col, y_col, fit)
+        return result
+    
+    def generate_weighted_regression(self, x_col: str, y_col: str,
+                                     yerr_col: str = None, xerr_col: str = None,
+                                     degree: int = 1, method: str = "wls",
+                                     bootstrap: int = 0, plot: bool = True,
+                                     save_path: str = "") -> Dict:
+        """考虑测量不确定度的拟合，并绘制误差棒
+        
+        Args:
+            yerr_col: y 不确定度列名
+            xerr_col: x 不确定度列名（method="odr" 时使用）
+            method: "wls" 加权最小二乘 或 "odr" 正交距离回归
+            bootstrap: 自助法重采样次数，>0 时返回 95% 置信带
+        """
+        from .fitting import weighted_polyfit, odr_polyfit, bootstrap_band
+        
+        cols = [c for c in (x_col, y_col, yerr_col, xerr_col) if c]
+        frame = self.data[cols].dropna()
+        x = frame[x_col].to_numpy(dtype=float)
+        y = frame[y_col].to_numpy(dtype=float)
+        yerr = frame[yerr_col].to_numpy(dtype=float) if yerr_col else None
+        xerr = frame[xerr_col].to_numpy(dtype=float) if xerr_col else None
+        
+        if method == "odr":
+            fit = odr_polyfit(x, y, sigma_x=xerr, sigma_y=yerr, degree=degree)
+        else:
+            fit = weighted_polyfit(x, y, sigma_y=yerr, degree=degree)
+        result = fit.to_dict()
+        result["equation"] = f"y = {' + '.join([f'{c:.4f}x^{i}' for i, c in enumerate(fit.params[::-1])])}"
+        
+        band = None
+        if bootstrap > 0:
+            band = bootstrap_band(x, y, sigma_y=yerr, degree=degree, n_boot=bootstrap)
+            result["confidence_band"] = band
+        
+        if plot:
+            plt = _pyplot()
+            fig, ax = plt.subplots(figsize=(8, 6))
+            ax.errorbar(x, y, yerr=yerr, xerr=xerr, fmt='o', color='blue',
+                        ecolor='gray', capsize=3, alpha=0.8, label='测量数据')
+            x_line = np.linspace(x.min(), x.max(), 200)
+            ax.plot(x_line, np.polyval(fit.params, x_line), color='red', linewidth=2,
+                    label=f'{"正交距离回归" if method == "odr" else "加权拟合"} (χ²/ν={fit.reduced_chi2:.3g})')
+            if band:
+                ax.fill_between(band["x"], band["lower"], band["upper"], color='red',
+                                alpha=0.15, label='95% 置信带')
+            ax.set_xlabel(x_col)
+            ax.set_ylabel(y_col)
+            ax.legend()
+            ax.grid(True, linestyle='--', alpha=0.7)
+            
+            buffer = BytesIO()
+            fig.savefig(buffer, format='png', dpi=150)
+            plt.close(fig)
+            if save_path:
+                Path(save_path).parent.mkdir(parents=True, exist_ok=True)
+                Path(save_path).write_bytes(buffer.getvalue())
+                result["save_path"] = save_path
+            img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+            result["image_base64"] = f"data:image/png;base64,{img_base64}"
+        
+        return result
+    
+    @traced("chart.error_analysis")
+    def generate_error_analysis(self, x_col: str, y_col: str, yerr_col: str = None) -> Dict:
+        """自动误差分析
+        
+        Args:
+            yerr_col: 可选的 y 不确定度列，提供时额外给出加权平均及其不确定度
+        """
+        from .error_analysis import ErrorAnalyzer
+        
+        # 稳健统计：样本标准差、MAD、Grubbs / Chauvenet 异常值
+        stats = ErrorAnalyzer().analyze(self.data, [y_col])[y_col]
         y = self.data[y_col].values
+        outlier_indices = [self.data.index.get_loc(i) for i in stats["chauvenet_outliers"]]
         
-        # 计算统计量
-        mean_y = np.mean(y)
-        std_y = np.std(y)
-        mean_x = np.mean(x)
-        
-        # 相对误差
-        relative_error = std_y / mean_y * 100
-        
-        # 异常值检测 (2σ 准则)
-        outliers = np.abs(y - mean_y) > 2 * std_y
-        outlier_indices = np.where(outliers)[0]
-        
-        return {
-            "mean": float(mean_y),
-            "std": float(std_y),
-            "relative_error_percent": float(relative_error),
-            "outlier_count": int(np.sum(outliers)),
-            "outlier_indices": outlier_indices.tolist(),
-            "has_outliers": bool(np.sum(outliers) > 0)
+        result = {
+            "mean": stats["mean"],
+            "std": stats["std"],
+            "median": stats["median"],
+            "mad": stats["mad"],
+            "type_a_uncertainty": stats["type_a"],
+            # 均值为 0 时相对误差无定义，返回 None
+            "relative_error_percent": stats["cv_percent"],
+            "outlier_count": len(outlier_indices),
+            "outlier_indices": outlier_indices,
+            "grubbs_outliers": [self.data.index.get_loc(i) for i in stats["grubbs_outliers"]],
+            "has_outliers": bool(outlier_indices)
         }
+        
+        if yerr_col:
+            from .fitting import weighted_mean
+            result.update(weighted_mean(y, self.data[yerr_col].values))
+        
+        return result
+
+
+# 🚀 并行渲染 - 进程池
+# Parallel rendering - process pool
+
+_RENDER_POOL = None
+_RENDER_POOL_SIZE = 0
+_RENDER_POOL_USERS = 0  # 正在使用进程池的 render_charts 调用数
+_RENDER_LOCK = threading.Lock()
+
+
+def _render_worker(source, config: ChartConfig) -> Dict[str, str]:
+    """子进程入口：接收共享内存句柄或所需列的 numpy 数组，不传 DataFrame"""
+    if isinstance(source, SharedDataHandle):
+        try:
+            return ChartGenerator(source).render(config)
+        finally:
+            source.close()  # 工作进程长期存活，任务结束即解除映射
+    return ChartGenerator(pd.DataFrame(source, copy=False)).render(config)
+
+
+@contextlib.contextmanager
+def _render_pool(max_workers: int):
+    """借用共享进程池：在多个报告之间复用，避免每次渲染都重新启动进程、导入 matplotlib
+
+    批量线程池中多个线程会同时渲染：创建、扩容、关闭都在锁内进行，
+    有任务在用时不扩容（沿用现有进程数），避免关掉别的线程正在使用的池。
+    """
+    global _RENDER_POOL, _RENDER_POOL_SIZE, _RENDER_POOL_USERS
+    with _RENDER_LOCK:
+        if _RENDER_POOL is None or (_RENDER_POOL_SIZE < max_workers and _RENDER_POOL_USERS == 0):
+            from concurrent.futures import ProcessPoolExecutor
+            if _RENDER_POOL is not None:
+                _RENDER_POOL.shutdown(wait=False)
+                _RENDER_POOL, _RENDER_POOL_SIZE = None, 0
+            pool = ProcessPoolExecutor(max_workers=max_workers)
+            try:
+                # 立即启动工作进程：fork 出的子进程不会继承之后才创建的共享内存映射
+                pool.submit(os.getpid).result()
+            except BaseException:
+                pool.shutdown(wait=False)
+                raise
+            _RENDER_POOL, _RENDER_POOL_SIZE = pool, max_workers
+        pool = _RENDER_POOL
+        _RENDER_POOL_USERS += 1
+    try:
+        yield pool
+    finally:
+        with _RENDER_LOCK:
+            _RENDER_POOL_USERS -= 1
+
+
+def _discard_render_pool(pool):
+    """丢弃已损坏的进程池（仍是当前池时）；下次渲染时重新创建"""
+    global _RENDER_POOL, _RENDER_POOL_SIZE
+    with _RENDER_LOCK:
+        if _RENDER_POOL is pool:
+            _RENDER_POOL, _RENDER_POOL_SIZE = None, 0
+    pool.shutdown(wait=False)
+
+
+def shutdown_render_pool():
+    """关闭共享渲染进程池"""
+    global _RENDER_POOL, _RENDER_POOL_SIZE
+    with _RENDER_LOCK:
+        pool, _RENDER_POOL, _RENDER_POOL_SIZE = _RENDER_POOL, None, 0
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def default_render_workers() -> int:
+    """默认渲染进程数：SMART_LAB_RENDER_WORKERS，未设置时为 CPU 核数"""
+    return int(os.environ.get("SMART_LAB_RENDER_WORKERS", 0)) or os.cpu_count() or 1
+
+
+@traced("chart.render_batch")
+def render_charts(data: pd.DataFrame, configs: List[ChartConfig],
+                  max_workers: int = None) -> List[Dict[str, str]]:
+    """一次提交报告中的全部图表，在进程池中并行渲染
+    
+    每个配置需填好 x_col / y_cols（见 recommend_charts）。结果顺序与 configs 一致。
+    单个图表、max_workers=1 或无法创建进程池时退回当前进程顺序渲染。
+    
+    Args:
+        data: DataFrame 或 SharedDataHandle；数值部分较大的 DataFrame
+            自动放入共享内存（见 shared_frame），子进程零拷贝映射
+        max_workers: 进程数，默认 min(图表数, CPU 核数)；
+            环境变量 SMART_LAB_RENDER_WORKERS 可覆盖默认值
+    """
+    if not configs:
+        return []
+    workers = min(len(configs), max_workers or default_render_workers())
+    if workers <= 1:
+        generator = ChartGenerator(data)
+        return [generator.render(config) for config in configs]
+    
+    pool = None
+    try:
+        with _render_pool(workers) as pool, shared_frame(data) as source:
+            if isinstance(source, SharedDataHandle):
+                # 大数据集放入共享内存，子进程直接映射
+                jobs = [source] * len(configs)
+            else:
+                jobs = []
+                for config in configs:
+                    needed = dict.fromkeys([config.x_col, *config.y_cols])
+                    jobs.append({col: source[col].to_numpy() for col in needed if col})
+            futures = [pool.submit(_render_worker, cols, config) for cols, config in zip(jobs, configs)]
+            return [future.result() for future in futures]
+    except (OSError, RuntimeError) as e:
+        # BrokenProcessPool 是 RuntimeError 的子类；受限环境可能禁止创建子进程
+        print(f"⚠️ 并行渲染不可用，改为顺序渲染: {e}")
+        if isinstance(e, BrokenProcessPool) and pool is not None:
+            _discard_render_pool(pool)
+        generator = ChartGenerator(data)
+        return [generator.render(config) for config in configs]
+
+
+atexit.register(shutdown_render_pool)
 
 
 # 便捷函数
@@ -0,0 +1,262 @@
+# 🧪 数据解析缓存 - 列式缓存文件 / 内存映射读取 / LRU 容量淘汰
+# Parsed Data Cache - Columnar cache files, memory-mapped reads, LRU eviction
+
+"""
+反复对同一个 CSV / XLSX 生成报告时，pd.read_excel 每次都要数秒。
+本模块把解析后的 DataFrame 缓存为列式文件：
+
+- 安装 pyarrow 时使用 Feather（Arrow IPC），读取时内存映射
+- 否则退回 pickle（数值列仍为整块二进制，读取同样很快）
+
+索引按绝对路径记录 (mtime_ns, size, 内容哈希)；mtime 与大小都未变时
+直接命中，无需重新读文件；未命中时计算内容哈希作为缓存文件名，
+内容相同的文件共享同一个缓存。总大小超过上限时按最近使用时间淘汰。
+索引的读取-修改-写回在文件锁（index.lock）内进行，多个进程
+（例如并行批量任务）同时写入时不会互相覆盖。
+
+环境变量:
+    SMART_LAB_CACHE_DIR     缓存目录（默认 ~/.cache/smart-lab-report/data）
+    SMART_LAB_CACHE_MAX_MB  容量上限（默认 512）
+    SMART_LAB_NO_CACHE=1    禁用缓存
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import contextlib
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+import pandas as pd
+
+from .io_utils import atomic_path, atomic_write_text, file_lock
+
+ARROW_AVAILABLE = True
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    ARROW_AVAILABLE = False
+
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "smart-lab-report" / "data"
+DEFAULT_MAX_MB = 512
+
+
+def read_data_file(data_path: str) -> pd.DataFrame:
+    """按扩展名解析数据文件（CSV / Excel / JSON）"""
+    ext = Path(data_path).suffix.lower()
+    if ext == '.csv':
+        return pd.read_csv(data_path)
+    if ext in ('.xlsx', '.xls'):
+        return pd.read_excel(data_path)
+    if ext == '.json':
+        return pd.read_json(data_path)
+    raise ValueError(f"不支持格式: {ext}")
+
+
+def file_hash(path: Path) -> str:
+    """文件内容哈希（分块读取）"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DataCache:
+    """解析结果缓存"""
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = Path(cache_dir or os.environ.get("SMART_LAB_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("SMART_LAB_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # 索引读写
+
+    def _index_path(self) -> Path:
+        return self.cache_dir / self.INDEX_FILE
+
+    def _index_lock(self):
+        """线程锁 + 跨进程文件锁，保护索引的读取-修改-写回"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        stack = contextlib.ExitStack()
+        stack.enter_context(self._lock)
+        stack.enter_context(file_lock(self.cache_dir / self.LOCK_FILE))
+        return stack
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self._index_path().read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index: Dict[str, Dict[str, Any]]):
+        self.cache_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        atomic_write_text(self._index_path(), json.dumps(index, ensure_ascii=False))
+
+    # 缓存文件格式
+
+    def _write_frame(self, data: pd.DataFrame, target: Path) -> str:
+        """写入缓存文件，返回格式名；先写临时文件再原子替换"""
+        fmt = "pickle"
+        with atomic_path(target) as tmp:
+            if ARROW_AVAILABLE:
+                try:
+                    # Feather 要求默认索引与字符串列名
+                    data.reset_index(drop=True).to_feather(tmp)
+                    fmt = "feather"
+                except (ValueError, TypeError, pyarrow.ArrowException):
+                    fmt = "pickle"
+            if fmt == "pickle":
+                data.to_pickle(tmp)
+        return fmt
+
+    @staticmethod
+    def _read_frame(path: Path, fmt: str) -> pd.DataFrame:
+        if fmt == "feather":
+            return pd.read_feather(path, memory_map=True)
+        return pd.read_pickle(path)
+
+    # 公共接口
+
+    def get(self, data_path: str) -> Optional[pd.DataFrame]:
+        """mtime 与大小均未变化时返回缓存的 DataFrame，否则返回 None"""
+        source = Path(data_path).resolve()
+        try:
+            stat = source.stat()
+        except OSError:
+            return None
+
+        if not self._index_path().exists():
+            return None
+        with self._index_lock():
+            index = self._read_index()
+            entry = index.get(str(source))
+            if not entry or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                return None
+            try:
+                data = self._read_frame(self.cache_dir / entry["file"], entry["format"])
+            except Exception:
+                # 缓存文件丢失或损坏：视为未命中
+                index.pop(str(source), None)
+                self._write_index(index)
+                return None
+            entry["last_used"] = time.time()
+            self._write_index(index)
+        return data
+
+    def put(self, data_path: str, data: pd.DataFrame):
+        """缓存解析结果"""
+        source = Path(data_path).resolve()
+        stat = source.stat()
+        digest = file_hash(source)
+
+        with self._index_lock():
+            index = self._read_index()
+            # 内容相同的文件共享缓存
+            shared = next((e for e in index.values() if e["hash"] == digest), None)
+            if shared and (self.cache_dir / shared["file"]).exists():
+                file_name, fmt, nbytes = shared["file"], shared["format"], shared["bytes"]
+            else:
+                file_name = f"{digest}.cache"
+                fmt = self._write_frame(data, self.cache_dir / file_name)
+                nbytes = (self.cache_dir / file_name).stat().st_size
+
+            index[str(source)] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": digest,
+                "file": file_name,
+                "format": fmt,
+                "bytes": nbytes,
+                "last_used": time.time(),
+            }
+            self._evict(index)
+            self._write_index(index)
+
+    def load(self, data_path: str, reader: Callable[[str], pd.DataFrame] = read_data_file) -> pd.DataFrame:
+        """命中则读缓存，否则解析并写入缓存"""
+        data = self.get(data_path)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = reader(data_path)
+        try:
+            self.put(data_path, data)
+        except Exception as e:
+            # 缓存失败不影响正常加载
+            print(f"⚠️ 数据缓存写入失败: {e}")
+        return data
+
+    def _evict(self, index: Dict[str, Dict[str, Any]]):
+        """按最近使用时间淘汰，直到总大小不超过上限"""
+        files: Dict[str, Dict[str, Any]] = {}
+        for entry in index.values():
+            info = files.setdefault(entry["file"], {"bytes": entry["bytes"], "last_used": 0.0})
+            info["last_used"] = max(info["last_used"], entry["last_used"])
+
+        total = sum(info["bytes"] for info in files.values())
+        for file_name, info in sorted(files.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            (self.cache_dir / file_name).unlink(missing_ok=True)
+            for key in [k for k, e in index.items() if e["file"] == file_name]:
+                del index[key]
+            total -= info["bytes"]
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的缓存文件数"""
+        removed = 0
+        if not self.cache_dir.exists():
+            return removed
+        with self._index_lock():
+            for path in self.cache_dir.iterdir():
+                temporary = ".tmp" in path.name  # 中断的原子写入残留
+                if path.suffix == ".cache" or temporary or path.name == self.INDEX_FILE:
+                    path.unlink(missing_ok=True)
+                    removed += path.suffix == ".cache" and not temporary
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        index = self._read_index()
+        files = {e["file"]: e["bytes"] for e in index.values()}
+        return {
+            "entries": len(index),
+            "files": len(files),
+            "bytes": sum(files.values()),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "format": "feather" if ARROW_AVAILABLE else "pickle",
+        }
+
+
+_DEFAULT_CACHE: Optional[DataCache] = None
+
+
+def get_data_cache() -> DataCache:
+    """进程内共享的默认缓存"""
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = DataCache()
+    return _DEFAULT_CACHE
+
+
+def load_dataframe(data_path: str, use_cache: bool = True) -> pd.DataFrame:
+    """加载数据文件（带解析缓存）"""
+    if not use_cache or os.environ.get("SMART_LAB_NO_CACHE") == "1":
+        return read_data_file(data_path)
+    # 先校验格式，避免为不支持的文件计算哈希
+    if Path(data_path).suffix.lower() not in ('.csv', '.xlsx', '.xls', '.json'):
+        return read_data_file(data_path)
+    return get_data_cache().load(data_path)
@@ -0,0 +1,151 @@
+# 🧪 数据画像与图表推荐 - 单次遍历列统计 / 自动选择图表
+# Data Profiling & Chart Recommendation - Single-pass column stats
+
+"""
+profile_columns 对所有数值列一次性（向量化）计算：
+计数、缺失、均值、标准差、极值、唯一值个数、单调性、采样间隔规律性。
+
+recommend_charts 基于同一份画像推荐图表：
+- 单调性最强的列作为自变量 X
+- 采样间隔规则（如时间序列、等步长扫描）用折线图，否则用散点图
+- 找不到自变量时（重复测量数据）用直方图展示分布
+- 多个因变量时合并为一张子图网格
+"""
+
+import warnings
+from typing import Dict, List, Any, Optional
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+
+from .chart_generator import ChartConfig
+from .shared_data import resolve_data
+
+
+@dataclass
+class ColumnProfile:
+    """单列画像"""
+    name: str
+    kind: str  # numeric, categorical
+    count: int = 0
+    null_count: int = 0
+    unique_count: int = 0
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    monotonicity: float = 0.0  # 相邻差分符号均值: 1 严格递增, -1 严格递减
+    regular: bool = False  # 相邻间隔变异系数 < 5%
+    top_values: Dict[Any, int] = field(default_factory=dict)
+
+
+MONOTONIC_THRESHOLD = 0.95
+REGULAR_CV = 0.05
+
+
+def _float(value) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def profile_columns(data: pd.DataFrame) -> Dict[str, ColumnProfile]:
+    """单次遍历生成所有列的画像（按原列顺序）"""
+    numeric_cols = [c for c in data.columns if pd.api.types.is_numeric_dtype(data[c])]
+    profiles: Dict[str, ColumnProfile] = {}
+
+    if numeric_cols:
+        values = data[numeric_cols].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # 全空列的 nanmean 等
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0, ddof=1)
+            vmin = np.nanmin(values, axis=0)
+            vmax = np.nanmax(values, axis=0)
+
+            # 排序一次得到唯一值个数（NaN 排在末尾）
+            ordered = np.sort(values, axis=0)
+            changes = (np.diff(ordered, axis=0) != 0) & ~np.isnan(ordered[1:])
+            unique = changes.sum(axis=0) + (count > 0)
+
+            # 相邻差分：单调性与间隔规律性
+            if len(values) > 1:
+                step = np.diff(values, axis=0)
+                mono = np.nan_to_num(np.nanmean(np.sign(step), axis=0))
+                spacing_cv = np.nanstd(step, axis=0) / np.abs(np.nanmean(step, axis=0))
+                regular = np.nan_to_num(spacing_cv, nan=np.inf) < REGULAR_CV
+            else:
+                mono = np.zeros(len(numeric_cols))
+                regular = np.zeros(len(numeric_cols), dtype=bool)
+
+        for j, col in enumerate(numeric_cols):
+            profiles[col] = ColumnProfile(
+                name=col,
+                kind="numeric",
+                count=int(count[j]),
+                null_count=int(len(values) - count[j]),
+                unique_count=int(unique[j]),
+                mean=_float(mean[j]),
+                std=_float(std[j]),
+                min=_float(vmin[j]),
+                max=_float(vmax[j]),
+                monotonicity=float(mono[j]),
+                regular=bool(regular[j]),
+            )
+
+    for col in data.columns:
+        if col in profiles:
+            continue
+        col_data = data[col]
+        profiles[col] = ColumnProfile(
+            name=col,
+            kind="categorical",
+            count=int(col_data.notna().sum()),
+            null_count=int(col_data.isnull().sum()),
+            unique_count=int(col_data.nunique()),
+            top_values=col_data.value_counts().head(5).to_dict(),
+        )
+
+    return {col: profiles[col] for col in data.columns}
+
+
+def recommend_charts(data: pd.DataFrame, profile: Dict[str, ColumnProfile] = None,
+                     max_series: int = 12) -> List[ChartConfig]:
+    """根据列画像推荐图表配置
+
+    Args:
+        data: DataFrame 或 SharedDataHandle
+        profile: 已有的画像（如 ReportGenerator.summarize_data 的结果），为空时重新计算
+        max_series: 最多绘制的因变量个数
+
+    Returns:
+        ChartConfig 列表，每项的 x_col / y_cols 已填好，可直接交给 ChartGenerator.render
+    """
+    profile = profile or profile_columns(resolve_data(data))
+    varying = [p for p in profile.values()
+               if p.kind == "numeric" and p.count > 1 and p.unique_count > 1]
+    if not varying:
+        return []
+
+    # 自变量：单调性最强（并列取靠前的列）
+    candidates = [p for p in varying if abs(p.monotonicity) >= MONOTONIC_THRESHOLD]
+    x = max(candidates, key=lambda p: abs(p.monotonicity), default=None)
+    ys = [p.name for p in varying if x is None or p.name != x.name][:max_series]
+
+    if x is None or not ys:
+        # 无自变量：展示各列分布
+        cols = [p.name for p in varying][:max_series]
+        if len(cols) == 1:
+            return [ChartConfig(title=f"{cols[0]} 分布", xlabel=cols[0], ylabel="频数",
+                                chart_type="histogram", x_col=cols[0], y_cols=cols)]
+        return [ChartConfig(title="数据分布", chart_type="histogram", layout="grid",
+                            sharex=False, x_col=cols[0], y_cols=cols)]
+
+    chart_type = "line" if x.regular and abs(x.monotonicity) == 1.0 else "scatter"
+    if len(ys) <= 2:
+        return [ChartConfig(title=f"{y} vs {x.name}", xlabel=x.name, ylabel=y,
+                            chart_type=chart_type, x_col=x.name, y_cols=[y])
+                for y in ys]
+    return [ChartConfig(title=f"{len(ys)} 个通道 vs {x.name}", xlabel=x.name,
+                        chart_type=chart_type, layout="grid", x_col=x.name, y_cols=ys)]
@@ -0,0 +1,284 @@
+# 🧪 误差分析引擎 - 全列向量化 / 稳健统计 / 分块处理
+# Error Analysis Engine - Vectorized, robust, chunk-capable
+
+"""
+对所有数值列同时计算：
+- 均值、样本标准差、中位数、MAD（稳健标准差）
+- A 类不确定度 s/√n、B 类不确定度 Δ/√3（均匀分布）及合成、扩展不确定度
+- 相对参考值的相对误差
+- Grubbs 检验与 Chauvenet 准则的异常值
+
+大数据集可通过 analyze_chunks 分块处理：第一遍合并各块的矩，
+第二遍用全局均值 / 标准差判定异常值。
+"""
+
+import math
+from typing import Dict, List, Any, Optional, Iterable, Callable
+import numpy as np
+import pandas as pd
+
+
+def _t_ppf(p: float, df: int) -> float:
+    """Student t 分布分位数
+
+    有 scipy 时直接调用；否则 df=1、2 用解析式，其余用 Cornish-Fisher 展开。
+    """
+    try:
+        from scipy import stats
+        return float(stats.t.ppf(p, df))
+    except ImportError:
+        pass
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    from statistics import NormalDist
+    z = NormalDist().inv_cdf(p)
+    v = float(df)
+    return (z
+            + (z ** 3 + z) / (4 * v)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * v ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * v ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * v ** 4))
+
+
+def grubbs_critical(n: int, alpha: float = 0.05) -> float:
+    """双侧 Grubbs 检验临界值"""
+    if n < 3:
+        return float("inf")
+    t = _t_ppf(1 - alpha / (2 * n), n - 2)
+    return (n - 1) / math.sqrt(n) * math.sqrt(t * t / (n - 2 + t * t))
+
+
+class ErrorAnalyzer:
+    """误差分析器"""
+
+    MAD_SCALE = 1.4826  # 正态分布下 MAD → σ
+
+    def __init__(self, alpha: float = 0.05, max_grubbs_iter: int = 10):
+        self.alpha = alpha
+        self.max_grubbs_iter = max_grubbs_iter
+
+    @staticmethod
+    def _numeric(data: pd.DataFrame, columns: List[str] = None) -> pd.DataFrame:
+        if columns:
+            return data[columns].apply(pd.to_numeric, errors='coerce')
+        return data.select_dtypes(include=['number'])
+
+    def _uncertainty(self, cols, n, mean, std, reference, type_b) -> Dict[str, Dict[str, Any]]:
+        """不确定度与相对误差（向量化，返回逐列结果）"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            type_a = std / np.sqrt(n)
+            tol = np.array([float((type_b or {}).get(c, 0.0)) for c in cols])
+            type_b_u = tol / math.sqrt(3)
+            combined = np.sqrt(type_a ** 2 + type_b_u ** 2)
+            cv = np.where(mean != 0, std / np.abs(mean) * 100, np.nan)
+            ref = np.array([float((reference or {}).get(c, np.nan)) for c in cols])
+            rel = np.where(ref != 0, np.abs(mean - ref) / np.abs(ref) * 100, np.nan)
+
+        out = {}
+        for j, c in enumerate(cols):
+            out[c] = {
+                "n": int(n[j]),
+                "mean": _clean(mean[j]),
+                "std": _clean(std[j]),
+                "cv_percent": _clean(cv[j]),
+                "type_a": _clean(type_a[j]),
+                "type_b": _clean(type_b_u[j]),
+                "combined_uncertainty": _clean(combined[j]),
+                "expanded_uncertainty": _clean(2 * combined[j]),  # k=2，约 95% 置信
+                "reference": _clean(ref[j]),
+                "relative_error_percent": _clean(rel[j]),
+            }
+        return out
+
+    def _grubbs(self, values: np.ndarray) -> List[List[int]]:
+        """迭代 Grubbs 检验，所有列同时进行；返回逐列异常值位置"""
+        work = values.copy()
+        flagged: List[List[int]] = [[] for _ in range(work.shape[1])]
+        active = np.ones(work.shape[1], dtype=bool)
+        for _ in range(self.max_grubbs_iter):
+            n = np.sum(~np.isnan(work), axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.nanmean(work, axis=0)
+                std = np.nanstd(work, axis=0, ddof=1)
+                dev = np.abs(work - mean) / std
+            dev = np.where(np.isnan(dev), -np.inf, dev)
+            idx = np.argmax(dev, axis=0)
+            g = dev[idx, np.arange(work.shape[1])]
+            crit = np.array([grubbs_critical(int(k), self.alpha) for k in n])
+            hit = active & (g > crit) & np.isfinite(g)
+            if not hit.any():
+                break
+            for j in np.flatnonzero(hit):
+                flagged[j].append(int(idx[j]))
+                work[idx[j], j] = np.nan
+            active &= hit
+        return flagged
+
+    @staticmethod
+    def _chauvenet_mask(values: np.ndarray, mean, std, n) -> np.ndarray:
+        """Chauvenet 准则：期望出现次数 n·P(|Z|>d) < 0.5 的点判为异常
+
+        等价于 d > Φ⁻¹(1 - 0.25/n)，每列只需计算一次阈值。
+        """
+        from statistics import NormalDist
+        inv = NormalDist().inv_cdf
+        threshold = np.array([inv(1 - 0.25 / k) if k > 0 else np.inf for k in np.atleast_1d(n)])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            d = np.abs(values - mean) / std
+        return np.nan_to_num(d, nan=0.0, posinf=0.0) > threshold
+
+    def analyze(self, data: pd.DataFrame, columns: List[str] = None,
+                reference: Dict[str, float] = None,
+                type_b: Dict[str, float] = None) -> Dict[str, Dict[str, Any]]:
+        """分析所有（或指定）数值列
+
+        Args:
+            reference: 各列参考值（理论值），用于计算相对误差
+            type_b: 各列仪器允差 Δ，B 类不确定度按 Δ/√3 计算
+        """
+        frame = self._numeric(data, columns)
+        cols = frame.columns.tolist()
+        if not cols:
+            return {}
+        values = frame.to_numpy(dtype=float)
+
+        n = np.sum(~np.isnan(values), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0, ddof=1)
+            median = np.nanmedian(values, axis=0)
+            mad = np.nanmedian(np.abs(values - median), axis=0) * self.MAD_SCALE
+
+        result = self._uncertainty(cols, n, mean, std, reference, type_b)
+        grubbs = self._grubbs(values)
+        chauvenet = self._chauvenet_mask(values, mean, std, n)
+        index = frame.index
+
+        for j, c in enumerate(cols):
+            result[c].update({
+                "median": _clean(median[j]),
+                "mad": _clean(mad[j]),
+                "grubbs_outliers": index[grubbs[j]].tolist(),
+                "chauvenet_outliers": index[chauvenet[:, j]].tolist(),
+            })
+        return result
+
+    def analyze_chunks(self, chunk_source: Callable[[], Iterable[pd.DataFrame]],
+                       columns: List[str] = None,
+                       reference: Dict[str, float] = None,
+                       type_b: Dict[str, float] = None,
+                       sample_size: int = 100000, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+        """分块分析大数据集
+
+        Args:
+            chunk_source: 每次调用返回一个新的分块迭代器，
+                例如 lambda: pd.read_csv(path, chunksize=100000)
+            sample_size: 中位数 / MAD 使用的蓄水池样本大小（近似值）
+
+        第一遍用 Chan 并行算法合并各块的 (n, 均值, M2) 并维护蓄水池样本；
+        第二遍用全局统计量做 Chauvenet 判定与单次 Grubbs 检验。
+        未指定 columns 时取第一块的数值列，后续分块中这些列的非数值内容按缺失处理。
+        """
+        rng = np.random.default_rng(seed)
+        cols = None
+        count = mean = m2 = None
+        reservoir, seen = None, 0
+
+        for chunk in chunk_source():
+            # 列集合由第一块确定，之后各块按这些列强制转为数值（偶发的文本单元格记为缺失）
+            frame = self._numeric(chunk, columns if cols is None else cols)
+            if cols is None:
+                cols = frame.columns.tolist()
+                k = len(cols)
+                count, mean, m2 = np.zeros(k), np.zeros(k), np.zeros(k)
+                reservoir = np.empty((0, k))
+            values = frame[cols].to_numpy(dtype=float)
+            if len(values) == 0:
+                continue
+
+            # Chan 合并
+            cb = np.sum(~np.isnan(values), axis=0)
+            with np.errstate(invalid='ignore'):
+                mb = np.where(cb > 0, np.nanmean(values, axis=0), 0.0)
+                m2b = np.nansum((values - mb) ** 2, axis=0)
+            total = count + cb
+            delta = mb - mean
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(total > 0, mean + delta * cb / total, 0.0)
+                m2 = m2 + m2b + np.where(total > 0, delta ** 2 * count * cb / total, 0.0)
+            count = total
+
+            # 蓄水池抽样（按行）
+            if len(reservoir) < sample_size:
+                take = values[:sample_size - len(reservoir)]
+                reservoir = np.vstack([reservoir, take])
+                rest = values[len(take):]
+                seen += len(take)
+            else:
+                rest = values
+            if len(rest):
+                positions = seen + np.arange(1, len(rest) + 1)
+                slots = (rng.random(len(rest)) * positions).astype(np.int64)
+                keep = slots < sample_size
+                reservoir[slots[keep]] = rest[keep]
+                seen += len(rest)
+
+        if cols is None:
+            return {}
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(m2 / (count - 1))
+            median = np.nanmedian(reservoir, axis=0)
+            mad = np.nanmedian(np.abs(reservoir - median), axis=0) * self.MAD_SCALE
+
+        result = self._uncertainty(cols, count, mean, std, reference, type_b)
+
+        # 第二遍：全局统计量下的异常值
+        chauvenet = [[] for _ in cols]
+        max_dev = np.full(len(cols), -np.inf)
+        max_pos = [None] * len(cols)
+        for chunk in chunk_source():
+            frame = self._numeric(chunk, cols)[cols]
+            values = frame.to_numpy(dtype=float)
+            mask = self._chauvenet_mask(values, mean, std, count)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                dev = np.abs(values - mean) / std
+            dev = np.where(np.isnan(dev), -np.inf, dev)
+            for j in range(len(cols)):
+                chauvenet[j].extend(frame.index[mask[:, j]].tolist())
+            if len(values):
+                idx = np.argmax(dev, axis=0)
+                best = dev[idx, np.arange(len(cols))]
+                better = best > max_dev
+                for j in np.flatnonzero(better):
+                    max_dev[j] = best[j]
+                    max_pos[j] = frame.index[idx[j]]
+
+        for j, c in enumerate(cols):
+            crit = grubbs_critical(int(count[j]), self.alpha)
+            result[c].update({
+                "median": _clean(median[j]),
+                "mad": _clean(mad[j]),
+                "median_approximate": bool(seen > sample_size),
+                "grubbs_outliers": [max_pos[j]] if max_dev[j] > crit else [],
+                "chauvenet_outliers": chauvenet[j],
+            })
+        return result
+
+
+def _clean(value) -> Optional[float]:
+    """NaN / inf 转为 None，便于 JSON 输出"""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+# 便捷函数
+def analyze_errors(data_path: str, chunksize: int = 0, **kwargs) -> Dict[str, Dict[str, Any]]:
+    """分析数据文件的误差；chunksize > 0 时分块读取 CSV"""
+    analyzer = ErrorAnalyzer()
+    if chunksize and data_path.endswith('.csv'):
+        return analyzer.analyze_chunks(lambda: pd.read_csv(data_path, chunksize=chunksize), **kwargs)
+    data = pd.read_csv(data_path) if data_path.endswith('.csv') else pd.read_excel(data_path)
+    return analyzer.analyze(data, **kwargs)
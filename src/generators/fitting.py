@@ -0,0 +1,227 @@
+# 🧪 不确定度拟合 - 加权最小二乘 / 正交距离回归 / 自助法置信带
+# Uncertainty-aware Fitting - WLS / ODR / Bootstrap confidence bands
+
+"""
+面向带测量不确定度的实验数据：
+- weighted_polyfit: 加权最小二乘（权重 1/σy²），给出参数协方差
+- odr_polyfit: x、y 均有误差时的正交距离回归
+  （安装 scipy 时使用 scipy.odr，否则使用有效方差迭代法）
+- bootstrap_band: 向量化自助法置信带，重采样分块批量求解
+"""
+
+from typing import Dict, List, Any, Optional
+from dataclasses import dataclass, field
+import numpy as np
+
+# 自助法每块的重采样矩阵元素上限（n_boot × n × p），约 64 MB float64
+BOOTSTRAP_CHUNK_ELEMENTS = 8_000_000
+
+
+@dataclass
+class FitResult:
+    """拟合结果"""
+    method: str                          # wls, odr
+    degree: int
+    params: List[float] = field(default_factory=list)      # 从高次到低次（np.polyfit 约定）
+    std_errors: List[float] = field(default_factory=list)  # 传播后的参数不确定度
+    covariance: List[List[float]] = field(default_factory=list)
+    chi2: float = 0.0
+    dof: int = 0
+    reduced_chi2: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "degree": self.degree,
+            "coefficients": self.params,
+            "std_errors": self.std_errors,
+            "covariance": self.covariance,
+            "chi2": self.chi2,
+            "dof": self.dof,
+            "reduced_chi2": self.reduced_chi2,
+        }
+
+
+def _scale(x: np.ndarray):
+    """x 缩放到 [-1, 1]，返回 (m, h)"""
+    m = (np.max(x) + np.min(x)) / 2
+    h = (np.max(x) - np.min(x)) / 2 or 1.0
+    return m, h
+
+
+def _basis_transform(degree: int, m: float, h: float) -> np.ndarray:
+    """缩放基系数（低次在前）到原始基系数的线性变换矩阵"""
+    from math import comb
+    T = np.zeros((degree + 1, degree + 1))
+    for j in range(degree + 1):
+        for i in range(j + 1):
+            T[i, j] = comb(j, i) * (-m) ** (j - i) / h ** j
+    return T
+
+
+def _check_sigma(sigma: Optional[np.ndarray], n: int) -> np.ndarray:
+    if sigma is None:
+        return np.ones(n)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), (n,))
+    if np.any(~np.isfinite(sigma)) or np.any(sigma <= 0):
+        raise ValueError("不确定度必须为正的有限值")
+    return sigma
+
+
+def _wls(x, y, sigma_y, degree, absolute_sigma):
+    """加权最小二乘核心，返回 (原始基系数低次在前, 协方差, chi2)"""
+    n = len(x)
+    p = degree + 1
+    m, h = _scale(x)
+    V = np.vander((x - m) / h, p, increasing=True)
+    w = 1.0 / sigma_y
+
+    q, r = np.linalg.qr(V * w[:, None])
+    coef_t = np.linalg.solve(r, q.T @ (y * w))
+    chi2 = float(np.sum(((y - V @ coef_t) * w) ** 2))
+
+    r_inv = np.linalg.inv(r)
+    T = _basis_transform(degree, m, h)
+    cov = T @ (r_inv @ r_inv.T) @ T.T
+    if not absolute_sigma and n > p:
+        cov = cov * chi2 / (n - p)
+    return T @ coef_t, cov, chi2
+
+
+def _result(method, degree, coef_low, cov, chi2, n) -> FitResult:
+    dof = n - (degree + 1)
+    # 转为从高次到低次
+    order = slice(None, None, -1)
+    cov_high = cov[order, order]
+    return FitResult(
+        method=method,
+        degree=degree,
+        params=coef_low[order].tolist(),
+        std_errors=np.sqrt(np.diag(cov_high)).tolist(),
+        covariance=cov_high.tolist(),
+        chi2=chi2,
+        dof=dof,
+        reduced_chi2=chi2 / dof if dof > 0 else float("nan"),
+    )
+
+
+def weighted_polyfit(x, y, sigma_y=None, degree: int = 1,
+                     absolute_sigma: bool = True) -> FitResult:
+    """加权多项式最小二乘
+
+    Args:
+        sigma_y: y 的标准不确定度（标量或逐点），None 表示等权
+        absolute_sigma: True 时协方差直接由 σ 传播；False 时按约化 χ² 缩放
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= degree:
+        raise ValueError(f"数据点不足，无法进行 {degree} 次拟合")
+    absolute_sigma = absolute_sigma and sigma_y is not None
+    sigma_y = _check_sigma(sigma_y, len(x))
+    coef, cov, chi2 = _wls(x, y, sigma_y, degree, absolute_sigma)
+    return _result("wls", degree, coef, cov, chi2, len(x))
+
+
+def odr_polyfit(x, y, sigma_x=None, sigma_y=None, degree: int = 1,
+                max_iter: int = 50, tol: float = 1e-10, use_scipy: bool = True) -> FitResult:
+    """正交距离回归（x、y 均有误差）
+
+    有 scipy 时使用 scipy.odr（use_scipy=False 可关闭）；否则使用有效方差法迭代：
+    σ_eff² = σy² + (f'(x)·σx)²，再做加权最小二乘直到系数收敛。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= degree:
+        raise ValueError(f"数据点不足，无法进行 {degree} 次拟合")
+    sigma_x = _check_sigma(sigma_x, n) if sigma_x is not None else np.zeros(n)
+    sigma_y = _check_sigma(sigma_y, n)
+
+    if use_scipy:
+        try:
+            from scipy import odr
+        except ImportError:
+            odr = None
+        if odr is not None:
+            return _odr_scipy(odr, x, y, sigma_x, sigma_y, degree)
+
+    sigma_eff = sigma_y
+    coef = None
+    for _ in range(max_iter):
+        new_coef, cov, chi2 = _wls(x, y, sigma_eff, degree, True)
+        slope = np.polyval(np.polyder(new_coef[::-1]), x) if degree > 0 else np.zeros(n)
+        sigma_eff = np.sqrt(sigma_y ** 2 + (slope * sigma_x) ** 2)
+        if coef is not None and np.allclose(new_coef, coef, rtol=tol, atol=0):
+            coef = new_coef
+            break
+        coef = new_coef
+    return _result("odr", degree, coef, cov, chi2, n)
+
+
+def _odr_scipy(odr, x, y, sigma_x, sigma_y, degree) -> FitResult:
+    """scipy.odr 实现；cov_beta 未按残差方差缩放，与 σ 绝对传播一致"""
+    model = odr.Model(lambda beta, t: np.polyval(beta, t))
+    start = np.polyfit(x, y, degree)
+    data = odr.RealData(x, y, sx=sigma_x if sigma_x.all() else None, sy=sigma_y)
+    output = odr.ODR(data, model, beta0=start).run()
+    cov = np.asarray(output.cov_beta)
+    coef_low = np.asarray(output.beta)[::-1]
+    return _result("odr", degree, coef_low, cov[::-1, ::-1], float(output.sum_square), len(x))
+
+
+def bootstrap_band(x, y, sigma_y=None, degree: int = 1, n_boot: int = 10000,
+                   x_grid=None, level: float = 0.95, seed: Optional[int] = 0) -> Dict[str, Any]:
+    """自助法置信带（向量化）
+
+    重采样按块处理（每块不超过 BOOTSTRAP_CHUNK_ELEMENTS 个元素），块内用
+    einsum 构造全部正规方程，再通过批量 np.linalg.solve 同时求解系数，
+    内存占用与 n_boot 无关。
+
+    Returns:
+        {"x", "lower", "upper", "median", "params_std"}
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n, p = len(x), degree + 1
+    w = 1.0 / _check_sigma(sigma_y, n) ** 2
+
+    m, h = _scale(x)
+    V = np.vander((x - m) / h, p, increasing=True)
+    x_grid = np.linspace(x.min(), x.max(), 100) if x_grid is None else np.asarray(x_grid, dtype=float)
+    G = np.vander((x_grid - m) / h, p, increasing=True)
+
+    rng = np.random.default_rng(seed)
+    chunk = max(1, BOOTSTRAP_CHUNK_ELEMENTS // (n * p))
+    coef_t = np.empty((n_boot, p))
+    for start in range(0, n_boot, chunk):
+        stop = min(start + chunk, n_boot)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        Vb, wb, yb = V[idx], w[idx], y[idx]
+
+        gram = np.einsum('bnp,bn,bnq->bpq', Vb, wb, Vb)
+        rhs = np.einsum('bnp,bn,bn->bp', Vb, wb, yb)
+        # 极小的岭项防止退化重采样（例如所有点 x 相同）导致奇异
+        ridge = 1e-12 * np.trace(gram, axis1=1, axis2=2)[:, None, None] * np.eye(p)
+        coef_t[start:stop] = np.linalg.solve(gram + ridge, rhs[..., None])[..., 0]
+
+    curves = coef_t @ G.T
+    alpha = (1 - level) / 2
+    lower, median, upper = np.quantile(curves, [alpha, 0.5, 1 - alpha], axis=0)
+    coef_x = coef_t @ _basis_transform(degree, m, h).T
+
+    return {
+        "x": x_grid.tolist(),
+        "lower": lower.tolist(),
+        "upper": upper.tolist(),
+        "median": median.tolist(),
+        "params_std": coef_x.std(axis=0, ddof=1)[::-1].tolist(),
+    }
+
+
+def weighted_mean(values, sigma) -> Dict[str, float]:
+    """加权平均及其不确定度"""
+    values = np.asarray(values, dtype=float)
+    w = 1.0 / _check_sigma(sigma, len(values)) ** 2
+    mean = float(np.sum(w * values) / np.sum(w))
+    return {"weighted_mean": mean, "weighted_mean_uncertainty": float(np.sqrt(1.0 / np.sum(w)))}
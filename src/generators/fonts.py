@@ -0,0 +1,237 @@
+# 🧪 中文字体解析 - 一次发现 / 结果缓存 / 显式配置
+# CJK Font Resolution - Discover once, persist to a cache file, explicit override
+
+"""
+图表需要一个能显示中文的字体。逐个探测字体路径、扫描字体目录都有开销，
+在每次启动都是全新环境的批量容器里尤其明显。本模块只在第一次发现字体，
+把结果（路径、字体名、文件指纹）写入缓存文件，之后的启动直接读取：
+
+- 缓存的字体文件被删除或修改时重新发现
+- 上次没找到中文字体时，记录字体目录（含各级子目录）的修改时间，
+  安装新字体后重新发现；该结果最多沿用 NEGATIVE_TTL 秒
+
+优先级（从高到低）:
+    configure_font(...)      代码中显式指定（CLI --font）
+    SMART_LAB_FONT           环境变量：字体文件路径或字体名
+    缓存文件                 SMART_LAB_FONT_CACHE（默认 ~/.cache/smart-lab-report/font.json）
+    自动发现                 常见安装路径 → 扫描系统字体目录
+    DejaVu Sans              兜底（中文显示为方块）
+
+注意：matplotlib 自身的字体列表缓存位于 MPLCONFIGDIR，临时容器中
+可将它与 SMART_LAB_FONT_CACHE 一起指向持久化的卷。
+"""
+
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .io_utils import atomic_write_text
+
+
+FALLBACK_FONT = "DejaVu Sans"
+CACHE_VERSION = 2
+NEGATIVE_TTL = 24 * 3600  # 未找到中文字体的结果最多沿用一天
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "smart-lab-report" / "font.json"
+
+# 常见中文字体安装路径（按优先级）
+CJK_FONT_PATHS = [
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',  # 文泉驿正黑
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',  # Noto Sans CJK
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',  # 文泉驿微米黑
+    '/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf',
+    '/System/Library/Fonts/PingFang.ttc',  # macOS
+    '/System/Library/Fonts/STHeiti Medium.ttc',
+    '/Library/Fonts/Arial Unicode.ttf',
+    'C:/Windows/Fonts/msyh.ttc',  # 微软雅黑
+    'C:/Windows/Fonts/simhei.ttf',  # 黑体
+]
+
+# 扫描字体目录时按文件名识别中文字体
+CJK_NAME_HINTS = ("cjk", "wqy", "wenquanyi", "droidsansfallback", "sourcehansans",
+                  "notosanssc", "pingfang", "heiti", "msyh", "simhei", "simsun")
+
+FONT_DIRS = [
+    '/usr/share/fonts',
+    '/usr/local/share/fonts',
+    str(Path.home() / '.fonts'),
+    str(Path.home() / '.local' / 'share' / 'fonts'),
+    '/System/Library/Fonts',
+    '/Library/Fonts',
+    'C:/Windows/Fonts',
+]
+FONT_SUFFIXES = ('.ttf', '.ttc', '.otf')
+
+
+@dataclass
+class FontConfig:
+    """解析得到的图表字体"""
+    name: str = FALLBACK_FONT
+    path: str = ""  # 字体文件路径；为空表示按字体名查找
+    source: str = "fallback"  # explicit / env / cache / discovered / fallback
+
+    @property
+    def is_cjk(self) -> bool:
+        return self.source != "fallback"
+
+
+_EXPLICIT: Optional[FontConfig] = None
+_RESOLVED: Optional[FontConfig] = None
+_LOCK = threading.Lock()
+
+
+def font_cache_path() -> Path:
+    return Path(os.environ.get("SMART_LAB_FONT_CACHE") or DEFAULT_CACHE_PATH)
+
+
+def font_family(path: str) -> str:
+    """读取字体文件中的字体名（.ttc 取第一个字体），失败时用文件名"""
+    try:
+        from matplotlib.ft2font import FT2Font
+        return FT2Font(path).family_name
+    except Exception:
+        return Path(path).stem
+
+
+def _font_from_setting(value: str, source: str) -> FontConfig:
+    """字体文件路径或字体名 → FontConfig"""
+    if os.path.isfile(value):
+        return FontConfig(name=font_family(value), path=value, source=source)
+    return FontConfig(name=value, source=source)
+
+
+def configure_font(value: Optional[str] = None) -> Optional[FontConfig]:
+    """显式指定图表字体（文件路径或已安装的字体名），None 取消指定"""
+    global _EXPLICIT, _RESOLVED
+    with _LOCK:
+        _EXPLICIT = _font_from_setting(value, "explicit") if value else None
+        _RESOLVED = None
+    return _EXPLICIT
+
+
+def _dir_fingerprint(search_dirs: Sequence[str], candidates: Sequence[str] = ()) -> Dict[str, int]:
+    """字体目录及其各级子目录、候选路径所在目录的修改时间
+
+    字体常安装在子目录中（如 /usr/share/fonts/opentype/noto/），只记录顶层
+    目录时发现不了新装的字体。
+    """
+    directories = []
+    for directory in search_dirs:
+        if os.path.isdir(directory):
+            directories.extend(root for root, _, _ in os.walk(directory))
+    directories.extend(os.path.dirname(p) for p in candidates)
+    fingerprint = {}
+    for directory in directories:
+        try:
+            fingerprint[directory] = os.stat(directory).st_mtime_ns
+        except OSError:
+            continue
+    return fingerprint
+
+
+def _scan_font_dirs(search_dirs: Sequence[str]) -> Optional[str]:
+    for directory in search_dirs:
+        if not os.path.isdir(directory):
+            continue
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                lower = filename.lower().replace(" ", "").replace("-", "")
+                if lower.endswith(FONT_SUFFIXES) and any(h in lower for h in CJK_NAME_HINTS):
+                    return os.path.join(root, filename)
+    return None
+
+
+def discover_font(candidates: Sequence[str] = None, search_dirs: Sequence[str] = None) -> FontConfig:
+    """依次检查常见安装路径、扫描字体目录，找不到时返回兜底字体"""
+    candidates = CJK_FONT_PATHS if candidates is None else candidates
+    search_dirs = FONT_DIRS if search_dirs is None else search_dirs
+    path = next((p for p in candidates if os.path.isfile(p)), None) or _scan_font_dirs(search_dirs)
+    if path:
+        return FontConfig(name=font_family(path), path=path, source="discovered")
+    return FontConfig()
+
+
+def _load_cache(cache_path: Path, search_dirs: Sequence[str],
+                candidates: Sequence[str]) -> Optional[FontConfig]:
+    """读取缓存；字体文件或字体目录有变化、未找到字体的结果过期时视为失效"""
+    try:
+        record = json.loads(cache_path.read_text(encoding='utf-8'))
+        if record.get("version") != CACHE_VERSION:
+            return None
+        if record["path"]:
+            stat = os.stat(record["path"])
+            if (stat.st_mtime_ns, stat.st_size) != (record["mtime_ns"], record["size"]):
+                return None
+        elif time.time() - record["checked_at"] > NEGATIVE_TTL:
+            return None
+        elif record["dirs"] != _dir_fingerprint(search_dirs, candidates):
+            return None
+        return FontConfig(name=record["name"], path=record["path"],
+                          source="cache" if record["path"] else "fallback")
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_cache(cache_path: Path, config: FontConfig, search_dirs: Sequence[str],
+                candidates: Sequence[str]):
+    record = {"version": CACHE_VERSION, **asdict(config)}
+    if config.path:
+        stat = os.stat(config.path)
+        record.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    else:
+        record.update(dirs=_dir_fingerprint(search_dirs, candidates), checked_at=time.time())
+    try:
+        atomic_write_text(cache_path, json.dumps(record, ensure_ascii=False, indent=2))
+    except OSError:
+        pass  # 只读文件系统：仅本次进程内缓存
+
+
+def resolve_font(refresh: bool = False, cache_path: str = None,
+                 candidates: Sequence[str] = None, search_dirs: Sequence[str] = None) -> FontConfig:
+    """解析图表字体（进程内只解析一次）
+
+    Args:
+        refresh: 忽略进程内结果与缓存文件，重新发现
+        cache_path: 缓存文件路径（默认见 font_cache_path）
+        candidates / search_dirs: 覆盖默认的候选路径与扫描目录
+    """
+    global _RESOLVED
+    with _LOCK:
+        if _EXPLICIT is not None:
+            return _EXPLICIT
+        if _RESOLVED is not None and not refresh:
+            return _RESOLVED
+
+        setting = os.environ.get("SMART_LAB_FONT")
+        if setting:
+            _RESOLVED = _font_from_setting(setting, "env")
+            return _RESOLVED
+
+        candidates = CJK_FONT_PATHS if candidates is None else candidates
+        search_dirs = FONT_DIRS if search_dirs is None else search_dirs
+        cache_file = Path(cache_path) if cache_path else font_cache_path()
+        config = None if refresh else _load_cache(cache_file, search_dirs, candidates)
+        if config is None:
+            config = discover_font(candidates, search_dirs)
+            _save_cache(cache_file, config, search_dirs, candidates)
+        _RESOLVED = config
+        return config
+
+
+def apply_font(plt) -> FontConfig:
+    """把解析到的字体注册到 matplotlib 并设为默认无衬线字体"""
+    config = resolve_font()
+    if config.path:
+        import matplotlib.font_manager as fm
+        fm.fontManager.addfont(config.path)
+    families: List[str] = [config.name]
+    if config.name != FALLBACK_FONT:
+        families.append(FALLBACK_FONT)  # 缺字时退回
+    plt.rcParams['font.sans-serif'] = families
+    plt.rcParams['axes.unicode_minus'] = False
+    return config
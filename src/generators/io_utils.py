@@ -0,0 +1,107 @@
+# 🧪 文件写入工具 - 原子写入（临时文件 + 重命名）/ 跨进程文件锁
+# I/O Utilities - Atomic writes via temp file + rename, inter-process file locks
+
+"""
+报告、清单、日志等输出先写入同目录下的临时文件，fsync 后用 os.replace
+原子替换目标文件。进程在写入中途被杀死时，目标路径要么是旧版本，
+要么是完整的新版本，不会留下半截文件。
+
+原子替换只保证单次写入完整；多个进程对同一文件"读取-修改-写回"时
+用 file_lock 串行化，避免后写入者覆盖先写入者的修改。
+"""
+
+import os
+import time
+import uuid
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+PathLike = Union[str, Path]
+
+
+def _fsync_path(path: Path):
+    """把文件或目录的内容刷到磁盘（平台不支持时忽略）"""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_path(path: PathLike) -> Iterator[Path]:
+    """提供一个临时路径供写入，退出时原子替换为目标路径
+
+    临时文件保留原扩展名，按扩展名选择格式的库（如 savefig）也能使用。
+    代码块抛出异常时删除临时文件，目标文件保持不变。
+
+    用法:
+        with atomic_path("out/report.docx") as tmp:
+            doc.save(tmp)
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.stem}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp{target.suffix}")
+    try:
+        yield tmp
+        if tmp.exists():
+            _fsync_path(tmp)
+            os.replace(tmp, target)
+            _fsync_path(target.parent)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def atomic_write_bytes(path: PathLike, data: bytes):
+    """原子写入二进制内容"""
+    with atomic_path(path) as tmp:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def atomic_write_text(path: PathLike, text: str, encoding: str = 'utf-8'):
+    """原子写入文本内容"""
+    atomic_write_bytes(path, text.encode(encoding))
+
+
+@contextmanager
+def file_lock(path: PathLike) -> Iterator[None]:
+    """独占锁定 path（不存在时创建），退出时释放；进程退出时系统自动释放
+
+    POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking。
+    """
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(target), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK 重试约 10 秒后放弃，继续等待
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -0,0 +1,340 @@
+# 🧪 本地统计分析引擎 - 无需大模型
+# Local Statistical Analysis Engine - No LLM required
+
+"""
+离线环境下的主要分析路径：
+- 全部数值列的两两相关矩阵
+- 按 AIC 选择最佳拟合模型（线性 / 二次 / 三次 / 指数 / 对数）
+- 基于残差的异常点检测（MAD 稳健 z 分数）
+- 单调性检验
+
+所有 y 列共享同一设计矩阵，每种模型只做一次最小二乘求解。
+"""
+
+import warnings
+from typing import Dict, List, Any, Optional, Tuple
+from dataclasses import dataclass, field, asdict
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class ModelFit:
+    """单个模型的拟合结果"""
+    model: str                     # linear, poly2, poly3, exp, log
+    params: List[float] = field(default_factory=list)  # 设计矩阵列对应的系数
+    r_squared: float = 0.0
+    aic: float = float("inf")
+    equation: str = ""
+
+
+# 模型名 -> 中文描述
+MODEL_NAMES = {
+    "linear": "线性",
+    "poly2": "二次多项式",
+    "poly3": "三次多项式",
+    "exp": "指数",
+    "log": "对数",
+}
+
+
+class LocalStatAnalyzer:
+    """本地统计分析器"""
+
+    MODELS = ("linear", "poly2", "poly3", "exp", "log")
+    ANOMALY_Z = 3.5        # 稳健 z 分数阈值
+    MONOTONIC_LEVEL = 0.8  # 单调性得分阈值
+
+    def __init__(self, data: pd.DataFrame):
+        self.data = data
+        numeric = data.select_dtypes(include=['number']) if data is not None else pd.DataFrame()
+        self.numeric = numeric.loc[:, numeric.notna().any()]
+        self.columns = self.numeric.columns.tolist()
+        self.values = self.numeric.to_numpy(dtype=float)
+
+    def correlation_matrix(self) -> pd.DataFrame:
+        """两两 Pearson 相关矩阵"""
+        if len(self.values) < 2 or np.isnan(self.values).any():
+            return self.numeric.corr()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.corrcoef(self.values, rowvar=False)
+        return pd.DataFrame(np.atleast_2d(corr), index=self.columns, columns=self.columns)
+
+    def monotonicity(self, order_by: str = None) -> Dict[str, float]:
+        """单调性得分：相邻差分符号的均值，1 为严格递增，-1 为严格递减
+
+        默认按行顺序；指定 order_by 时先按该列升序排列（该列缺失的行不参与），
+        得分即"随该列增加"的趋势。
+        """
+        values = self.values
+        if order_by is not None:
+            x = values[:, self.columns.index(order_by)]
+            values = values[np.argsort(x, kind='stable')][:int(np.count_nonzero(~np.isnan(x)))]
+        if len(values) < 2:
+            return {col: 0.0 for col in self.columns}
+        signs = np.sign(np.diff(values, axis=0))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # 全为缺失值的列得分为 0
+            scores = np.nanmean(signs, axis=0)
+        return {col: float(np.nan_to_num(v)) for col, v in zip(self.columns, scores)}
+
+    def independent_variable(self, monotonicity: Dict[str, float] = None) -> Optional[str]:
+        """推断自变量：单调性最强的列（并列时取靠前的列）"""
+        if not self.columns:
+            return None
+        monotonicity = monotonicity or self.monotonicity()
+        return max(self.columns, key=lambda c: (abs(monotonicity[c]), -self.columns.index(c)))
+
+    def _design(self, model: str, x: np.ndarray) -> Optional[np.ndarray]:
+        """模型的设计矩阵（低次在前）"""
+        if model == "linear":
+            return np.column_stack([np.ones_like(x), x])
+        if model == "poly2":
+            return np.column_stack([np.ones_like(x), x, x ** 2])
+        if model == "poly3":
+            return np.column_stack([np.ones_like(x), x, x ** 2, x ** 3])
+        if model == "exp":
+            return np.column_stack([np.ones_like(x), x])
+        if model == "log":
+            return np.column_stack([np.ones_like(x), np.log(x)]) if np.all(x > 0) else None
+        return None
+
+    @staticmethod
+    def _equation(model: str, params: np.ndarray) -> str:
+        p = [f"{v:.4g}" for v in params]
+        if model == "exp":
+            return f"y = {np.exp(params[0]):.4g}·e^({p[1]}x)"
+        if model == "log":
+            return f"y = {p[0]} {'-' if params[1] < 0 else '+'} {abs(params[1]):.4g}·ln(x)"
+        equation = f"y = {p[0]}"
+        for i, v in enumerate(params[1:], start=1):
+            power = "x" if i == 1 else f"x^{i}"
+            equation += f" {'-' if v < 0 else '+'} {abs(v):.4g}{power}"
+        return equation
+
+    def fit_models(self, x_col: str, y_cols: List[str] = None) -> Dict[str, List[ModelFit]]:
+        """对多个 y 列批量拟合所有模型，按 AIC 升序返回
+
+        每列只使用自身与 x 都有效的行：某列缺测不影响其他列。有效行相同的
+        列（通常是全部列）共享设计矩阵，一起求解。常数列不参与拟合；
+        有效点不足 3 个的列返回空列表。最佳模型的残差按行位置保存在
+        self.residuals 中（未参与拟合的行为 NaN），供异常检测使用。
+        """
+        y_cols = y_cols or [c for c in self.columns if c != x_col]
+        x = self.numeric[x_col].to_numpy(dtype=float)
+        Y = self.numeric[y_cols].to_numpy(dtype=float).reshape(len(x), len(y_cols))
+        valid = np.isfinite(Y) & np.isfinite(x)[:, None]
+
+        # 按有效行分组：同组的列共享设计矩阵
+        groups: Dict[bytes, List[int]] = {}
+        for j in range(len(y_cols)):
+            groups.setdefault(np.packbits(valid[:, j]).tobytes(), []).append(j)
+
+        fits: Dict[str, List[ModelFit]] = {}
+        residuals = np.full(Y.shape, np.nan)
+        fitted: List[int] = []
+        for columns in groups.values():
+            rows = np.flatnonzero(valid[:, columns[0]])
+            Yg = Y[np.ix_(rows, columns)]
+            ss_tot = ((Yg - Yg.mean(axis=0)) ** 2).sum(axis=0) if len(rows) else np.zeros(len(columns))
+            # 常数列（至少 2 个有效点且全部相等）不参与拟合
+            varying = (ss_tot > 0) | (len(rows) < 2)
+            columns = [j for j, v in zip(columns, varying) if v]
+            for j in columns:
+                fits[y_cols[j]] = []
+            if len(rows) < 3 or not columns:
+                continue
+            group_fits, resid = self._fit_group(x[rows], Yg[:, varying], ss_tot[varying])
+            for k, j in enumerate(columns):
+                fits[y_cols[j]] = group_fits[k]
+                residuals[rows, j] = resid[:, k]
+                fitted.append(j)
+
+        kept = sorted(fitted)
+        self.residuals = pd.DataFrame(residuals[:, kept], columns=[y_cols[j] for j in kept])
+        return {col: fits[col] for col in y_cols if col in fits}
+
+    def _fit_group(self, x: np.ndarray, Y: np.ndarray,
+                   ss_tot: np.ndarray) -> Tuple[List[List[ModelFit]], np.ndarray]:
+        """有效行相同的一组 y 列：每种模型一次 QR 分解，返回各列候选模型与最佳残差"""
+        n, m = Y.shape
+        fits: List[List[ModelFit]] = [[] for _ in range(m)]
+
+        # RSS 下限，避免完美拟合时 log(0)
+        rss_floor = ss_tot * 1e-12
+        best_aic = np.full(m, np.inf)
+        best_resid = np.zeros_like(Y)
+
+        for model in self.MODELS:
+            X = self._design(model, x)
+            k = 0 if X is None else X.shape[1]
+            if X is None or n <= k:
+                continue
+
+            if model == "exp":
+                positive = (Y > 0).all(axis=0)
+                if not positive.any():
+                    continue
+                target = np.log(np.where(Y > 0, Y, 1.0))
+            else:
+                positive = np.ones(m, dtype=bool)
+                target = Y
+
+            # 共享设计矩阵的 QR 分解，所有 y 列一次求解
+            q, r = np.linalg.qr(X)
+            coef = np.linalg.lstsq(r, q.T @ target, rcond=None)[0]
+            pred = X @ coef
+            if model == "exp":
+                pred = np.exp(pred)
+
+            resid = Y - pred
+            rss = np.maximum((resid ** 2).sum(axis=0), rss_floor)
+            r2 = 1 - rss / ss_tot
+            # 小样本修正的 AIC（AICc）
+            aic = n * np.log(rss / n) + 2 * k
+            aic = aic + (2 * k * (k + 1) / (n - k - 1) if n - k - 1 > 0 else np.inf)
+            aic = np.where(positive, aic, np.inf)
+
+            better = aic < best_aic
+            best_aic = np.where(better, aic, best_aic)
+            best_resid[:, better] = resid[:, better]
+
+            for j in range(m):
+                if not positive[j]:
+                    continue
+                fits[j].append(ModelFit(
+                    model=model,
+                    params=coef[:, j].tolist(),
+                    r_squared=float(r2[j]),
+                    aic=float(aic[j]),
+                    equation=self._equation(model, coef[:, j])
+                ))
+
+        for candidates in fits:
+            candidates.sort(key=lambda f: f.aic)
+        return fits, best_resid
+
+    def detect_anomalies(self) -> Dict[str, List[int]]:
+        """基于最佳模型残差的异常检测（MAD 稳健 z 分数，返回从 0 开始的行位置）"""
+        resid = getattr(self, "residuals", None)
+        if resid is None or resid.empty:
+            return {}
+        values = resid.to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            median = np.nanmedian(values, axis=0)
+            mad = np.nanmedian(np.abs(values - median), axis=0) * 1.4826
+            z = np.abs(values - median) / np.where(mad > 0, mad, np.inf)
+        flagged = z > self.ANOMALY_Z  # NaN（未参与拟合的行）比较结果为 False
+        return {col: np.flatnonzero(flagged[:, j]).tolist() for j, col in enumerate(resid.columns)}
+
+    def analyze(self) -> Dict[str, Any]:
+        """完整分析，返回结构化结果"""
+        result: Dict[str, Any] = {
+            "columns": self.columns,
+            "rows": int(len(self.numeric)),
+        }
+        if not self.columns:
+            return result
+
+        monotonicity = self.monotonicity()
+        x_col = self.independent_variable(monotonicity)
+        fits = self.fit_models(x_col) if len(self.columns) >= 2 else {}
+
+        result.update({
+            "independent": x_col,
+            "monotonicity": monotonicity,
+            "trend_vs_x": self.monotonicity(order_by=x_col),
+            "correlation": self.correlation_matrix().round(6).to_dict(),
+            "fits": {col: [asdict(f) for f in candidates] for col, candidates in fits.items()},
+            "best_models": {col: candidates[0].model for col, candidates in fits.items() if candidates},
+            "constant": [c for c in self.columns if c != x_col and c not in fits],
+            "anomalies": self.detect_anomalies() if fits else {},
+        })
+        return result
+
+
+def describe_trend(score: float, level: float = LocalStatAnalyzer.MONOTONIC_LEVEL) -> str:
+    """单调性得分的中文描述"""
+    if score >= 1.0:
+        return "严格单调递增"
+    if score <= -1.0:
+        return "严格单调递减"
+    if score >= level:
+        return "总体递增"
+    if score <= -level:
+        return "总体递减"
+    return "无明显单调趋势"
+
+
+def local_analysis_summary(data: pd.DataFrame) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """本地分析并生成各文本字段
+
+    Returns:
+        (文本字段, 结构化结果)：文本字段包含 phenomenon、trend、anomaly、
+        conclusion、suggestion、confidence
+    """
+    analyzer = LocalStatAnalyzer(data)
+    details = analyzer.analyze()
+    texts = {
+        "phenomenon": "", "trend": "", "anomaly": "",
+        "conclusion": "", "suggestion": "", "confidence": 0.0,
+    }
+    x_col = details.get("independent")
+    if x_col is None:
+        return texts, details
+
+    x = analyzer.numeric[x_col]
+    texts["phenomenon"] = f"实验数据覆盖 {x_col} 范围为 {x.min():.4g} ~ {x.max():.4g}，共 {details['rows']} 组"
+    constants = [f"{col} 保持恒定（{analyzer.numeric[col].dropna().iloc[0]:.4g}）" for col in details["constant"]]
+    sparse = [f"{col} 有效数据不足（{analyzer.numeric[col].notna().sum()} 组），未参与拟合"
+              for col, candidates in details["fits"].items() if not candidates]
+    if constants or sparse:
+        texts["phenomenon"] += "；" + "；".join(constants + sparse)
+
+    fits = details["fits"]
+    if not fits:
+        texts["trend"] = f"{x_col} {describe_trend(details['monotonicity'][x_col])}"
+        texts["suggestion"] = "建议增加测量变量以便分析变量间关系"
+        texts["confidence"] = 0.3
+        return texts, details
+
+    trends, relations, anomaly_parts = [], [], []
+    corr = details["correlation"]
+    r2_values = []
+    for col, candidates in fits.items():
+        if not candidates:
+            continue
+        best = candidates[0]
+        r2_values.append(best["r_squared"])
+        r = corr.get(x_col, {}).get(col, float("nan"))
+        direction = "正相关" if r > 0 else "负相关" if r < 0 else "不相关"
+        trends.append(f"{col} {describe_trend(details['trend_vs_x'][col])}")
+        relations.append(
+            f"{col} 与 {x_col} 呈{direction}（r={r:.3f}），最佳模型为{MODEL_NAMES[best['model']]}"
+            f"（{best['equation']}，R²={best['r_squared']:.4f}）"
+        )
+        indices = details["anomalies"].get(col, [])
+        if indices:
+            shown = ", ".join(str(i + 1) for i in indices[:5])
+            more = f" 等 {len(indices)} 组" if len(indices) > 5 else " 组"
+            anomaly_parts.append(f"{col} 第 {shown}{more}")
+
+    texts["phenomenon"] += "；" + "；".join(relations)
+    texts["trend"] = f"随 {x_col} 增加：" + "，".join(trends)
+    texts["anomaly"] = ("检测到残差异常点：" + "；".join(anomaly_parts)) if anomaly_parts else "未检测到明显异常"
+
+    mean_r2 = float(np.mean(r2_values)) if r2_values else 0.0
+    strong = [col for col, c in fits.items() if c and c[0]["r_squared"] >= 0.95]
+    if strong:
+        texts["conclusion"] = f"{', '.join(strong)} 与 {x_col} 之间存在显著的函数关系，拟合优度高，实验结果可靠"
+    else:
+        texts["conclusion"] = f"各变量与 {x_col} 的关系拟合优度一般（平均 R²={mean_r2:.3f}），需结合理论进一步分析"
+
+    if anomaly_parts:
+        texts["suggestion"] = "建议复测异常数据点并检查测量条件"
+    elif details["rows"] < 10:
+        texts["suggestion"] = "建议增加数据点以提高拟合精度"
+    else:
+        texts["suggestion"] = "数据质量良好，可进一步扩大测量范围验证模型适用性"
+    texts["confidence"] = round(min(0.95, 0.5 + 0.45 * max(mean_r2, 0.0)), 2)
+    return texts, details
@@ -0,0 +1,152 @@
+# 🧪 批量运行指标 - 分阶段计时 / 峰值内存 / 百分位汇总 / JSON·CSV 导出
+# Batch Metrics - Per-stage timing, peak RSS, percentiles, JSON/CSV export
+
+"""
+每个批量任务按阶段计时（加载、验证、统计摘要、图表渲染、AI、HTML 渲染、
+Word 写入、PDF 写入、文件 I/O），并记录峰值常驻内存。批次结束后按阶段
+汇总百分位，导出到输出目录：
+
+    batch_metrics.json  汇总 + 每阶段百分位 + 每个任务明细
+    batch_metrics.csv   每个任务一行，各阶段一列
+
+峰值内存取自 getrusage（进程生命周期内的最大值）：任务在独立子进程中
+运行时即该任务的峰值；在同一进程中顺序运行时是截至该任务的进程峰值。
+"""
+
+import csv
+import io
+import json
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Sequence
+import numpy as np
+
+from .io_utils import atomic_write_text
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+
+# 阶段名称（按流水线顺序）
+STAGES = ("load", "validate", "ai", "summarize", "chart", "html", "docx", "pdf", "io")
+PERCENTILES = (50, 90, 95, 99)
+
+METRICS_JSON = "batch_metrics.json"
+METRICS_CSV = "batch_metrics.csv"
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB），平台不支持时返回 0"""
+    if not RESOURCE_AVAILABLE:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageTimer:
+    """分阶段计时器（同名阶段多次进入时累加）
+
+    用法:
+        timer = StageTimer()
+        with timer.stage("load"):
+            data = load_dataframe(path)
+        timer.timings  # {"load": 0.12}
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def summarize_values(values: Sequence[float]) -> Dict[str, float]:
+    """数量、总和、均值、百分位与最大值"""
+    arr = np.asarray(values, dtype=float)
+    summary = {"count": int(arr.size), "total": float(arr.sum()), "mean": float(arr.mean()),
+               "max": float(arr.max())}
+    for q, value in zip(PERCENTILES, np.percentile(arr, PERCENTILES)):
+        summary[f"p{q}"] = float(value)
+    return summary
+
+
+def summarize_stages(results: Sequence[Any]) -> Dict[str, Dict[str, float]]:
+    """按阶段汇总实际执行（未跳过）的任务耗时
+
+    Returns:
+        {阶段: {count, total, mean, max, p50, p90, p95, p99, share}}，
+        share 为该阶段占全部阶段耗时的比例
+    """
+    samples: Dict[str, List[float]] = {}
+    for r in results:
+        for name, seconds in r.timings.items():
+            samples.setdefault(name, []).append(seconds)
+
+    order = [s for s in STAGES if s in samples] + sorted(set(samples) - set(STAGES))
+    stages = {name: summarize_values(samples[name]) for name in order}
+    grand_total = sum(s["total"] for s in stages.values())
+    for summary in stages.values():
+        summary["share"] = summary["total"] / grand_total if grand_total else 0.0
+    return stages
+
+
+def batch_metrics(results: Sequence[Any]) -> Dict[str, Any]:
+    """批量运行指标：汇总、各阶段百分位、每个任务明细"""
+    executed = [r for r in results if not r.skipped]
+    durations = [r.duration for r in executed]
+    return {
+        "summary": {
+            "total": len(results),
+            "executed": len(executed),
+            "skipped": len(results) - len(executed),
+            "failed": sum(1 for r in results if not r.success),
+            "duration": summarize_values(durations) if durations else {},
+            "peak_rss_mb": max((r.peak_rss_mb for r in executed), default=0.0),
+        },
+        "stages": summarize_stages(executed),
+        "tasks": [
+            {
+                "title": r.task.title,
+                "data_path": r.task.data_path,
+                "status": "skipped" if r.skipped else ("success" if r.success else "failed"),
+                "duration": r.duration,
+                "peak_rss_mb": r.peak_rss_mb,
+                "timings": r.timings,
+            }
+            for r in results
+        ],
+    }
+
+
+def metrics_csv(metrics: Dict[str, Any]) -> str:
+    """每个任务一行的 CSV 文本"""
+    stages = list(metrics["stages"])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["title", "data_path", "status", "duration", "peak_rss_mb"] + stages)
+    for task in metrics["tasks"]:
+        writer.writerow([task["title"], task["data_path"], task["status"],
+                         f"{task['duration']:.4f}", f"{task['peak_rss_mb']:.1f}"]
+                        + [f"{task['timings'].get(s, 0.0):.4f}" for s in stages])
+    return buffer.getvalue()
+
+
+def export_metrics(results: Sequence[Any], output_dir: str) -> Dict[str, str]:
+    """导出 batch_metrics.json / batch_metrics.csv，返回文件路径"""
+    metrics = batch_metrics(results)
+    json_path = Path(output_dir) / METRICS_JSON
+    csv_path = Path(output_dir) / METRICS_CSV
+    atomic_write_text(json_path, json.dumps(metrics, ensure_ascii=False, indent=2))
+    atomic_write_text(csv_path, metrics_csv(metrics))
+    return {"json": str(json_path), "csv": str(csv_path)}
@@ -8,13 +8,21 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 import tempfile
 
+from .shared_data import resolve_data
+from .profiling import traced
+
 # PDF 生成可选依赖（延迟导入，避免启动时失败）
 WEASYPRINT_AVAILABLE = False
 REPORTLAB_AVAILABLE = False
 
+_DEPENDENCIES_CHECKED = False
+
 def _check_dependencies():
-    """检查 PDF 依赖是否可用"""
-    global WEASYPRINT_AVAILABLE, REPORTLAB_AVAILABLE
+    """检查 PDF 依赖是否可用（首次创建 PDFGenerator 时执行一次）"""
+    global WEASYPRINT_AVAILABLE, REPORTLAB_AVAILABLE, _DEPENDENCIES_CHECKED
+    if _DEPENDENCIES_CHECKED:
+        return
+    _DEPENDENCIES_CHECKED = True
     
     # 检查 WeasyPrint
     try:
@@ -33,8 +41,6 @@ def _check_dependencies():
     except ImportError:
         REPORTLAB_AVAILABLE = False
 
-# 启动时检查依赖
-_check_dependencies()
 
 @dataclass
 class PDFConfig:
@@ -69,6 +75,7 @@ class PDFGenerator:
     def set_config(self, config: PDFConfig):
         self.config = config
     
+    @traced("pdf.generate")
     def generate_from_html(self, html_content: str, output_path: str) -> str:
         """生成 PDF（自动选择引擎）"""
         output_path = str(output_path)
@@ -140,8 +147,10 @@ class DataValidator:
         self.errors = []
         self.info = []
     
+    @traced("data.validate")
     def validate(self, data: 'pd.DataFrame') -> Dict:
-        """验证数据"""
+        """验证数据（data 可以是 DataFrame 或 SharedDataHandle）"""
+        data = resolve_data(data)
         self.warnings = []
         self.errors = []
         self.info = []
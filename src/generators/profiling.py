@@ -0,0 +1,266 @@
+# 🧪 性能剖析钩子 - span API / Chrome Trace / OpenTelemetry / cProfile
+# Profiling Hooks - Span API, Chrome trace events, OpenTelemetry spans, cProfile
+
+"""
+生成流水线中的关键步骤（加载、统计、图表、渲染、Word、PDF、AI、批量任务）
+用 span 标记。没有注册任何钩子时 span() 直接返回共享的空上下文，
+@traced 装饰的函数只多一次列表判断，几乎没有开销。
+
+注册钩子后每个 span 结束时回调 hook.on_end(span)。内置记录器：
+
+    ChromeTraceRecorder  Chrome trace-event JSON（chrome://tracing / Perfetto）
+    OTelSpanRecorder     OTLP/JSON 格式的 span 文件（OpenTelemetry Collector 可导入）
+
+用法:
+    with profile_run("chrome", "output/profile.json"):
+        generator.generate_report(...)
+
+    with span("custom.step", rows=len(data)):
+        ...
+
+注意：在子进程中执行的步骤（并行图表渲染、进程池批量任务）的 span
+不会传回父进程，父进程中只记录派发它们的外层 span。
+"""
+
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import contextlib
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Iterator
+
+from .io_utils import atomic_write_text
+
+
+PROFILE_MODES = ("cprofile", "chrome", "otel")
+SERVICE_NAME = "smart-lab-report"
+
+_HOOKS: List[Any] = []
+_NULL_SPAN = contextlib.nullcontext()
+_CURRENT: ContextVar[Optional["Span"]] = ContextVar("smart_lab_span", default=None)
+_HOOK_LOCK = threading.Lock()
+
+
+@dataclass
+class Span:
+    """一次计时区间"""
+    name: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    span_id: str = ""
+    parent_id: str = ""
+    trace_id: str = ""
+    start_ns: int = 0
+    end_ns: int = 0
+    pid: int = 0
+    thread_id: int = 0
+    error: str = ""
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+
+def register_hook(hook: Any):
+    """注册钩子：需实现 on_end(span)，可选实现 on_start(span)"""
+    with _HOOK_LOCK:
+        _HOOKS.append(hook)
+
+
+def unregister_hook(hook: Any):
+    with _HOOK_LOCK:
+        if hook in _HOOKS:
+            _HOOKS.remove(hook)
+
+
+def profiling_enabled() -> bool:
+    return bool(_HOOKS)
+
+
+@contextlib.contextmanager
+def _active_span(name: str, attributes: Dict[str, Any]) -> Iterator[Span]:
+    parent = _CURRENT.get()
+    current = Span(
+        name=name,
+        attributes=attributes,
+        span_id=os.urandom(8).hex(),
+        parent_id=parent.span_id if parent else "",
+        trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+        start_ns=time.time_ns(),
+        pid=os.getpid(),
+        thread_id=threading.get_ident(),
+    )
+    hooks = list(_HOOKS)
+    for hook in hooks:
+        if hasattr(hook, "on_start"):
+            hook.on_start(current)
+    token = _CURRENT.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _CURRENT.reset(token)
+        current.end_ns = time.time_ns()
+        for hook in hooks:
+            hook.on_end(current)
+
+
+def span(name: str, **attributes):
+    """标记一个计时区间；未启用剖析时返回空上下文"""
+    if not _HOOKS:
+        return _NULL_SPAN
+    return _active_span(name, attributes)
+
+
+def traced(name: str = None) -> Callable:
+    """把整个函数调用标记为一个 span 的装饰器"""
+    def decorate(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _HOOKS:
+                return func(*args, **kwargs)
+            with _active_span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class SpanRecorder(ABC):
+    """收集已结束的 span，子类实现 to_dict 定义导出格式"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def on_end(self, finished: Span):
+        with self._lock:
+            self.spans.append(finished)
+
+    @abstractmethod
+    def to_dict(self) -> Dict[str, Any]:
+        """导出内容（可直接序列化为 JSON）"""
+
+    def export(self, path: str):
+        atomic_write_text(path, json.dumps(self.to_dict(), ensure_ascii=False))
+
+
+class ChromeTraceRecorder(SpanRecorder):
+    """导出 Chrome trace-event JSON（完整事件 ph=X，时间单位微秒）"""
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = min((s.start_ns for s in self.spans), default=0)
+        events = []
+        for s in self.spans:
+            args = {k: str(v) for k, v in s.attributes.items()}
+            if s.error:
+                args["error"] = s.error
+            events.append({
+                "name": s.name,
+                "cat": s.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (s.start_ns - origin) / 1000,
+                "dur": s.duration_ns / 1000,
+                "pid": s.pid,
+                "tid": s.thread_id,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class OTelSpanRecorder(SpanRecorder):
+    """导出 OTLP/JSON（resourceSpans → scopeSpans → spans）"""
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def to_dict(self) -> Dict[str, Any]:
+        spans = []
+        for s in self.spans:
+            attributes = [self._attribute(k, v) for k, v in s.attributes.items()]
+            attributes.append(self._attribute("thread.id", s.thread_id))
+            spans.append({
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id,
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": attributes,
+                # STATUS_CODE_ERROR = 2，UNSET = 0
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 0},
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                self._attribute("service.name", SERVICE_NAME),
+                self._attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{"scope": {"name": "smart_lab_report.profiling"}, "spans": spans}],
+        }]}
+
+
+def default_profile_path(mode: str, directory: str = "output") -> str:
+    """按模式与时间戳生成剖析文件路径"""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    suffix = {"cprofile": ".prof", "chrome": ".trace.json", "otel": ".otel.json"}[mode]
+    return str(Path(directory) / f"profile-{stamp}{suffix}")
+
+
+@contextlib.contextmanager
+def profile_run(mode: str, output_path: str = None, top: int = 25) -> Iterator[str]:
+    """在代码块运行期间启用剖析，结束时写出结果文件
+
+    Args:
+        mode: cprofile（pstats 二进制，另打印耗时最多的函数）、chrome 或 otel
+        output_path: 输出路径，默认 output/profile-<时间>.<扩展名>
+        top: cprofile 模式下打印的函数数
+
+    Yields:
+        输出文件路径
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"不支持的剖析模式: {mode}（可选: {', '.join(PROFILE_MODES)}）")
+    output_path = output_path or default_profile_path(mode)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield output_path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output_path)
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(top)
+            print(buffer.getvalue())
+            print(f"🔬 cProfile 结果已保存: {output_path}")
+        return
+
+    recorder = ChromeTraceRecorder() if mode == "chrome" else OTelSpanRecorder()
+    register_hook(recorder)
+    try:
+        with span("run", mode=mode):
+            yield output_path
+    finally:
+        unregister_hook(recorder)
+        recorder.export(output_path)
+        print(f"🔬 {len(recorder.spans)} 个 span 已保存: {output_path}")
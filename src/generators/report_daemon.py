@@ -0,0 +1,412 @@
+# 🧪 常驻报告服务 - 模块/字体/缓存常驻内存，JSON 提交任务
+# Report Daemon - Warm long-running worker, JSON jobs over a local socket
+
+"""
+每次运行 cli.py 都要启动解释器并导入 pandas、matplotlib、python-docx，
+耗时数秒。LMS 集成按每份学生作业调用一次时，这部分开销占了大头。
+
+常驻模式启动一次、预热全部模块（图表字体、模板、数据缓存），之后通过
+本地套接字接收 JSON 任务，客户端只需建立连接、发送一行 JSON：
+
+    python cli.py --serve                                  # 启动服务（前台）
+    python cli.py --submit --data a.csv --title "实验一"   # 提交任务
+
+协议：每个连接一个请求，请求与响应都是一行 UTF-8 JSON。
+
+    {"op": "generate", "job": {"data_path": "...", "title": "...", ...}}
+    {"op": "ping"} / {"op": "stats"} / {"op": "shutdown"}
+    → {"ok": true, "result": {...}} 或 {"ok": false, "error": "..."}
+
+job 字段与 BatchTask 相同，另可指定 output_dir；相对路径按服务进程的
+工作目录解析，客户端提交前会转换为绝对路径。output_dir 必须位于
+output_root（默认为服务启动时的工作目录）或默认输出目录之内，
+output_name 只能是文件名，不能包含目录。
+
+认证：服务启动时生成随机令牌，写入仅当前用户可读的令牌文件（套接字
+路径加 .token，TCP 地址为 ~/.cache/smart-lab-report/daemon-<host>-<port>.token），
+每个请求都需携带 {"token": "..."}；客户端自动读取。Windows 上默认使用
+TCP 地址，本机其他用户或进程没有令牌就无法提交任务或停止服务。
+
+地址默认是 ~/.cache/smart-lab-report/daemon.sock（Unix 套接字，权限 0600）；
+平台不支持 Unix 套接字时使用 127.0.0.1:8765。环境变量
+SMART_LAB_DAEMON_ADDRESS 可指定套接字路径或 host:port。
+
+本模块顶层只导入标准库，客户端提交任务时不会加载 pandas / matplotlib。
+"""
+
+import os
+import re
+import hmac
+import json
+import time
+import signal
+import secrets
+import socket
+import threading
+import socketserver
+from dataclasses import fields
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Union
+
+Address = Union[str, Tuple[str, int]]
+
+DEFAULT_SOCKET = Path.home() / ".cache" / "smart-lab-report" / "daemon.sock"
+DEFAULT_TCP_ADDRESS = ("127.0.0.1", 8765)
+DEFAULT_OUTPUT_DIR = "output/daemon"
+MAX_REQUEST_BYTES = 1024 * 1024
+UNIX_SOCKETS = hasattr(socket, "AF_UNIX")
+
+
+class DaemonError(RuntimeError):
+    """无法连接服务，或服务返回错误"""
+
+
+class DaemonUnavailable(DaemonError):
+    """服务未运行"""
+
+
+def parse_address(value: str) -> Address:
+    """套接字路径或 host:port → 地址"""
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and "/" not in value:
+        return (host or "127.0.0.1", int(port))
+    return value
+
+
+def default_address() -> Address:
+    setting = os.environ.get("SMART_LAB_DAEMON_ADDRESS")
+    if setting:
+        return parse_address(setting)
+    return str(DEFAULT_SOCKET) if UNIX_SOCKETS else DEFAULT_TCP_ADDRESS
+
+
+def format_address(address: Address) -> str:
+    return address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+
+
+def token_path(address: Address) -> Path:
+    """服务令牌文件的位置"""
+    if isinstance(address, str):
+        return Path(address + ".token")
+    host, port = address
+    return DEFAULT_SOCKET.parent / f"daemon-{host}-{port}.token"
+
+
+def read_token(address: Address) -> str:
+    try:
+        return token_path(address).read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+
+def _write_token(path: Path, token: str):
+    """新建仅当前用户可读写的令牌文件（Windows 上依赖用户目录的默认权限）"""
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    try:
+        path.unlink()  # 已存在的文件可能权限较宽，重新创建
+    except FileNotFoundError:
+        pass
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+
+
+def _read_line(sock: socket.socket) -> bytes:
+    buffer = bytearray()
+    while not buffer.endswith(b"\n"):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > MAX_REQUEST_BYTES:
+            raise DaemonError("消息过大")
+    return bytes(buffer)
+
+
+def send_request(payload: Dict[str, Any], address: Address = None,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """发送一个请求并等待响应
+
+    Raises:
+        DaemonError: 服务未运行或响应无效
+    """
+    address = address or default_address()
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            line = _read_line(sock)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise DaemonUnavailable(f"报告服务未运行 ({format_address(address)})") from e
+    except OSError as e:
+        raise DaemonError(f"与报告服务通信失败: {e}") from e
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise DaemonError("报告服务返回了无效响应") from e
+
+
+def safe_name(title: str) -> str:
+    """标题 → 文件名（去掉路径分隔符等非法字符）"""
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', "_", title).strip(" .")
+    return name[:100] or "report"
+
+
+def task_from_job(job: Dict[str, Any], extra: Tuple[str, ...] = ()):
+    """任务 JSON → BatchTask（未知字段报错，缺省项按数据文件推断）
+
+    Args:
+        extra: 调用方自行处理、允许出现的额外字段
+    """
+    from .batch_processor import BatchTask, guess_template, parse_formats
+
+    allowed = {f.name for f in fields(BatchTask)}
+    unknown = set(job) - allowed - set(extra)
+    if unknown:
+        raise ValueError(f"未知任务字段: {', '.join(sorted(unknown))}")
+    if not job.get("data_path"):
+        raise ValueError("缺少 data_path")
+    data_path = job["data_path"]
+    if not os.path.isfile(data_path):
+        raise ValueError(f"数据文件不存在: {data_path}")
+    options = {k: v for k, v in job.items() if k in allowed}
+    options.setdefault("title", Path(data_path).stem)
+    options.setdefault("template", guess_template(Path(data_path).name))
+    options.setdefault("output_format", "html,md")
+    parse_formats(options["output_format"])
+    return BatchTask(**options)
+
+
+class DaemonClient:
+    """报告服务客户端
+
+    用法:
+        client = DaemonClient()
+        result = client.submit({"data_path": "a.csv", "title": "实验一"})
+        result["output_files"]
+    """
+
+    def __init__(self, address: Address = None, timeout: Optional[float] = None):
+        self.address = address or default_address()
+        self.timeout = timeout
+
+    def request(self, op: str, **payload) -> Dict[str, Any]:
+        payload = {"op": op, "token": read_token(self.address), **payload}
+        response = send_request(payload, self.address, self.timeout)
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "未知错误"))
+        return response.get("result", {})
+
+    def ping(self) -> bool:
+        """服务是否在运行（令牌无效、返回错误时服务也在运行）"""
+        try:
+            self.request("ping")
+            return True
+        except DaemonUnavailable:
+            return False
+        except DaemonError:
+            return True
+
+    def submit(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """提交任务并等待完成，返回 {success, output_files, error, duration, timings}"""
+        job = dict(job)
+        for key in ("data_path", "output_dir"):
+            if job.get(key):
+                job[key] = os.path.abspath(job[key])
+        return self.request("generate", job=job)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.request("stats")
+
+    def shutdown(self):
+        self.request("shutdown")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+        try:
+            request = json.loads(line)
+            response = {"ok": True, "result": self.server.report_daemon.dispatch(request)}
+        except Exception as e:
+            response = {"ok": False, "error": str(e) or type(e).__name__}
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+if UNIX_SOCKETS:
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ReportDaemon:
+    """常驻报告服务
+
+    Args:
+        address: 套接字路径或 (host, port)，默认见 default_address
+        output_dir: 任务未指定 output_dir 时的输出目录
+        output_root: 任务指定的 output_dir 必须位于该目录内，默认为当前工作目录
+        max_jobs: 同时运行的任务数；pyplot 不是线程安全的，默认逐个执行
+    """
+
+    def __init__(self, address: Address = None, output_dir: str = DEFAULT_OUTPUT_DIR,
+                 max_jobs: int = 1, quiet: bool = False, output_root: str = None):
+        self.address = address or default_address()
+        self.output_dir = os.path.abspath(output_dir)
+        self.output_root = os.path.realpath(output_root or os.getcwd())
+        self.token = secrets.token_hex(32)
+        self.quiet = quiet
+        self._slots = threading.BoundedSemaphore(max(max_jobs, 1))
+        self._stats_lock = threading.Lock()
+        self.started = time.time()
+        self.stats = {"jobs": 0, "failed": 0, "busy_seconds": 0.0}
+        self.server: Optional[socketserver.BaseServer] = None
+
+    def log(self, message: str):
+        if not self.quiet:
+            print(message, flush=True)
+
+    def warm_up(self) -> float:
+        """预先导入生成模块、注册字体、加载模板，返回耗时（秒）"""
+        start = time.perf_counter()
+        # 图表在服务进程内顺序渲染，避免在多线程进程中 fork
+        os.environ["SMART_LAB_RENDER_WORKERS"] = "1"
+        from .chart_generator import _pyplot
+        from .report_generator import ReportGenerator
+        from .data_cache import get_data_cache
+        from . import batch_processor  # noqa: F401
+        try:
+            from . import word_generator  # noqa: F401
+        except ImportError:
+            pass  # 未安装 python-docx 时仍可生成 HTML / Markdown
+        _pyplot()
+        ReportGenerator()
+        get_data_cache()
+        return time.perf_counter() - start
+
+    # 请求处理
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if not hmac.compare_digest(str(request.get("token", "")), self.token):
+            raise PermissionError("认证失败：令牌无效（客户端需与服务以同一用户运行）")
+        op = request.get("op")
+        if op == "ping":
+            return {"pid": os.getpid()}
+        if op == "stats":
+            return self.snapshot()
+        if op == "generate":
+            return self.run_job(request.get("job") or {})
+        if op == "shutdown":
+            threading.Thread(target=self.stop, daemon=True).start()
+            return {}
+        raise ValueError(f"未知操作: {op}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update(pid=os.getpid(), uptime=time.time() - self.started,
+                     address=format_address(self.address))
+        return stats
+
+    def run_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        from .batch_processor import generate_task_outputs
+
+        task = task_from_job(job, extra=("output_dir",))
+        output_dir = self.resolve_output_dir(job.get("output_dir"))
+        if task.output_name in (".", "..") or any(sep in task.output_name for sep in "/\\"):
+            raise ValueError(f"output_name 只能是文件名: {task.output_name}")
+        # 未指定 output_name 时输出文件名来自标题，同样不能含路径
+        task.output_name = task.output_name or safe_name(task.title)
+        target = os.path.realpath(os.path.join(output_dir, task.output_name))
+        if os.path.dirname(target) != os.path.realpath(output_dir):
+            raise ValueError(f"output_name 不在输出目录内: {task.output_name}")
+        with self._slots:
+            result = generate_task_outputs(task, output_dir)
+        with self._stats_lock:
+            self.stats["jobs"] += 1
+            self.stats["failed"] += 0 if result.success else 1
+            self.stats["busy_seconds"] += result.duration
+        icon = "✅" if result.success else "❌"
+        self.log(f"{icon} {task.title} ({result.duration:.2f}s) {result.error}".rstrip())
+        return {
+            "success": result.success,
+            "output_files": result.output_files,
+            "error": result.error,
+            "duration": result.duration,
+            "timings": result.timings,
+        }
+
+    def resolve_output_dir(self, output_dir: Optional[str]) -> str:
+        """任务的输出目录：必须位于 output_root 或默认输出目录之内"""
+        if not output_dir:
+            return self.output_dir
+        target = os.path.realpath(output_dir)
+        for root in (self.output_root, os.path.realpath(self.output_dir)):
+            if target == root or target.startswith(root.rstrip(os.sep) + os.sep):
+                return target
+        raise ValueError(f"output_dir 不在允许的目录内（{self.output_root}）: {output_dir}")
+
+    # 生命周期
+
+    def _bind(self) -> socketserver.BaseServer:
+        if isinstance(self.address, tuple):
+            return _TCPServer(self.address, _RequestHandler)
+        path = Path(self.address)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            if DaemonClient(self.address, timeout=2).ping():
+                raise DaemonError(f"报告服务已在运行 ({self.address})")
+            path.unlink()  # 上次异常退出留下的套接字文件
+        old_umask = os.umask(0o177)  # 套接字仅当前用户可访问
+        try:
+            return _UnixServer(self.address, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def start(self):
+        """绑定地址并预热（不阻塞），配合 serve_forever 或在后台线程中使用"""
+        self.server = self._bind()
+        self.server.report_daemon = self
+        if isinstance(self.address, tuple):
+            self.address = self.server.server_address[:2]  # 端口 0 时取实际端口
+        _write_token(token_path(self.address), self.token)
+        seconds = self.warm_up()
+        self.log(f"🚀 报告服务已启动: {format_address(self.address)}（预热 {seconds:.2f}s）")
+
+    def serve_forever(self):
+        """启动并处理请求，直到收到 shutdown 请求或 SIGTERM / Ctrl+C"""
+        if self.server is None:
+            self.start()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self.stop, daemon=True).start())
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+    def close(self):
+        if self.server is None:
+            return
+        self.server.server_close()
+        paths = [token_path(self.address)]
+        if isinstance(self.address, str):
+            paths.append(Path(self.address))
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self.server = None
+        self.log("👋 报告服务已停止")
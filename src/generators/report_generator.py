@@ -8,11 +8,15 @@ from pathlib import Path
 from typing import Dict, List, Any
 from dataclasses import dataclass, field
 from datetime import datetime
-from jinja2 import Template, Environment, BaseLoader
 import base64
 from io import BytesIO
 
-from .chart_generator import ChartGenerator, ChartConfig
+from .chart_generator import ChartGenerator, ChartConfig, render_charts
+from .data_profile import profile_columns, recommend_charts
+from .shared_data import resolve_data
+from .data_cache import load_dataframe
+from .io_utils import atomic_write_text
+from .profiling import traced
 
 @dataclass
 class ReportSection:
@@ -127,19 +131,12 @@ class ReportGenerator:
         self.template = self.TEMPLATE_REGISTRY.get(template_name, self.TEMPLATE_REGISTRY["physics_basic"])
         self.charts = []
         self.data_summary = {}
+        self.profile = {}
         
+    @traced("report.load_data")
     def load_data(self, data_path: str) -> pd.DataFrame:
-        """加载实验数据"""
-        ext = Path(data_path).suffix.lower()
-        if ext == '.csv':
-            data = pd.read_csv(data_path)
-        elif ext == '.xlsx':
-            data = pd.read_excel(data_path)
-        elif ext == '.json':
-            data = pd.read_json(data_path)
-        else:
-            raise ValueError(f"不支持格式: {ext}")
-        return data
+        """加载实验数据（解析结果缓存，文件未变化时毫秒级返回）"""
+        return load_dataframe(data_path)
     
     def add_chart(self, data: pd.DataFrame, x_col: str, y_col: str, 
                   config: ChartConfig = None, section: str = "data_processing") -> str:
@@ -168,43 +165,112 @@ class ReportGenerator:
         })
         return chart_id
     
+    def add_charts(self, data: pd.DataFrame, x_col: str, y_cols: List[str],
+                   config: ChartConfig = None, section: str = "data_processing") -> str:
+        """将多个 Y 列添加为一张多子图图表（一次渲染）
+        
+        Args:
+            y_cols: Y轴列名列表，每列一个子图
+            config: 图表配置，默认 layout="grid"
+        
+        Returns:
+            chart_id: 图表标识符
+        """
+        config = config or ChartConfig(layout="grid")
+        result = ChartGenerator(data).generate(x_col, list(y_cols), config)
+        chart_id = f"chart_{len(self.charts) + 1}"
+        
+        self.charts.append({
+            "id": chart_id,
+            "section": section,
+            "image_base64": result["image_base64"],
+            "save_path": result.get("save_path", ""),
+            "config": config
+        })
+        return chart_id
+    
+    def add_recommended_charts(self, data: pd.DataFrame, section: str = "data_processing",
+                               chart_type: str = None) -> List[str]:
+        """按数据画像自动推荐并添加图表（复用 summarize_data 的画像）
+        
+        Args:
+            chart_type: 指定时覆盖推荐的图表类型（直方图推荐除外）
+        """
+        if not self.profile:
+            self.profile = profile_columns(resolve_data(data))
+        configs = recommend_charts(data, self.profile)
+        for config in configs:
+            if chart_type and config.chart_type != "histogram":
+                config.chart_type = chart_type
+        return self.add_chart_specs(data, configs, section)
+    
+    @traced("report.charts")
+    def add_chart_specs(self, data: pd.DataFrame, configs: List[ChartConfig],
+                        section: str = "data_processing", max_workers: int = None) -> List[str]:
+        """一次提交多个图表配置（需填好 x_col / y_cols），在进程池中并行渲染
+        
+        Returns:
+            chart_id 列表，顺序与 configs 一致
+        """
+        chart_ids = []
+        for config, result in zip(configs, render_charts(data, configs, max_workers)):
+            chart_id = f"chart_{len(self.charts) + 1}"
+            self.charts.append({
+                "id": chart_id,
+                "section": section,
+                "image_base64": result["image_base64"],
+                "save_path": result.get("save_path", ""),
+                "config": config
+            })
+            chart_ids.append(chart_id)
+        return chart_ids
+    
+    @traced("report.summarize")
     def summarize_data(self, data: pd.DataFrame) -> Dict[str, Any]:
-        """生成数据摘要"""
+        """生成数据摘要（基于单次遍历的列画像）
+        
+        data 可以是 DataFrame 或 SharedDataHandle
+        """
+        data = resolve_data(data)
         summary = {
             "shape": {"rows": len(data), "columns": len(data.columns)},
             "columns": [],
             "statistics": {}
         }
         
-        for col in data.columns:
-            col_data = data[col]
-            if pd.api.types.is_numeric_dtype(col_data):
+        self.profile = profile_columns(data)
+        for col, p in self.profile.items():
+            if p.kind == "numeric":
                 summary["columns"].append({
                     "name": col,
                     "type": "numeric",
-                    "null_count": int(col_data.isnull().sum()),
-                    "mean": float(col_data.mean()) if not col_data.empty else None,
-                    "std": float(col_data.std()) if not col_data.empty else None,
-                    "min": float(col_data.min()) if not col_data.empty else None,
-                    "max": float(col_data.max()) if not col_data.empty else None,
+                    "null_count": p.null_count,
+                    "mean": p.mean,
+                    "std": p.std,
+                    "min": p.min,
+                    "max": p.max,
                 })
+                # 统计表保持数值类型（全空列为 NaN），渲染时可直接格式化
+                mean = p.mean if p.mean is not None else float("nan")
+                std = p.std if p.std is not None else float("nan")
                 summary["statistics"][col] = {
-                    "mean": float(col_data.mean()),
-                    "std": float(col_data.std()),
-                    "cv": float(col_data.std() / col_data.mean() * 100) if col_data.mean() != 0 else None
+                    "mean": mean,
+                    "std": std,
+                    "cv": std / mean * 100 if mean != 0 else None
                 }
             else:
                 summary["columns"].append({
                     "name": col,
                     "type": "categorical",
-                    "unique_count": int(col_data.nunique()),
-                    "null_count": int(col_data.isnull().sum()),
-                    "top_values": col_data.value_counts().head(5).to_dict()
+                    "unique_count": p.unique_count,
+                    "null_count": p.null_count,
+                    "top_values": p.top_values
                 })
         
         self.data_summary = summary
         return summary
     
+    @traced("report.render")
     def generate_report(self, title: str, author: str = "", group: str = "",
                        data: pd.DataFrame = None, **kwargs) -> str:
         """生成完整实验报告"""
@@ -383,17 +449,23 @@ class ReportGenerator:
         
         return html
     
-    def save_report(self, report: str, output_path: str):
-        """保存报告为 HTML"""
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        Path(output_path).write_text(report, encoding='utf-8')
+    @traced("report.save")
+    def save_report(self, report: str, output_path: str, markdown: bool = True):
+        """保存报告为 HTML（原子写入）
+        
+        Args:
+            markdown: 是否同时生成 Markdown 版本
+        """
+        atomic_write_text(output_path, report)
         print(f"✅ 报告已保存: {output_path}")
         
         # 同时生成 Markdown 版本
-        md_path = str(Path(output_path).with_suffix('.md'))
-        self._save_markdown(report, md_path)
+        if markdown:
+            md_path = str(Path(output_path).with_suffix('.md'))
+            self.save_markdown(report, md_path)
     
-    def _save_markdown(self, html: str, md_path: str):
+    @traced("report.save_markdown")
+    def save_markdown(self, html: str, md_path: str):
         """保存 Markdown 版本"""
         # 简单转换
         import re
@@ -405,7 +477,7 @@ class ReportGenerator:
         md = re.sub(r'&nbsp;', ' ', md)
         md = re.sub(r'\n{3,}', '\n\n', md)
         
-        Path(md_path).write_text(md, encoding='utf-8')
+        atomic_write_text(md_path, md)
         print(f"✅ Markdown 版本已保存: {md_path}")
 
 
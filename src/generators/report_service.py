@@ -0,0 +1,603 @@
+# 🧪 HTTP 报告服务 - 异步服务器 / 任务队列 / 结果缓存 / 流式上传 / SSE 进度
+# HTTP Report Service - asyncio server, job queue, result cache, uploads, SSE
+
+"""
+多名学生同时在一台服务器上生成报告：请求由 asyncio 事件循环处理，
+生成任务进入有界队列，由固定大小的进程池执行（每个进程常驻预热，
+pyplot 不会被多个线程同时使用）。
+
+接口（JSON）:
+
+    GET  /health                     服务状态（工作进程数、排队 / 运行中任务数）
+    GET  /templates                  可用模板
+    POST /uploads?filename=a.csv     上传数据文件（请求体即文件内容，流式写盘，
+                                     支持 Content-Length 与 chunked），按内容哈希去重
+    POST /jobs                       提交任务:
+                                     {"upload_id": "...", "title": "...", "author": "...",
+                                      "template": "...", "output_format": "html,docx,pdf,md",
+                                      "ai_analysis": false, "kind": "report" | "analyze"}
+    GET  /jobs/<id>                  轮询任务状态（queued / running / succeeded / failed）
+    GET  /jobs/<id>/events           SSE 推送状态变化，任务结束后关闭
+    GET  /jobs/<id>/files/<name>     下载输出文件
+
+kind=report 生成报告（HTML / Markdown 由 ReportGenerator、Word 由
+WordReportGenerator、PDF 由 PDFGenerator 生成，ai_analysis 时调用
+AILabAnalyzer 写结论）；kind=analyze 只返回 AILabAnalyzer 的分析结果。
+
+相同数据（按内容哈希）与相同参数的提交直接返回已有任务，不重复生成。
+
+磁盘清理：只保留最近 history 个已结束任务，被淘汰任务的输出目录随之
+删除；超过 upload_ttl 未被使用、且没有保留中的任务引用的上传文件定期
+删除；启动时清空上次运行留下的任务输出（任务只保存在内存中，无法再访问）。
+
+用法:
+    python cli.py --http --port 8000 --jobs 4
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import signal
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from .report_daemon import safe_name
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_ROOT = "output/service"
+DEFAULT_MAX_UPLOAD_MB = 100
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_HISTORY = 1000  # 保留的已结束任务数
+DEFAULT_UPLOAD_TTL = 24 * 3600  # 未被引用的上传文件保留时长（秒）
+UPLOAD_SWEEP_INTERVAL = 600.0
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_JSON_BYTES = 1024 * 1024
+CHUNK_SIZE = 1 << 16
+SSE_KEEPALIVE = 15.0
+
+UPLOAD_EXTENSIONS = ('.csv', '.xlsx', '.xls', '.json')
+UPLOAD_ID = re.compile(r"^[0-9a-f]{32}\.(csv|xlsx|xls|json)$")
+JOB_FIELDS = {"upload_id", "kind", "title", "author", "group", "template",
+              "output_format", "ai_analysis"}
+JOB_KINDS = ("report", "analyze")
+FINISHED = ("succeeded", "failed")
+
+STATUS_TEXT = {200: "OK", 201: "Created", 202: "Accepted", 400: "Bad Request",
+               404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+               413: "Payload Too Large", 500: "Internal Server Error",
+               503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """以指定状态码返回给客户端的错误"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    reader: asyncio.StreamReader
+
+
+@dataclass
+class Job:
+    """服务端任务"""
+    job_id: str
+    kind: str
+    key: str
+    params: Dict[str, Any]
+    status: str = "queued"
+    created: float = field(default_factory=time.time)
+    started: float = 0.0
+    finished: float = 0.0
+    result: Dict[str, Any] = field(default_factory=dict)
+    error: str = ""
+    changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def notify(self):
+        """唤醒等待状态变化的 SSE 连接"""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+# 工作进程中执行的函数（模块级，便于进程池序列化）
+
+def _service_worker_init(quiet: bool = True):
+    """工作进程初始化：图表顺序渲染，并预先导入生成模块"""
+    from .batch_processor import _batch_worker_init
+    from .chart_generator import _pyplot
+
+    _batch_worker_init(quiet)
+    _pyplot()
+
+
+def run_report_job(job: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+    """生成报告（ReportGenerator / WordReportGenerator / PDFGenerator / AILabAnalyzer）"""
+    from .batch_processor import generate_task_outputs
+    from .report_daemon import task_from_job
+
+    result = generate_task_outputs(task_from_job(job), output_dir)
+    return {"success": result.success, "output_files": result.output_files,
+            "error": result.error, "duration": result.duration, "timings": result.timings}
+
+
+def run_analyze_job(data_path: str, title: str = "") -> Dict[str, Any]:
+    """AILabAnalyzer 分析（未配置 API Key 时为本地统计分析）"""
+    from .ai_engine import AILabAnalyzer
+    from .data_cache import load_dataframe
+
+    start = time.time()
+    analysis = AILabAnalyzer().analyze_phenomenon(load_dataframe(data_path), title)
+    return {"success": True, "analysis": asdict(analysis), "output_files": [],
+            "error": "", "duration": time.time() - start}
+
+
+class ReportService:
+    """HTTP 报告服务
+
+    Args:
+        host / port: 监听地址（port=0 时自动分配，见 self.port）
+        workers: 工作进程数（同时生成的任务数），默认 CPU 核数
+        root: 上传文件与任务输出的根目录
+        max_upload_mb: 单个上传文件的大小上限
+        queue_size: 排队任务上限，队列满时返回 503
+        use_processes: False 时在单个线程中执行任务（调试用）
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 workers: Optional[int] = None, root: str = DEFAULT_ROOT,
+                 max_upload_mb: float = DEFAULT_MAX_UPLOAD_MB,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, history: int = DEFAULT_HISTORY,
+                 upload_ttl: float = DEFAULT_UPLOAD_TTL,
+                 use_processes: bool = True, quiet: bool = False):
+        self.host = host
+        self.port = port
+        self.workers = max(workers or os.cpu_count() or 1, 1) if use_processes else 1
+        self.root = Path(root).resolve()
+        self.upload_dir = self.root / "uploads"
+        self.jobs_dir = self.root / "jobs"
+        self.max_upload = int(max_upload_mb * 1024 * 1024)
+        self.queue_size = queue_size
+        self.history = history
+        self.upload_ttl = upload_ttl
+        self.use_processes = use_processes
+        self.quiet = quiet
+
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.by_key: Dict[str, str] = {}
+        self.pending: "OrderedDict[str, None]" = OrderedDict()  # 排队中的任务（按顺序）
+        self.stats = {"submitted": 0, "cache_hits": 0, "succeeded": 0, "failed": 0}
+        self.ready = threading.Event()
+        self.queue: Optional[asyncio.Queue] = None
+        self.pool: Optional[Executor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def log(self, message: str):
+        if not self.quiet:
+            print(message, flush=True)
+
+    # 生命周期
+
+    def run(self):
+        """阻塞运行，直到 stop()、SIGTERM 或 Ctrl+C"""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self):
+        """可在任意线程调用"""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    async def serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self.queue = asyncio.Queue(self.queue_size)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        # 上次运行的任务只存在于内存中，其输出已无法访问
+        shutil.rmtree(self.jobs_dir, ignore_errors=True)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        if self.use_processes:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_service_worker_init,
+                                            initargs=(True,))
+        else:
+            self.pool = ThreadPoolExecutor(1, initializer=_service_worker_init, initargs=(False,))
+
+        server = await asyncio.start_server(self._handle, self.host, self.port,
+                                            limit=MAX_HEADER_BYTES)
+        self.port = server.sockets[0].getsockname()[1]
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        workers.append(asyncio.create_task(self._sweeper()))
+        if threading.current_thread() is threading.main_thread():
+            try:
+                self._loop.add_signal_handler(signal.SIGTERM, self._stop.set)
+            except (NotImplementedError, RuntimeError):  # Windows
+                pass
+        self.log(f"🌐 报告服务: http://{self.host}:{self.port}（{self.workers} 个工作进程）")
+        self.ready.set()
+        try:
+            async with server:
+                await self._stop.wait()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.ready.clear()
+            self.log("👋 报告服务已停止")
+
+    # 任务队列
+
+    def _job_key(self, kind: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps({"kind": kind, **params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[Job]:
+        """相同提交的已有任务（失败或输出已被删除的不算）"""
+        job = self.jobs.get(self.by_key.get(key, ""))
+        if job is None or job.status == "failed":
+            return None
+        if job.status == "succeeded" and not all(os.path.exists(p) for p in job.result.get("output_files", [])):
+            return None
+        return job
+
+    def submit(self, body: Dict[str, Any]) -> Tuple[Job, bool]:
+        """创建任务（或返回相同提交的已有任务），返回 (任务, 是否命中缓存)"""
+        unknown = set(body) - JOB_FIELDS
+        if unknown:
+            raise HTTPError(400, f"未知任务字段: {', '.join(sorted(unknown))}")
+        upload_id = body.get("upload_id", "")
+        if not UPLOAD_ID.match(upload_id) or not (self.upload_dir / upload_id).exists():
+            raise HTTPError(400, "无效的 upload_id（先 POST /uploads 上传数据）")
+        os.utime(self.upload_dir / upload_id)  # 上传文件的有效期从最近一次使用算起
+        kind = body.get("kind", "report")
+        if kind not in JOB_KINDS:
+            raise HTTPError(400, f"kind 只能是: {', '.join(JOB_KINDS)}")
+
+        params = {k: v for k, v in body.items() if k != "kind"}
+        key = self._job_key(kind, params)
+        self.stats["submitted"] += 1
+        cached = self._cached(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached, True
+
+        job = Job(job_id=uuid.uuid4().hex, kind=kind, key=key, params=params)
+        if kind == "report":
+            self._validate_report(job)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HTTPError(503, "任务队列已满，请稍后重试")
+        self.jobs[job.job_id] = job
+        self.by_key[key] = job.job_id
+        self.pending[job.job_id] = None
+        self._evict()
+        return job, False
+
+    def _report_job(self, job: Job) -> Dict[str, Any]:
+        """HTTP 参数 → report_daemon.task_from_job 使用的任务 JSON"""
+        options = {k: v for k, v in job.params.items() if k != "upload_id"}
+        options["data_path"] = str(self.upload_dir / job.params["upload_id"])
+        options["output_name"] = safe_name(options.get("title") or "report")
+        options.setdefault("title", "实验报告")
+        return options
+
+    def _validate_report(self, job: Job):
+        from .batch_processor import parse_formats
+
+        try:
+            parse_formats(job.params.get("output_format", "html,md"))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    def _evict(self):
+        """只保留最近 history 个已结束任务，删除被淘汰任务的输出目录"""
+        finished = [j for j in self.jobs.values() if j.status in FINISHED]
+        for job in finished[:max(len(finished) - self.history, 0)]:
+            del self.jobs[job.job_id]
+            if self.by_key.get(job.key) == job.job_id:
+                del self.by_key[job.key]
+            shutil.rmtree(self.jobs_dir / job.job_id, ignore_errors=True)
+
+    def sweep_uploads(self, now: Optional[float] = None) -> int:
+        """删除超过 upload_ttl 未被使用、且没有保留中的任务引用的上传文件，返回删除数"""
+        now = time.time() if now is None else now
+        referenced = {job.params.get("upload_id") for job in self.jobs.values()}
+        removed = 0
+        for path in self.upload_dir.iterdir():
+            if path.name in referenced:
+                continue
+            try:
+                if now - path.stat().st_mtime > self.upload_ttl:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue  # 同时被上传覆盖或已删除
+        return removed
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(min(UPLOAD_SWEEP_INTERVAL, max(self.upload_ttl / 2, 1.0)))
+            removed = self.sweep_uploads()
+            if removed:
+                self.log(f"🧹 已删除 {removed} 个过期上传文件")
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            self.pending.pop(job.job_id, None)
+            job.status, job.started = "running", time.time()
+            job.notify()
+            try:
+                if job.kind == "report":
+                    output_dir = str(self.jobs_dir / job.job_id)
+                    result = await loop.run_in_executor(self.pool, run_report_job,
+                                                        self._report_job(job), output_dir)
+                else:
+                    result = await loop.run_in_executor(
+                        self.pool, run_analyze_job,
+                        str(self.upload_dir / job.params["upload_id"]), job.params.get("title", ""))
+                job.result = result
+                job.error = result.get("error", "")
+                job.status = "succeeded" if result["success"] else "failed"
+            except asyncio.CancelledError:
+                job.error, job.status = "服务已停止", "failed"
+                raise
+            except Exception as e:  # 工作进程崩溃等
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = "failed"
+            finally:
+                job.finished = time.time()
+                self.stats[job.status] = self.stats.get(job.status, 0) + 1
+                job.notify()
+                self.queue.task_done()
+            icon = "✅" if job.status == "succeeded" else "❌"
+            self.log(f"{icon} {job.kind} {job.job_id[:8]} ({job.finished - job.started:.2f}s) {job.error}".rstrip())
+
+    def job_info(self, job: Job) -> Dict[str, Any]:
+        info = {
+            "job_id": job.job_id,
+            "kind": job.kind,
+            "status": job.status,
+            "created": job.created,
+            "started": job.started or None,
+            "finished": job.finished or None,
+        }
+        if job.status == "queued":
+            info["position"] = list(self.pending).index(job.job_id) + 1 if job.job_id in self.pending else 0
+        if job.status in FINISHED:
+            info["error"] = job.error
+            info["duration"] = job.result.get("duration")
+            info["files"] = [
+                {"name": Path(p).name, "url": f"/jobs/{job.job_id}/files/{Path(p).name}"}
+                for p in job.result.get("output_files", [])
+            ]
+            if "analysis" in job.result:
+                info["analysis"] = job.result["analysis"]
+        return info
+
+    # HTTP
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(400, "请求头过大")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "无效的请求行")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        return Request(method.upper(), unquote(url.path), query, headers, reader)
+
+    async def _body(self, request: Request, limit: int) -> AsyncIterator[bytes]:
+        """按 Content-Length 或 chunked 流式读取请求体"""
+        reader = request.reader
+        received = 0
+        if request.headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await reader.readline()
+                try:
+                    size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+                except ValueError:
+                    size = -1
+                if size < 0:
+                    raise HTTPError(400, "chunked 编码的块大小无效")
+                if size == 0:
+                    await reader.readline()  # 结尾空行（不支持 trailer）
+                    return
+                received += size
+                if received > limit:
+                    raise HTTPError(413, f"请求体超过上限 ({limit // (1024 * 1024)} MB)")
+                yield await reader.readexactly(size)
+                if await reader.readexactly(2) != b"\r\n":
+                    raise HTTPError(400, "chunked 编码的块未以 CRLF 结尾")
+        length = request.headers.get("content-length")
+        if length is None:
+            raise HTTPError(411, "需要 Content-Length 或 chunked 编码")
+        if not length.strip().isdigit():
+            raise HTTPError(400, f"Content-Length 无效: {length}")
+        remaining = int(length)
+        if remaining > limit:
+            raise HTTPError(413, f"请求体超过上限 ({limit // (1024 * 1024)} MB)")
+        while remaining:
+            chunk = await reader.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise HTTPError(400, "请求体不完整")
+            remaining -= len(chunk)
+            yield chunk
+
+    async def _read_json(self, request: Request) -> Dict[str, Any]:
+        body = b"".join([chunk async for chunk in self._body(request, MAX_JSON_BYTES)])
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "请求体不是有效的 JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "请求体应为 JSON 对象")
+        return data
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes = b"",
+                    content_type: str = "application/json; charset=utf-8",
+                    headers: Dict[str, str] = None):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 "Connection: close"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, data: Any,
+                         headers: Dict[str, str] = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        await self._send(writer, status, body, headers=headers)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await self._read_request(reader)
+            if request is not None:
+                await self._route(request, writer)
+        except HTTPError as e:
+            headers = {"Retry-After": "5"} if e.status == 503 else None
+            await self._send_json(writer, e.status, {"error": e.message}, headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _route(self, request: Request, writer: asyncio.StreamWriter):
+        parts = [p for p in request.path.split("/") if p]
+        route = (request.method, parts[0] if parts else "", len(parts))
+
+        if route == ("GET", "health", 1):
+            await self._send_json(writer, 200, self.health())
+        elif route == ("GET", "templates", 1):
+            from .report_generator import ReportGenerator
+            templates = [{"name": t.name, "display_name": t.display_name, "description": t.description}
+                         for t in ReportGenerator.TEMPLATE_REGISTRY.values()]
+            await self._send_json(writer, 200, {"templates": templates})
+        elif route == ("POST", "uploads", 1):
+            await self._send_json(writer, 201, await self._upload(request))
+        elif route == ("POST", "jobs", 1):
+            job, cached = self.submit(await self._read_json(request))
+            await self._send_json(writer, 200 if cached else 202,
+                                  {**self.job_info(job), "cached": cached},
+                                  {"Location": f"/jobs/{job.job_id}"})
+        elif request.method == "GET" and parts[:1] == ["jobs"] and len(parts) >= 2:
+            job = self.jobs.get(parts[1])
+            if job is None:
+                raise HTTPError(404, "任务不存在")
+            if len(parts) == 2:
+                await self._send_json(writer, 200, self.job_info(job))
+            elif len(parts) == 3 and parts[2] == "events":
+                await self._events(job, writer)
+            elif len(parts) == 4 and parts[2] == "files":
+                await self._download(job, parts[3], writer)
+            else:
+                raise HTTPError(404, "未知接口")
+        elif parts[:1] in (["health"], ["templates"], ["uploads"], ["jobs"]):
+            raise HTTPError(405, "不支持的请求方法")
+        else:
+            raise HTTPError(404, "未知接口")
+
+    def health(self) -> Dict[str, Any]:
+        running = sum(1 for j in self.jobs.values() if j.status == "running")
+        return {"status": "ok", "workers": self.workers, "queued": len(self.pending),
+                "running": running, **self.stats}
+
+    async def _upload(self, request: Request) -> Dict[str, Any]:
+        """流式写入上传文件，同时计算内容哈希；相同内容只保存一份"""
+        filename = request.query.get("filename") or request.headers.get("x-filename", "")
+        ext = Path(unquote(filename)).suffix.lower()
+        if ext not in UPLOAD_EXTENSIONS:
+            raise HTTPError(400, f"filename 扩展名须为: {', '.join(UPLOAD_EXTENSIONS)}")
+        digest = hashlib.blake2b(digest_size=16)
+        tmp = self.upload_dir / f".upload-{uuid.uuid4().hex}.tmp"
+        size = 0
+        try:
+            with open(tmp, "wb") as f:
+                async for chunk in self._body(request, self.max_upload):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            upload_id = digest.hexdigest() + ext
+            os.replace(tmp, self.upload_dir / upload_id)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return {"upload_id": upload_id, "filename": filename, "size": size}
+
+    async def _events(self, job: Job, writer: asyncio.StreamWriter):
+        """SSE：每次状态变化推送一个 status 事件，任务结束后关闭连接"""
+        writer.write(("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                      "Cache-Control: no-cache\r\nConnection: close\r\n\r\n").encode("latin-1"))
+        while True:
+            changed = job.changed
+            data = json.dumps(self.job_info(job), ensure_ascii=False)
+            writer.write(f"event: status\ndata: {data}\n\n".encode("utf-8"))
+            await writer.drain()
+            if job.status in FINISHED:
+                return
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), SSE_KEEPALIVE)
+                    break
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                    await writer.drain()
+
+    async def _download(self, job: Job, name: str, writer: asyncio.StreamWriter):
+        paths = {Path(p).name: p for p in job.result.get("output_files", [])}
+        path = paths.get(name)
+        if path is None or not os.path.exists(path):
+            raise HTTPError(404, "文件不存在")
+        content_types = {".html": "text/html; charset=utf-8", ".md": "text/markdown; charset=utf-8",
+                         ".pdf": "application/pdf",
+                         ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
+        size = os.path.getsize(path)
+        writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: "
+                      f"{content_types.get(Path(path).suffix, 'application/octet-stream')}\r\n"
+                      f"Content-Length: {size}\r\nConnection: close\r\n\r\n").encode("latin-1"))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                writer.write(chunk)
+                await writer.drain()
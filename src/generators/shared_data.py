@@ -0,0 +1,233 @@
+# 🧪 共享内存数据句柄 - 多进程零拷贝传递数值列
+# Shared-memory Data Handle - Zero-copy columns for worker processes
+
+"""
+多进程路径（批量、图表、验证）如果直接传 DataFrame，需要整表 pickle，
+大数据集的序列化开销甚至超过计算本身。
+
+SharedDataHandle 把所有数值列写入一块 multiprocessing.shared_memory，
+按 (列数, 行数) 的 float64 矩阵存放（每列连续）。句柄本身只包含
+共享内存名称、形状、列名等元信息，可以廉价地 pickle 到子进程；
+子进程 to_dataframe() 时直接映射同一块内存，不复制数值数据。
+
+非数值列（通常很小）随句柄一起序列化。
+
+用法:
+    with shared_frame(data) as source:   # 小数据集原样返回 DataFrame
+        pool.submit(worker, source)      # worker 内: resolve_data(source)，用完 close()
+"""
+
+import gc
+import sys
+import threading
+import contextlib
+from typing import Dict, List, Any, Optional, Union, Iterator
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+
+# 数值部分不小于该字节数时才放入共享内存，小数据集直接 pickle 更快
+SHARE_MIN_BYTES = 4 * 1024 * 1024
+
+# 当前进程映射的共享内存：创建的与映射他人的分开登记
+_CREATED: Dict[str, shared_memory.SharedMemory] = {}
+_ATTACHED: Dict[str, shared_memory.SharedMemory] = {}
+# close 时仍被 DataFrame 引用的映射，之后再尝试解除
+_UNCLOSED: List[shared_memory.SharedMemory] = []
+_LOCK = threading.Lock()
+
+
+def _open_untracked(name: str) -> shared_memory.SharedMemory:
+    """映射已有共享内存，不登记到 resource_tracker
+
+    3.12 及以前映射方也会登记：fork / spawn 出的子进程与创建者共用一个
+    tracker，注销会删掉创建者的登记（之后 unlink 时 tracker 报 KeyError）；
+    不共用时子进程的 tracker 会在退出时误删共享内存。两种情况都不应登记。
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+
+    def skip_shared_memory(resource, rtype):
+        if rtype != "shared_memory":
+            register(resource, rtype)
+
+    resource_tracker.register = skip_shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _release(shm: shared_memory.SharedMemory) -> bool:
+    """解除映射；仍有视图引用缓冲区时先回收一次垃圾再试"""
+    for attempt in range(2):
+        try:
+            shm.close()
+            return True
+        except BufferError:
+            if attempt == 0:
+                gc.collect()
+    return False
+
+
+def _retry_unclosed():
+    _UNCLOSED[:] = [shm for shm in _UNCLOSED if not _release(shm)]
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """取得共享内存映射：本进程创建的直接复用，否则映射一次并缓存"""
+    with _LOCK:
+        _retry_unclosed()
+        shm = _CREATED.get(name) or _ATTACHED.get(name)
+        if shm is None:
+            shm = _ATTACHED[name] = _open_untracked(name)
+        return shm
+
+
+def _detach(name: str):
+    """解除本进程对他人共享内存的映射（进程池中每个任务结束时调用）"""
+    with _LOCK:
+        shm = _ATTACHED.pop(name, None)
+        if shm is not None and not _release(shm):
+            _UNCLOSED.append(shm)
+        _retry_unclosed()
+
+
+class SharedDataHandle:
+    """共享内存数据句柄（可 pickle）"""
+
+    def __init__(self, name: str, numeric_columns: List[str], nrows: int,
+                 columns: List[str], extra: Optional[pd.DataFrame] = None,
+                 index: Optional[pd.Index] = None):
+        self.name = name
+        self.numeric_columns = numeric_columns
+        self.nrows = nrows
+        self.columns = columns
+        self.extra = extra
+        self.index = index
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._owner = False
+
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame) -> "SharedDataHandle":
+        """把 DataFrame 的数值列复制进新建的共享内存（仅此一次拷贝）
+
+        数值列统一以 float64 存放；非数值列随句柄序列化。
+        """
+        numeric = [c for c in data.columns if pd.api.types.is_numeric_dtype(data[c])]
+        others = [c for c in data.columns if c not in set(numeric)]
+        nrows = len(data)
+
+        size = max(len(numeric) * nrows * 8, 1)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        block = np.ndarray((len(numeric), nrows), dtype=np.float64, buffer=shm.buf)
+        for j, col in enumerate(numeric):
+            block[j] = data[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        index = None if isinstance(data.index, pd.RangeIndex) and data.index.start == 0 \
+            and data.index.step == 1 else data.index
+        handle = cls(
+            name=shm.name,
+            numeric_columns=numeric,
+            nrows=nrows,
+            columns=list(data.columns),
+            extra=data[others].reset_index(drop=True) if others else None,
+            index=index,
+        )
+        handle._shm = shm
+        handle._owner = True
+        with _LOCK:
+            _CREATED[shm.name] = shm
+        return handle
+
+    def array(self) -> np.ndarray:
+        """数值块视图，形状 (列数, 行数)"""
+        if self._shm is None:
+            self._shm = _attach(self.name)
+        shm = self._shm
+        return np.ndarray((len(self.numeric_columns), self.nrows), dtype=np.float64, buffer=shm.buf)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """映射为 DataFrame：数值列是共享内存的视图，不复制"""
+        block = self.array()
+        frame = pd.DataFrame(block.T, columns=self.numeric_columns, copy=False)
+        if self.extra is not None:
+            # 按原列位置插入非数值列（insert 不会合并、复制数值块）
+            for col in self.extra.columns:
+                frame.insert(self.columns.index(col), col, self.extra[col].to_numpy())
+        if self.index is not None:
+            frame.index = self.index
+        return frame
+
+    def close(self):
+        """解除当前进程的映射；创建者同时释放共享内存
+
+        映射方应在用完后调用（渲染进程池中每个任务结束时），否则长期运行的
+        工作进程会一直持有已删除的共享内存。
+        """
+        self._shm = None
+        if not self._owner:
+            _detach(self.name)
+            return
+        self._owner = False
+        with _LOCK:
+            shm = _CREATED.pop(self.name, None)
+        if shm is None:
+            return
+        if not _release(shm):
+            # 仍有 DataFrame 引用该缓冲区：先删除名称，映射稍后解除
+            with _LOCK:
+                _UNCLOSED.append(shm)
+        shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_shm"] = None
+        state["_owner"] = False
+        return state
+
+    def __repr__(self) -> str:
+        return (f"SharedDataHandle(name={self.name!r}, rows={self.nrows}, "
+                f"numeric={len(self.numeric_columns)}, columns={len(self.columns)})")
+
+
+@contextlib.contextmanager
+def shared_frame(data: Union[pd.DataFrame, SharedDataHandle],
+                 min_bytes: Optional[int] = None) -> Iterator[Union[pd.DataFrame, SharedDataHandle]]:
+    """多进程处理前把大数据集的数值列放入共享内存，退出时释放
+
+    数值部分小于 min_bytes（默认 SHARE_MIN_BYTES）、已经是句柄或无法创建
+    共享内存时原样返回 data。
+    """
+    if isinstance(data, SharedDataHandle):
+        yield data
+        return
+    threshold = SHARE_MIN_BYTES if min_bytes is None else min_bytes
+    numeric = data.select_dtypes("number")
+    handle = None
+    if numeric.shape[1] and numeric.shape[1] * len(data) * 8 >= threshold:
+        try:
+            handle = SharedDataHandle.from_dataframe(data)
+        except OSError:
+            handle = None  # /dev/shm 不可用或空间不足
+    try:
+        yield handle if handle is not None else data
+    finally:
+        if handle is not None:
+            handle.close()
+
+
+def resolve_data(data: Union[pd.DataFrame, SharedDataHandle]) -> pd.DataFrame:
+    """接受 DataFrame 或 SharedDataHandle，统一返回 DataFrame"""
+    if isinstance(data, SharedDataHandle):
+        return data.to_dataframe()
+    return data
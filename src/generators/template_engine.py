@@ -1,11 +1,31 @@
 # 🧪 自定义模板引擎 - 支持用户上传模板
 # Custom Template Engine - Support User-uploaded Templates
 
+r"""
+模板占位符语法:
+
+    {{name}}                  变量；未提供时保留原样
+    {{name|默认文本}}         未提供时使用默认文本（可为空：{{name|}}）
+    {{name|                   默认文本可跨多行；首尾各一个换行会被去掉，
+    | 第 1 行 | ... |          便于在 Markdown 表格等位置整块书写
+    }}
+    {{name:upper:.2f|默认}}   过滤器依次作用于提供的值：upper / lower / strip /
+                              title / escape，或 format 格式说明（如 .4f、>8、d、x）
+
+默认文本中可以嵌套占位符，也可以包含成对的单花括号（如 LaTeX 的
+\frac{a}{b}），单花括号平衡后出现的 }} 才结束默认文本。
+
+模板按文件编译为文本片段与占位符的列表并缓存，填充时逐个片段求值后
+join 一次，耗时与模板长度成线性。
+"""
+
 import os
 import re
+import html
+import threading
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union
-from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Union, Callable, Tuple
+from dataclasses import dataclass, field
 import json
 
 from docx import Document
@@ -13,6 +33,205 @@ from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
 
+class TemplateSyntaxError(ValueError):
+    """模板语法错误（如默认文本缺少结尾的 }}）"""
+
+
+FILTERS: Dict[str, Callable[[Any], Any]] = {
+    "upper": lambda v: str(v).upper(),
+    "lower": lambda v: str(v).lower(),
+    "strip": lambda v: str(v).strip(),
+    "title": lambda v: str(v).title(),
+    "escape": lambda v: html.escape(str(v)),
+}
+
+# {{name  :过滤器...  然后是 | 或 }}
+_OPEN = re.compile(r'\{\{(\w+)((?::[^:|{}\n]+)*)(\||\}\})')
+_BRACE = re.compile(r'[{}]')
+
+
+def _format_filter(spec: str) -> Callable[[Any], Any]:
+    """format 格式说明作为过滤器；字符串形式的数字先转为数值（整数说明如 d、x 转为 int）"""
+    def apply(value):
+        try:
+            return format(value, spec)
+        except (ValueError, TypeError):
+            pass
+        try:
+            number = float(value)
+        except (ValueError, TypeError):
+            return value
+        # 只有整数值才套用整数格式，避免静默截断小数
+        for candidate in ((number, int(number)) if number.is_integer() else (number,)):
+            try:
+                return format(candidate, spec)
+            except (ValueError, TypeError):
+                continue
+        return value
+    return apply
+
+
+def _make_filter(token: str, text: str, pos: int) -> Callable[[Any], Any]:
+    if token in FILTERS:
+        return FILTERS[token]
+    for sample in (1.0, 1, ""):
+        try:
+            format(sample, token)
+            return _format_filter(token)
+        except (ValueError, TypeError):
+            continue
+    raise TemplateSyntaxError(f"第 {text.count(chr(10), 0, pos) + 1} 行: 未知过滤器 '{token}'")
+
+
+@dataclass
+class Placeholder:
+    """占位符 {{name:过滤器|默认文本}}"""
+    name: str
+    source: str  # 原始文本，未提供值且没有默认文本时原样输出
+    filters: List[Callable[[Any], Any]] = field(default_factory=list, repr=False)
+    default: Optional["CompiledTemplate"] = None
+    
+    def render(self, data: Dict[str, Any]) -> str:
+        value = data.get(self.name)
+        if value is not None:
+            for apply in self.filters:
+                value = apply(value)
+            return str(value)
+        if self.default is not None:
+            return self.default.render(data)
+        return self.source
+
+
+@dataclass
+class CompiledTemplate:
+    """编译后的模板：原样输出的文本片段与占位符依次排列
+
+    填充时只需把占位符位置替换为求值结果再 join 一次，
+    耗时与模板长度成线性，与变量个数无关。
+    """
+    segments: List[Union[str, Placeholder]]
+    mtime_ns: int = 0
+    size: int = 0
+    
+    def __post_init__(self):
+        self._slots = [i for i, seg in enumerate(self.segments) if isinstance(seg, Placeholder)]
+    
+    @property
+    def placeholders(self) -> List[Placeholder]:
+        """全部占位符（含默认文本中嵌套的），按出现顺序"""
+        found = []
+        for i in self._slots:
+            placeholder = self.segments[i]
+            found.append(placeholder)
+            if placeholder.default is not None:
+                found.extend(placeholder.default.placeholders)
+        return found
+    
+    @property
+    def variables(self) -> List[str]:
+        """变量名（按首次出现顺序去重）"""
+        return list(dict.fromkeys(p.name for p in self.placeholders))
+    
+    def defaults(self) -> Dict[str, str]:
+        """带默认文本的变量 → 默认文本（未填充其他变量时的渲染结果）"""
+        result = {}
+        for p in self.placeholders:
+            if p.default is not None and p.name not in result:
+                result[p.name] = p.default.render({})
+        return result
+    
+    def render(self, data: Dict[str, Any]) -> str:
+        """填充变量；未提供的变量使用默认文本，没有默认文本时保留原占位符"""
+        parts = self.segments.copy()
+        for i in self._slots:
+            parts[i] = parts[i].render(data)
+        return "".join(parts)
+
+
+def _parse(text: str, pos: int, nested: bool) -> Tuple[List[Union[str, Placeholder]], int]:
+    """解析到文本结尾（nested=False）或默认文本结尾的 }}（nested=True）"""
+    segments: List[Union[str, Placeholder]] = []
+    start, depth = pos, 0
+    while True:
+        m = _BRACE.search(text, pos)
+        if m is None:
+            if nested:
+                return segments, -1
+            break
+        i = m.start()
+        if text[i] == "{":
+            opening = _OPEN.match(text, i)
+            if opening:
+                if i > start:
+                    segments.append(text[start:i])
+                placeholder, pos = _parse_placeholder(text, opening)
+                segments.append(placeholder)
+                start = pos
+                continue
+            depth += nested
+        elif nested:
+            if depth == 0 and text.startswith("}}", i):
+                if i > start:
+                    segments.append(text[start:i])
+                return segments, i + 2
+            depth = max(depth - 1, 0)
+        pos = i + 1
+    if len(text) > start:
+        segments.append(text[start:])
+    return segments, len(text)
+
+
+def _parse_placeholder(text: str, opening: re.Match) -> Tuple[Placeholder, int]:
+    name, filter_text, closer = opening.groups()
+    filters = [_make_filter(token, text, opening.start()) for token in filter_text.split(":")[1:]]
+    if closer == "}}":
+        end = opening.end()
+        return Placeholder(name, text[opening.start():end], filters), end
+
+    segments, end = _parse(text, opening.end(), nested=True)
+    if end < 0:
+        line = text.count("\n", 0, opening.start()) + 1
+        raise TemplateSyntaxError(f"第 {line} 行: {{{{{name}|... 缺少结尾的 }}}}")
+    # 块状默认文本：去掉紧跟 | 的换行与结尾 }} 前的换行
+    if segments and isinstance(segments[0], str) and segments[0].startswith("\n"):
+        segments[0] = segments[0][1:]
+    if segments and isinstance(segments[-1], str) and segments[-1].endswith("\n"):
+        segments[-1] = segments[-1][:-1]
+    segments = [seg for seg in segments if seg != ""]
+    return Placeholder(name, text[opening.start():end], filters, CompiledTemplate(segments)), end
+
+
+def compile_string(content: str) -> CompiledTemplate:
+    """把模板文本编译为文本片段与占位符（一次扫描）
+
+    Raises:
+        TemplateSyntaxError: 默认文本未结束或过滤器未知
+    """
+    segments, _ = _parse(content, 0, nested=False)
+    return CompiledTemplate(segments=segments)
+
+
+_COMPILED: Dict[str, CompiledTemplate] = {}
+_COMPILED_LOCK = threading.Lock()
+
+
+def compile_template(file_path: str) -> CompiledTemplate:
+    """读取并编译模板文件；按 (mtime_ns, size) 缓存，文件修改后自动重新编译"""
+    key = os.path.abspath(file_path)
+    stat = os.stat(key)
+    with _COMPILED_LOCK:
+        cached = _COMPILED.get(key)
+    if cached is not None and (cached.mtime_ns, cached.size) == (stat.st_mtime_ns, stat.st_size):
+        return cached
+    
+    with open(key, 'r', encoding='utf-8') as f:
+        compiled = compile_string(f.read())
+    compiled.mtime_ns, compiled.size = stat.st_mtime_ns, stat.st_size
+    with _COMPILED_LOCK:
+        _COMPILED[key] = compiled
+    return compiled
+
+
 @dataclass
 class TemplateField:
     """模板字段定义"""
@@ -31,6 +250,7 @@ class UserTemplate:
     template_type: str  # word, html, markdown
     fields: List[TemplateField] = None
     variables: Dict[str, str] = None
+    compiled: Optional[CompiledTemplate] = field(default=None, repr=False)
     
     def __post_init__(self):
         if self.fields is None:
@@ -63,15 +283,16 @@ class TemplateEngine:
         if template_type in ['md', 'markdown']:
             template_type = 'markdown'
         
-        # 解析字段
-        fields = self._parse_fields(file_path, template_type)
+        # 只读取、扫描一次：字段与变量都来自编译结果
+        compiled = compile_template(file_path)
         
         template = UserTemplate(
             name=path.stem,
             file_path=str(path),
             template_type=template_type,
-            fields=fields,
-            variables=self._parse_variables(file_path, template_type)
+            fields=self._fields_from(compiled),
+            variables={var: f"[{var}]" for var in compiled.variables},
+            compiled=compiled
         )
         
         self.templates[file_path] = template
@@ -79,55 +300,27 @@ class TemplateEngine:
         
         return template
     
+    @staticmethod
+    def _fields_from(compiled: CompiledTemplate) -> List[TemplateField]:
+        defaults = compiled.defaults()
+        return [
+            TemplateField(name=var, field_type='text', required=var not in defaults,
+                          description=f"变量 {var}", placeholder=defaults.get(var, ""))
+            for var in compiled.variables
+        ]
+    
     def _parse_fields(self, file_path: str, template_type: str) -> List[TemplateField]:
         """解析模板中的字段"""
-        fields = []
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 查找 {{variable}} 格式
-        pattern = r'\{\{(\w+)\}\}'
-        matches = re.findall(pattern, content)
-        
-        for var in set(matches):
-            field = TemplateField(
-                name=var,
-                field_type='text',
-                required=True,
-                description=f"变量 {var}"
-            )
-            fields.append(field)
-        
-        return fields
+        return self._fields_from(compile_template(file_path))
     
     def _parse_variables(self, file_path: str, template_type: str) -> Dict[str, str]:
         """解析模板变量"""
-        variables = {}
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 查找 {{variable}} 格式
-        pattern = r'\{\{(\w+)\}\}'
-        matches = re.findall(pattern, content)
-        
-        for var in set(matches):
-            variables[var] = f"[{var}]"
-        
-        return variables
+        return {var: f"[{var}]" for var in compile_template(file_path).variables}
     
     def fill_template(self, template: UserTemplate, data: Dict[str, Any]) -> str:
-        """填充模板"""
-        with open(template.file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 替换变量
-        for key, value in data.items():
-            placeholder = f"{{{{{key}}}}}"
-            content = content.replace(placeholder, str(value))
-        
-        return content
+        """填充模板（使用缓存的编译结果，模板文件修改后自动重新编译）"""
+        template.compiled = compile_template(template.file_path)
+        return template.compiled.render(data)
     
     def save_filled(self, content: str, output_path: str):
         """保存填充后的模板"""
@@ -13,7 +13,10 @@ import base64
 from io import BytesIO
 import pandas as pd
 
-from .chart_generator import ChartGenerator, ChartConfig
+from .chart_generator import ChartGenerator, ChartConfig, render_charts
+from .data_profile import recommend_charts
+from .io_utils import atomic_path
+from .profiling import traced
 
 class WordReportGenerator:
     """Word 报告生成器 - 生成 .docx 格式实验报告"""
@@ -48,20 +51,9 @@ class WordReportGenerator:
     
     def _add_image_from_base64(self, image_base64: str, width: Inches = Inches(6)):
         """从 base64 添加图片"""
-        # 解码 base64
+        # 解码 base64，直接以内存流插入（不落临时文件，并行生成时互不干扰）
         header, encoded = image_base64.split(',', 1)
-        image_data = base64.b64decode(encoded)
-        
-        # 保存到临时文件
-        with open('temp_chart.png', 'wb') as f:
-            f.write(image_data)
-        
-        # 添加图片
-        self.doc.add_picture('temp_chart.png', width=width)
-        
-        # 删除临时文件
-        import os
-        os.remove('temp_chart.png')
+        self.doc.add_picture(BytesIO(base64.b64decode(encoded)), width=width)
     
     def _save_image(self, image_base64: str, path: str):
         """保存图片到文件"""
@@ -70,10 +62,23 @@ class WordReportGenerator:
         with open(path, 'wb') as f:
             f.write(image_data)
     
+    @traced("docx.charts")
+    def add_chart_specs(self, data: pd.DataFrame, configs: List[ChartConfig],
+                        max_workers: int = None) -> List[Dict]:
+        """一次提交多个图表配置（需填好 x_col / y_cols），在进程池中并行渲染
+        
+        渲染结果保存在 self.charts，generate_report 未传 charts 时使用
+        """
+        results = render_charts(data, configs, max_workers)
+        self.charts.extend(results)
+        return results
+    
+    @traced("docx.build")
     def generate_report(self, title: str, author: str = "", group: str = "",
                        date: str = "", conclusion: str = "",
                        data_summary: Dict = None, charts: List[Dict] = None):
         """生成完整实验报告"""
+        charts = self.charts if charts is None else charts
         
         # 标题
         self._add_heading(title, level=0)
@@ -221,10 +226,11 @@ class WordReportGenerator:
         
         return "数据表格已生成"
     
+    @traced("docx.save")
     def save(self, output_path: str):
         """保存 Word 文档"""
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        self.doc.save(output_path)
+        with atomic_path(output_path) as tmp:
+            self.doc.save(str(tmp))
         print(f"✅ Word 报告已保存: {output_path}")
         return output_path
 
@@ -239,18 +245,9 @@ def generate_word_report(data_path: str, title: str, author: str = "",
     # 加载数据
     data = pd.read_csv(data_path) if data_path.endswith('.csv') else pd.read_excel(data_path)
     
-    # 生成图表
-    chart_gen = ChartGenerator(data)
-    numeric_cols = data.select_dtypes(include=['number']).columns.tolist()
-    
-    charts = []
-    if len(numeric_cols) >= 2:
-        result = chart_gen.generate(numeric_cols[0], [numeric_cols[1]], 
-                                   ChartConfig(title=f"{numeric_cols[0]} vs {numeric_cols[1]}"))
-        charts.append(result)
-    
-    # 生成报告
+    # 生成报告（图表按数据画像推荐，并行渲染）
     word_gen = WordReportGenerator(template)
+    word_gen.add_chart_specs(data, recommend_charts(data))
     doc = word_gen.generate_report(
         title=title,
         author=author,
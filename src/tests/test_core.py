@@ -2,6 +2,9 @@
 # Test Cases
 
 import unittest
+import importlib.util
+from unittest import mock
+import base64
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -9,8 +12,45 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.generators.chart_generator import ChartGenerator, ChartConfig
+from src.generators.chart_generator import ChartGenerator, ChartConfig, render_charts
+from src.generators import chart_generator
 from src.generators.report_generator import ReportGenerator
+from src.generators.local_analysis import LocalStatAnalyzer, local_analysis_summary
+from src.generators.fitting import weighted_polyfit, odr_polyfit, bootstrap_band
+from src.generators import fitting
+from src.generators.error_analysis import ErrorAnalyzer, grubbs_critical
+from src.generators.data_profile import profile_columns, recommend_charts
+from src.generators.shared_data import SharedDataHandle
+from src.generators import shared_data
+from src.generators.pdf_generator import DataValidator, PDFGenerator
+import pickle
+import os
+import tempfile
+from src.generators.data_cache import DataCache
+from src.generators import data_cache
+from src.generators.batch_processor import BatchReportGenerator, BatchTask, tasks_from_directory
+from src.generators.batch_journal import BatchJournal
+from src.generators import batch_scheduler
+from src.generators.batch_scheduler import TaskScheduler, estimate_task, order_by_cost
+from src.generators.batch_processor import BatchResult
+from src.generators.metrics import summarize_stages
+from src.generators import profiling
+from src.generators import fonts
+from src.generators import template_engine
+from src.generators.template_engine import TemplateEngine
+from src.generators.report_daemon import (ReportDaemon, DaemonClient, DaemonError,
+                                          DaemonUnavailable, send_request)
+import threading
+import urllib.request
+import urllib.error
+from src.generators.report_service import ReportService
+from src.generators import report_service as service_module
+import json
+import subprocess
+import time
+from src.generators import ai_engine
+from src.generators.ai_engine import (DataPromptCompactor, estimate_tokens,
+                                      AILabAnalyzer, AIConfig, BaseLLMProvider)
 
 class TestChartGenerator(unittest.TestCase):
     """图表生成器测试"""
@@ -48,6 +88,44 @@ class TestChartGenerator(unittest.TestCase):
         self.assertIn('equation', result)
         self.assertGreater(result['r_squared'], 0)
     
+    def test_fit_regressions_batched(self):
+        """批量回归与 np.polyfit 一致"""
+        x = np.linspace(0, 5, 20)
+        data = pd.DataFrame({'x': x, 'a': 1 + 2 * x + 0.1 * np.sin(7 * x), 'b': x ** 2 - x})
+        fits = ChartGenerator(data).fit_regressions('x', ['a', 'b'], degrees=[1, 2, 3])
+        for col in ('a', 'b'):
+            for degree in (1, 2, 3):
+                coeffs, cov = np.polyfit(x, data[col], degree, cov=True)
+                fit = fits[col][degree]
+                np.testing.assert_allclose(fit['coefficients'], coeffs, rtol=1e-6, atol=1e-9)
+                self.assertLessEqual(fit['adj_r_squared'], fit['r_squared'])
+        np.testing.assert_allclose(fits['a'][1]['std_errors'], np.sqrt(np.diag(
+            np.polyfit(x, data['a'], 1, cov=True)[1])), rtol=1e-6)
+    
+    def test_exact_fit_degree(self):
+        """n 个点可做 n-1 次拟合（精确插值，R² = 1）"""
+        data = pd.DataFrame({'x': [1, 2, 3], 'y': [2, 5, 4]})
+        result = ChartGenerator(data).generate_regression('x', 'y', degree=2, plot=False)
+        np.testing.assert_allclose(result['coefficients'], np.polyfit(data['x'], data['y'], 2), atol=1e-9)
+        self.assertEqual(result['r_squared'], 1.0)
+        self.assertTrue(np.isnan(result['adj_r_squared']))
+        with self.assertRaises(ValueError):
+            ChartGenerator(data).generate_regression('x', 'y', degree=3, plot=False)
+    
+    def test_grid_layout(self):
+        """多个序列在一张子图网格中一次渲染"""
+        data = pd.DataFrame({'t': range(20), **{f'ch{i}': np.arange(20) * i for i in range(5)}})
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "test_grid.png"
+            config = ChartConfig(layout="grid", chart_type="line", save_path=str(output))
+            result = ChartGenerator(data).generate('t', [f'ch{i}' for i in range(5)], config)
+            self.assertTrue(result['image_base64'].startswith('data:image/png;base64,'))
+            self.assertEqual(output.read_bytes(), base64.b64decode(result['image_base64'].split(',', 1)[1]))
+        
+        report = ReportGenerator()
+        report.add_charts(data, 't', ['ch1', 'ch2'])
+        self.assertEqual(len(report.charts), 1)
+    
     def test_error_analysis(self):
         """测试误差分析"""
         result = self.generator.generate_error_analysis('x', 'y')
@@ -56,6 +134,62 @@ class TestChartGenerator(unittest.TestCase):
         self.assertIn('relative_error_percent', result)
 
 
+class TestUncertaintyFitting(unittest.TestCase):
+    """不确定度拟合测试"""
+    
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x = np.linspace(0, 10, 30)
+        self.sy = np.linspace(0.1, 1.0, 30)
+        self.y = 2 * self.x + 1 + rng.normal(0, self.sy)
+    
+    def test_weighted_matches_polyfit(self):
+        """加权拟合与 np.polyfit(w=1/σ) 一致"""
+        fit = weighted_polyfit(self.x, self.y, self.sy, degree=1)
+        coeffs, cov = np.polyfit(self.x, self.y, 1, w=1 / self.sy, cov='unscaled')
+        np.testing.assert_allclose(fit.params, coeffs, rtol=1e-8)
+        np.testing.assert_allclose(fit.std_errors, np.sqrt(np.diag(cov)), rtol=1e-8)
+    
+    def test_odr_inflates_uncertainty(self):
+        """x 有误差时参数不确定度变大"""
+        wls = weighted_polyfit(self.x, self.y, self.sy)
+        odr = odr_polyfit(self.x, self.y, sigma_x=0.3, sigma_y=self.sy)
+        self.assertGreater(odr.std_errors[0], wls.std_errors[0])
+    
+    @unittest.skipUnless(importlib.util.find_spec("scipy"), "需要 scipy")
+    def test_odr_scipy_matches_fallback(self):
+        """scipy.odr 与有效方差迭代结果接近（两种方法的近似不同）"""
+        odr = odr_polyfit(self.x, self.y, sigma_x=0.3, sigma_y=self.sy)
+        fallback = odr_polyfit(self.x, self.y, sigma_x=0.3, sigma_y=self.sy, use_scipy=False)
+        np.testing.assert_allclose(odr.params, fallback.params, rtol=0.05)
+        np.testing.assert_allclose(odr.std_errors, fallback.std_errors, rtol=0.05)
+        self.assertAlmostEqual(odr.chi2, fallback.chi2, delta=0.05 * fallback.chi2)
+        self.assertEqual(odr.dof, 28)
+    
+    def test_bootstrap_band(self):
+        """自助法置信带包含拟合曲线"""
+        band = bootstrap_band(self.x, self.y, self.sy, n_boot=2000)
+        fit = weighted_polyfit(self.x, self.y, self.sy)
+        line = np.polyval(fit.params, np.asarray(band["x"]))
+        self.assertTrue(np.all(np.asarray(band["lower"]) <= line + 1e-9))
+        self.assertTrue(np.all(np.asarray(band["upper"]) >= line - 1e-9))
+    
+    def test_bootstrap_chunks_match(self):
+        """分块求解与一次求解结果相同"""
+        full = bootstrap_band(self.x, self.y, self.sy, n_boot=500)
+        with mock.patch.object(fitting, "BOOTSTRAP_CHUNK_ELEMENTS", 2 * 30 * 7):
+            chunked = bootstrap_band(self.x, self.y, self.sy, n_boot=500)
+        np.testing.assert_allclose(chunked["lower"], full["lower"])
+        np.testing.assert_allclose(chunked["params_std"], full["params_std"])
+    
+    def test_chart_error_bars(self):
+        """ChartGenerator 加权拟合输出图片"""
+        data = pd.DataFrame({'x': self.x, 'y': self.y, 'dy': self.sy})
+        result = ChartGenerator(data).generate_weighted_regression('x', 'y', yerr_col='dy', bootstrap=500)
+        self.assertIn('image_base64', result)
+        self.assertIn('confidence_band', result)
+
+
 class TestReportGenerator(unittest.TestCase):
     """报告生成器测试"""
     
@@ -94,6 +228,15 @@ class TestReportGenerator(unittest.TestCase):
         self.assertIn("测试实验", report)
         self.assertIn("测试用户", report)
         self.assertIn("物理实验基础模板", report)
+    
+    def test_all_nan_column(self):
+        """全空数值列的统计为 NaN，报告正常渲染"""
+        data = pd.DataFrame({'x': [1, 2, 3], 'y': [np.nan] * 3})
+        summary = self.generator.summarize_data(data)
+        self.assertTrue(np.isnan(summary["statistics"]["y"]["mean"]))
+        self.assertIsNone(summary["columns"][1]["mean"])
+        report = self.generator.generate_report(title="空列", data=data)
+        self.assertIn("y: 均值=nan", report)
 
 
 class TestTemplates(unittest.TestCase):
@@ -116,5 +259,1017 @@ class TestTemplates(unittest.TestCase):
         self.assertEqual(gen.template.name, "cs_algorithm")
 
 
+class TestTemplateEngine(unittest.TestCase):
+    """用户模板编译与填充测试"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "t.md"
+        self.path.write_text("# {{title}}\n{{author}} / {{title}} / {{missing}}", encoding="utf-8")
+    
+    def test_compile_once_and_fill(self):
+        """编译结果缓存，填充一次完成；未提供的变量保留原样，值中的占位符不再展开"""
+        engine = TemplateEngine()
+        template = engine.load_template(str(self.path))
+        self.assertEqual(template.compiled.variables, ["title", "author", "missing"])
+        self.assertEqual(sorted(template.variables), ["author", "missing", "title"])
+        
+        with mock.patch("builtins.open", side_effect=AssertionError("不应重新读取模板")):
+            content = engine.fill_template(template, {"title": "实验", "author": "{{title}}"})
+        self.assertEqual(content, "# 实验\n{{title}} / 实验 / {{missing}}")
+    
+    def test_recompile_after_change(self):
+        """模板文件修改后重新编译"""
+        engine = TemplateEngine()
+        template = engine.load_template(str(self.path))
+        self.path.write_text("{{title}}!", encoding="utf-8")
+        os.utime(self.path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        self.assertEqual(engine.fill_template(template, {"title": "新"}), "新!")
+        self.assertIs(template_engine.compile_template(str(self.path)), template.compiled)
+    
+    def test_defaults_and_filters(self):
+        """{{name|默认}}、跨行默认文本、嵌套占位符与过滤器"""
+        compiled = template_engine.compile_string(
+            "{{a|无}} {{b|}} {{c|1|2}} {{d:.2f|?}} {{e:upper}}\n"
+            "{{table|\n| x |\n|---|\n}}\n{{g|见 {{a}} 节}}"
+        )
+        self.assertEqual(compiled.variables, ["a", "b", "c", "d", "e", "table", "g"])
+        self.assertEqual(compiled.render({}), "无  1|2 ? {{e:upper}}\n| x |\n|---|\n见 {{a}} 节")
+        self.assertEqual(compiled.render({"a": "二", "d": "3.14159", "e": "ok", "table": "T"}),
+                         "二  1|2 3.14 OK\nT\n见 二 节")
+    
+        integers = template_engine.compile_string("{{n:d}} {{n:x}} {{n:>4d}}")
+        self.assertEqual(integers.render({"n": 255}), "255 ff  255")
+        self.assertEqual(integers.render({"n": "255"}), "255 ff  255")
+        self.assertEqual(integers.render({"n": 255.0}), "255 ff  255")
+        self.assertEqual(integers.render({"n": "2.5"}), "2.5 2.5 2.5")
+        
+        fields = {f.name: f for f in TemplateEngine._fields_from(compiled)}
+        self.assertFalse(fields["table"].required)
+        self.assertEqual(fields["table"].placeholder, "| x |\n|---|")
+        self.assertTrue(fields["e"].required)
+    
+    def test_latex_braces_and_errors(self):
+        """默认文本中成对的单花括号不会提前结束；未闭合或未知过滤器报错"""
+        compiled = template_engine.compile_string(r"$\frac{a}{b}$ {{f|$\frac{c_{\text{x}}}{2}$}} {x}")
+        self.assertEqual(compiled.render({}), r"$\frac{a}{b}$ $\frac{c_{\text{x}}}{2}$ {x}")
+        with self.assertRaisesRegex(template_engine.TemplateSyntaxError, "第 2 行"):
+            template_engine.compile_string("ok\n{{name|没有结尾")
+        with self.assertRaises(template_engine.TemplateSyntaxError):
+            template_engine.compile_string("{{name:nope}}")
+    
+    def test_bundled_templates(self):
+        """内置 Markdown 模板全部可以编译，带默认值的占位符都会被替换"""
+        root = Path(__file__).parent.parent.parent / "templates"
+        paths = sorted(root.rglob("*.md"))
+        self.assertTrue(paths)
+        for path in paths:
+            content = template_engine.compile_template(str(path)).render({})
+            self.assertNotRegex(content, r"\{\{\w+\|", str(path))
+
+
+class TestPromptCompactor(unittest.TestCase):
+    """AI 数据提示词压缩测试"""
+    
+    def test_budget_respected(self):
+        """宽表在预算内输出 CSV"""
+        data = pd.DataFrame(np.random.rand(2000, 80), columns=[f"c{i}" for i in range(80)])
+        text = DataPromptCompactor(1500).compact(data, "宽表")
+        self.assertLess(estimate_tokens(text), 1600)
+        self.assertIn("c0,c1,c2", text)
+    
+    def test_extremes_selected(self):
+        """极值行被选中"""
+        y = np.zeros(1000)
+        y[537] = 99.0
+        data = pd.DataFrame({'x': np.arange(1000), 'y': y})
+        rows = DataPromptCompactor().select_rows(data, 10)
+        self.assertIn(537, rows)
+        self.assertIn(0, rows)
+        self.assertIn(999, rows)
+
+
+class _FakeStreamProvider(BaseLLMProvider):
+    """测试用流式提供商"""
+    
+    def chat(self, messages, **kwargs):
+        return "".join(self.chat_stream(messages))
+    
+    def chat_stream(self, messages, **kwargs):
+        yield from ["现象: 线性", "增长\n", "结论: 符合预期\n", "置信度: 0.9"]
+
+
+class TestAIStreaming(unittest.TestCase):
+    """AI 流式输出测试"""
+    
+    def test_on_token_receives_chunks(self):
+        """流式片段逐段回调且结果可解析"""
+        analyzer = AILabAnalyzer(AIConfig(provider="local"))
+        analyzer.provider = _FakeStreamProvider()
+        analyzer._available = True
+        
+        chunks = []
+        data = pd.DataFrame({'x': [1, 2, 3], 'y': [2, 4, 6]})
+        result = analyzer.analyze_phenomenon(data, "测试", on_token=chunks.append)
+        
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(result.phenomenon, "线性增长")
+        self.assertEqual(result.conclusion, "符合预期")
+        self.assertAlmostEqual(result.confidence, 0.9)
+        self.assertFalse(result.fallback)
+    
+    def test_stream_failure_marks_fallback(self):
+        """流式输出中途失败时改用本地分析并标记"""
+        def broken(messages, **kwargs):
+            yield "现象: 线性"
+            raise ConnectionError("中断")
+        
+        analyzer = AILabAnalyzer(AIConfig(provider="baidu"))
+        analyzer.provider = _FakeStreamProvider()
+        analyzer.provider.chat_stream = broken
+        analyzer._available = True
+        
+        chunks = []
+        data = pd.DataFrame({'x': [1, 2, 3], 'y': [2, 4, 6]})
+        with mock.patch('builtins.print'):
+            result = analyzer.analyze_phenomenon(data, "测试", on_token=chunks.append)
+        self.assertEqual(chunks, ["现象: 线性"])
+        self.assertTrue(result.fallback)
+        self.assertIn("baidu", AILabAnalyzer.DEFAULT_MODELS)
+
+
+class TestClientRegistry(unittest.TestCase):
+    """共享 LLM 客户端测试"""
+    
+    def tearDown(self):
+        ai_engine.clear_client_registry()
+    
+    def test_clients_reused_across_providers(self):
+        """相同 (provider, base_url, api_key) 复用同一客户端"""
+        with mock.patch.object(ai_engine, "_build_client", side_effect=lambda *a: object()) as build:
+            config = AIConfig(provider="local", base_url="http://127.0.0.1:11434/v1")
+            first = ai_engine.LocalProvider(config)._get_client()
+            second = ai_engine.LocalProvider(config)._get_client()
+            other = ai_engine.OpenAIProvider(AIConfig(api_key="k"))._get_client()
+        
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(build.call_count, 2)
+    
+    def test_client_settings_in_key(self):
+        """timeout / pool_size 不同的调用方不共用客户端"""
+        with mock.patch.object(ai_engine, "_build_client", side_effect=lambda *a: a) as build:
+            base = ai_engine.get_shared_client("openai", "k", timeout=60, pool_size=10)
+            slow = ai_engine.get_shared_client("openai", "k", timeout=300, pool_size=10)
+            wide = ai_engine.get_shared_client("openai", "k", timeout=60, pool_size=32)
+            again = ai_engine.get_shared_client("openai", "k", timeout=60.0, pool_size=10)
+        self.assertIs(base, again)
+        self.assertEqual([c[3:] for c in (base, slow, wide)], [(60, 10), (300, 10), (60, 32)])
+        self.assertEqual(build.call_count, 3)
+
+
+class TestLocalAnalysis(unittest.TestCase):
+    """本地统计分析引擎测试"""
+    
+    def setUp(self):
+        x = np.linspace(1, 10, 30)
+        rng = np.random.default_rng(0)
+        self.data = pd.DataFrame({
+            'x': x,
+            'lin': 3 * x + 1 + rng.normal(0, 0.01, 30),
+            'exp': 2 * np.exp(0.5 * x),
+            'const': np.full(30, 7.0),
+        })
+        self.data.loc[12, 'lin'] += 5
+    
+    def test_model_selection(self):
+        """按 AIC 选出正确模型，常数列不参与拟合"""
+        result = LocalStatAnalyzer(self.data).analyze()
+        self.assertEqual(result["independent"], 'x')
+        self.assertEqual(result["best_models"]["exp"], "exp")
+        self.assertIn(result["best_models"]["lin"], ("linear", "poly2", "poly3"))
+        self.assertEqual(result["constant"], ['const'])
+    
+    def test_residual_anomaly(self):
+        """残差异常点被检出"""
+        result = LocalStatAnalyzer(self.data).analyze()
+        self.assertIn(12, result["anomalies"]["lin"])
+    
+    def test_fallback_uses_engine(self):
+        """降级分析返回结构化结果"""
+        analyzer = AILabAnalyzer(AIConfig(provider="openai", api_key=""))
+        result = analyzer.analyze_phenomenon(self.data, "测试")
+        self.assertIn("best_models", result.details)
+        self.assertIn("第 13 组", result.anomaly)
+    
+    def test_trend_follows_x_order(self):
+        """x 随行号递减时按 x 排序描述趋势；负系数写作减号"""
+        data = pd.DataFrame({'x': [10, 9, 8, 7, 6, 5], 'y': [1, 2, 3, 4, 5.1, 6]})
+        texts, details = local_analysis_summary(data)
+        self.assertEqual(texts["trend"], "随 x 增加：y 严格单调递减")
+        self.assertIn("负相关", texts["phenomenon"])
+        equation = details["fits"]["y"][0]["equation"]
+        self.assertRegex(equation, r"^y = [\d.]+ - [\d.]+x")
+        self.assertNotIn("+ -", equation)
+    
+    def test_sparse_column_and_label_index(self):
+        """缺测列不影响其他列的拟合；异常点按行位置报告（非整数索引）"""
+        t = np.arange(20.0)
+        data = pd.DataFrame({'t': t, 'v': 2 * t + 1, 'u': [np.nan] * 19 + [0.1]},
+                            index=pd.date_range("2024-01-01", periods=20))
+        data.iloc[7, 1] += 30
+        texts, details = local_analysis_summary(data)
+        self.assertEqual(details["best_models"]["v"], "linear")
+        self.assertEqual(details["anomalies"]["v"], [7])
+        self.assertEqual(details["constant"], [])
+        self.assertIn("u 有效数据不足（1 组）", texts["phenomenon"])
+        self.assertIn("v 第 8 组", texts["anomaly"])
+
+
+class TestErrorAnalysis(unittest.TestCase):
+    """误差分析引擎测试"""
+    
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.data = pd.DataFrame({
+            'a': rng.normal(10, 0.1, 500),
+            'b': rng.normal(-3, 2, 500),
+            'zero': np.zeros(500),
+        })
+        self.data.loc[42, 'a'] = 15.0
+    
+    def test_grubbs_critical_table(self):
+        """Grubbs 临界值与查表值一致"""
+        self.assertAlmostEqual(grubbs_critical(10), 2.29, places=2)
+        self.assertAlmostEqual(grubbs_critical(30), 2.91, places=2)
+    
+    def test_outliers_detected(self):
+        """Grubbs 与 Chauvenet 均检出异常点"""
+        small = pd.DataFrame({'v': [10.1, 10.2, 9.9, 10.0, 10.1, 12.5, 10.0]})
+        result = ErrorAnalyzer().analyze(small)['v']
+        self.assertEqual(result['grubbs_outliers'], [5])
+        self.assertEqual(result['chauvenet_outliers'], [5])
+    
+    def test_zero_mean_guard(self):
+        """均值为 0 时相对误差为 None 而非 inf"""
+        result = ErrorAnalyzer().analyze(self.data, type_b={'a': 0.03})
+        self.assertIsNone(result['zero']['cv_percent'])
+        self.assertAlmostEqual(result['a']['type_b'], 0.03 / np.sqrt(3))
+        chart = ChartGenerator(self.data.assign(x=range(500))).generate_error_analysis('x', 'zero')
+        self.assertIsNone(chart['relative_error_percent'])
+    
+    def test_chunks_match_full(self):
+        """分块结果与整体计算一致"""
+        analyzer = ErrorAnalyzer()
+        full = analyzer.analyze(self.data)
+        chunks = analyzer.analyze_chunks(
+            lambda: (self.data.iloc[i:i + 64] for i in range(0, 500, 64)))
+        for col in ('a', 'b'):
+            self.assertAlmostEqual(chunks[col]['mean'], full[col]['mean'])
+            self.assertAlmostEqual(chunks[col]['std'], full[col]['std'])
+            self.assertEqual(chunks[col]['chauvenet_outliers'], full[col]['chauvenet_outliers'])
+        self.assertIn(42, chunks['a']['grubbs_outliers'])
+    
+    def test_chunks_with_stray_text(self):
+        """后续分块中出现文本单元格时按缺失值处理"""
+        first = pd.DataFrame({'a': [1.0, 2.0, 3.0], 'b': [4.0, 5.0, 6.0]})
+        second = pd.DataFrame({'a': [4.0, 5.0], 'b': ['7', '坏值']}, index=[3, 4])
+        result = ErrorAnalyzer().analyze_chunks(lambda: iter([first, second]))
+        self.assertEqual(result['b']['n'], 4)
+        self.assertAlmostEqual(result['b']['mean'], 5.5)
+        self.assertEqual(result['a']['n'], 5)
+
+
+class TestChartRecommendation(unittest.TestCase):
+    """数据画像与图表推荐测试"""
+    
+    def test_profile_matches_pandas(self):
+        """画像统计量与 pandas 一致"""
+        data = pd.DataFrame({'a': [1.0, 2.0, np.nan, 4.0], 'b': [3, 3, 5, 1], 'c': list('xyxz')})
+        profile = profile_columns(data)
+        self.assertAlmostEqual(profile['a'].std, data['a'].std())
+        self.assertEqual(profile['a'].null_count, 1)
+        self.assertEqual(profile['b'].unique_count, 3)
+        self.assertEqual(profile['c'].kind, 'categorical')
+        self.assertEqual(profile['c'].top_values['x'], 2)
+    
+    def test_time_series_line(self):
+        """等间隔单调列作为 X，折线图"""
+        t = np.arange(50) * 0.1
+        data = pd.DataFrame({'signal': np.sin(t), 't': t})
+        configs = recommend_charts(data)
+        self.assertEqual(len(configs), 1)
+        self.assertEqual((configs[0].x_col, configs[0].y_cols), ('t', ['signal']))
+        self.assertEqual(configs[0].chart_type, 'line')
+    
+    def test_irregular_scatter_and_grid(self):
+        """非等间隔用散点图，多因变量合并为子图网格"""
+        x = np.sort(np.random.default_rng(0).uniform(0, 10, 40))
+        data = pd.DataFrame({'x': x, **{f'y{i}': x * i for i in range(1, 5)}})
+        configs = recommend_charts(data)
+        self.assertEqual(len(configs), 1)
+        self.assertEqual(configs[0].chart_type, 'scatter')
+        self.assertEqual(configs[0].layout, 'grid')
+        self.assertEqual(configs[0].y_cols, ['y1', 'y2', 'y3', 'y4'])
+    
+    def test_repeated_measurements_histogram(self):
+        """无自变量时推荐分布直方图，且可直接渲染"""
+        rng = np.random.default_rng(1)
+        data = pd.DataFrame({'m1': rng.normal(size=30), 'm2': rng.normal(size=30)})
+        configs = recommend_charts(data)
+        self.assertEqual(configs[0].chart_type, 'histogram')
+        result = ChartGenerator(data).render(configs[0])
+        self.assertIn('image_base64', result)
+    
+    def test_parallel_render_matches_sequential(self):
+        """进程池渲染结果与顺序渲染一致，顺序保持不变"""
+        data = pd.DataFrame({'t': np.arange(30), 'a': np.arange(30) ** 2, 'b': -np.arange(30)})
+        configs = [ChartConfig(chart_type='line', x_col='t', y_cols=[c]) for c in ('a', 'b')]
+        sequential = render_charts(data, configs, max_workers=1)
+        parallel = render_charts(data, configs, max_workers=2)
+        self.assertEqual([r['image_base64'] for r in parallel],
+                         [r['image_base64'] for r in sequential])
+        
+        report = ReportGenerator()
+        self.assertEqual(report.add_chart_specs(data, configs, max_workers=2), ['chart_1', 'chart_2'])
+    
+    def test_render_pool_shared_across_threads(self):
+        """多个线程同时渲染（进程数不同）时不会关闭彼此正在使用的进程池"""
+        data = pd.DataFrame({'t': np.arange(30), 'a': np.arange(30) ** 2, 'b': -np.arange(30)})
+        configs = [ChartConfig(chart_type='line', x_col='t', y_cols=[c]) for c in ('a', 'b', 'a')]
+        chart_generator.shutdown_render_pool()
+        results, errors = [], []
+        
+        def render(workers):
+            try:
+                results.append(render_charts(data, configs, max_workers=workers))
+            except Exception as e:
+                errors.append(e)
+        
+        with mock.patch("builtins.print") as printed:
+            threads = [threading.Thread(target=render, args=(w,)) for w in (2, 3, 2, 3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual([len(r) for r in results], [3] * 4)
+        printed.assert_not_called()  # 没有退回顺序渲染
+        self.assertEqual(chart_generator._RENDER_POOL_USERS, 0)
+
+
+class TestSharedData(unittest.TestCase):
+    """共享内存数据句柄测试"""
+    
+    def setUp(self):
+        self.data = pd.DataFrame({
+            'id': ['a', 'b', 'c', 'd'],
+            'x': [1, 2, 3, 4],
+            'y': [0.5, np.nan, 1.5, 2.0],
+        })
+        self.handle = SharedDataHandle.from_dataframe(self.data)
+    
+    def tearDown(self):
+        self.handle.close()
+    
+    def test_round_trip_zero_copy(self):
+        """跨 pickle 还原后列顺序一致，数值列映射同一块内存"""
+        restored = pickle.loads(pickle.dumps(self.handle))
+        frame = restored.to_dataframe()
+        self.assertEqual(list(frame.columns), ['id', 'x', 'y'])
+        self.assertEqual(frame['id'].tolist(), ['a', 'b', 'c', 'd'])
+        self.assertTrue(np.shares_memory(frame['x'].to_numpy(), self.handle.array()))
+        pd.testing.assert_frame_equal(frame[['x', 'y']], self.data[['x', 'y']].astype(float))
+    
+    def test_consumers_accept_handle(self):
+        """DataValidator、summarize_data、ChartGenerator 直接接受句柄"""
+        self.assertEqual(DataValidator().validate(self.handle)["valid"],
+                         DataValidator().validate(self.data)["valid"])
+        summary = ReportGenerator().summarize_data(self.handle)
+        self.assertAlmostEqual(summary["statistics"]["x"]["mean"], 2.5)
+        config = ChartConfig(x_col='x', y_cols=['y'])
+        self.assertIn('image_base64', ChartGenerator(self.handle).render(config))
+        results = render_charts(self.handle, [config, config], max_workers=2)
+        self.assertEqual(len(results), 2)
+    
+    def test_attach_untracked_and_detach(self):
+        """映射方不登记 resource_tracker，close 后解除映射"""
+        restored = pickle.loads(pickle.dumps(self.handle))
+        # 模拟其他进程：本进程未登记为创建者
+        with mock.patch.dict(shared_data._CREATED, clear=True), \
+                mock.patch("multiprocessing.resource_tracker.register") as register:
+            frame = restored.to_dataframe()
+            self.assertEqual(frame['x'].sum(), 10)
+            self.assertIn(restored.name, shared_data._ATTACHED)
+            del frame
+            restored.close()
+        register.assert_not_called()
+        self.assertNotIn(restored.name, shared_data._ATTACHED)
+    
+    def test_render_charts_shares_large_data(self):
+        """render_charts 自动把大数据集放入共享内存，渲染完成后释放"""
+        config = ChartConfig(x_col='x', y_cols=['y'])
+        with mock.patch.object(shared_data, "SHARE_MIN_BYTES", 0), \
+                mock.patch.object(SharedDataHandle, "from_dataframe",
+                                  wraps=SharedDataHandle.from_dataframe) as share:
+            results = render_charts(self.data, [config, config], max_workers=2)
+        share.assert_called_once()
+        self.assertEqual(len(results), 2)
+        self.assertEqual(list(shared_data._CREATED), [self.handle.name])
+
+
+class TestDataCache(unittest.TestCase):
+    """数据解析缓存测试"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.csv = root / "data.csv"
+        pd.DataFrame({'x': [1, 2, 3], 'y': [0.1, 0.2, 0.3]}).to_csv(self.csv, index=False)
+        # 默认缓存（load_dataframe）也指向临时目录，不写入用户的缓存
+        for patcher in (mock.patch.dict(os.environ, {"SMART_LAB_CACHE_DIR": str(root / "cache")}),
+                        mock.patch.object(data_cache, "_DEFAULT_CACHE", None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cache = DataCache()
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_hit_after_first_load(self):
+        """第二次加载命中缓存，结果一致"""
+        first = self.cache.load(str(self.csv))
+        second = self.cache.load(str(self.csv))
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+    
+    def test_invalidated_on_change(self):
+        """文件修改后重新解析"""
+        self.cache.load(str(self.csv))
+        pd.DataFrame({'x': [9], 'y': [9.9]}).to_csv(self.csv, index=False)
+        stat = self.csv.stat()
+        os.utime(self.csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.cache.load(str(self.csv))['x'].tolist(), [9])
+        self.assertEqual(self.cache.misses, 2)
+    
+    def test_eviction_and_clear(self):
+        """超过容量上限时淘汰，clear 清空"""
+        self.cache.load(str(self.csv))
+        self.assertEqual(self.cache.stats()["entries"], 1)
+        small = DataCache(cache_dir=str(self.cache.cache_dir), max_bytes=0)
+        small.put(str(self.csv), pd.read_csv(self.csv))
+        self.assertEqual(small.stats()["entries"], 0)
+        self.cache.load(str(self.csv))
+        self.assertEqual(self.cache.clear(), 1)
+        self.assertIsNone(self.cache.get(str(self.csv)))
+    
+    def test_concurrent_processes_keep_entries(self):
+        """多个进程同时写入索引时条目不丢失"""
+        paths = []
+        for i in range(8):
+            path = Path(self.tmp.name) / f"d{i}.csv"
+            pd.DataFrame({'x': [i, i + 1], 'y': [0.5, 1.5]}).to_csv(path, index=False)
+            paths.append(str(path))
+        
+        def load(path):
+            for _ in range(5):
+                DataCache().load(path)
+                DataCache().get(path)
+        
+        import multiprocessing
+        processes = [multiprocessing.Process(target=load, args=(p,)) for p in paths]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual([p.exitcode for p in processes], [0] * 8)
+        self.assertEqual(self.cache.stats()["entries"], 8)
+        self.assertEqual(data_cache.get_data_cache().cache_dir, self.cache.cache_dir)
+
+
+class TestIncrementalBatch(unittest.TestCase):
+    """批量增量清单测试"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.csv = root / "run.csv"
+        pd.DataFrame({'x': [1, 2, 3], 'y': [2, 4, 6]}).to_csv(self.csv, index=False)
+        self.out = root / "out"
+        self.task = BatchTask(data_path=str(self.csv), title="run", output_format="html")
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def _run(self, **kwargs):
+        with mock.patch('builtins.print'):
+            return BatchReportGenerator(str(self.out)).process_batch([self.task], **kwargs)[0]
+    
+    def test_skips_unchanged(self):
+        """未变化跳过；修改输入、选项或 force 时重新生成"""
+        self.assertFalse(self._run().skipped)
+        self.assertTrue(self._run().skipped)
+        
+        self.task.author = "张三"
+        self.assertFalse(self._run().skipped)
+        self.assertTrue(self._run(force=False).skipped)
+        self.assertFalse(self._run(force=True).skipped)
+        
+        pd.DataFrame({'x': [1, 2, 3], 'y': [2, 4, 7]}).to_csv(self.csv, index=False)
+        stat = self.csv.stat()
+        os.utime(self.csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertFalse(self._run().skipped)
+    
+    def test_missing_output_rebuilds(self):
+        """输出文件被删除时重新生成"""
+        result = self._run()
+        for path in result.output_files:
+            Path(path).unlink()
+        self.assertFalse(self._run().skipped)
+
+
+class TestBatchJournal(unittest.TestCase):
+    """批量日志 / 断点续跑 / 死信列表测试"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.good = self.root / "good.csv"
+        pd.DataFrame({'x': [1, 2, 3], 'y': [2, 4, 6]}).to_csv(self.good, index=False)
+        self.bad = self.root / "bad.csv"
+        self.bad.write_text("x,y\n", encoding='utf-8')
+        self.out = self.root / "out"
+        self.tasks = [BatchTask(data_path=str(p), title=p.stem, output_format="html")
+                      for p in (self.good, self.bad)]
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def _run(self, tasks, **kwargs):
+        batch = BatchReportGenerator(str(self.out), incremental=False)
+        with mock.patch('builtins.print'):
+            return batch, batch.process_batch(tasks, **kwargs)
+    
+    def test_resume_and_dead_letter(self):
+        """续跑跳过已完成任务；失败任务写入死信列表并可重试"""
+        batch, results = self._run(self.tasks)
+        self.assertEqual([r.success for r in results], [True, False])
+        self.assertEqual([t.title for t in batch.load_failed_tasks()], ["bad"])
+        
+        # 模拟崩溃留下的半行记录
+        with open(batch.journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"key": "trunc')
+        batch, results = self._run(self.tasks, resume=True)
+        self.assertTrue(results[0].skipped)
+        self.assertFalse(results[1].success)
+        
+        self.bad.write_text("x,y\n1,2\n2,3\n", encoding='utf-8')
+        batch, results = self._run(batch.load_failed_tasks())
+        self.assertTrue(results[0].success)
+        self.assertFalse(batch.journal.dead_letter_path.exists())
+        # 原子写入不留临时文件
+        self.assertFalse([p for p in self.out.iterdir() if ".tmp" in p.name])
+    
+    def test_missing_pdf_engine_not_complete(self):
+        """缺少 PDF 引擎时任务记为未完成，续跑时重新生成"""
+        tasks = [BatchTask(data_path=str(self.good), title="good", output_format="html,pdf")]
+        with mock.patch.object(PDFGenerator, "_detect_engine", return_value="html"):
+            batch, results = self._run(tasks)
+            self.assertFalse(results[0].success)
+            self.assertEqual(results[0].missing_formats, ["pdf"])
+            self.assertIn("pdf", results[0].error)
+            self.assertTrue(Path(results[0].output_files[0]).exists())
+            self.assertEqual([t.title for t in batch.load_failed_tasks()], ["good"])
+            batch, results = self._run(tasks, resume=True)
+            self.assertFalse(results[0].skipped)
+    
+    def test_journal_ignores_partial_lines(self):
+        """日志中无法解析的行被忽略，以最后一条记录为准"""
+        journal = BatchJournal(str(self.out))
+        journal.start()
+        journal.append({"key": "a", "status": "success", "outputs": []})
+        journal.append({"key": "b", "status": "success", "outputs": []})
+        journal.append({"key": "b", "status": "failed", "outputs": []})
+        with open(journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"key": "c", "sta')
+        self.assertEqual(list(journal.completed()), ["a"])
+        self.assertEqual(journal.start(resume=False), {})
+    
+    def test_tasks_from_directory(self):
+        """递归扫描、排除模式与模板匹配"""
+        sub = self.root / "物理" / "day1"
+        sub.mkdir(parents=True)
+        pd.DataFrame({'x': [1, 2]}).to_csv(sub / "欧姆定律.csv", index=False)
+        (sub / "notes.txt").write_text("-", encoding='utf-8')
+        
+        flat = tasks_from_directory(str(self.root), exclude=["bad*"])
+        self.assertEqual([t.title for t in flat], ["good"])
+        
+        tasks = tasks_from_directory(str(self.root), recursive=True, exclude=["bad*"],
+                                     template="chemistry_basic")
+        nested = next(t for t in tasks if t.title == "欧姆定律")
+        self.assertEqual(nested.output_name, str(Path("物理/day1/欧姆定律")))
+        self.assertEqual(nested.template, "physics_basic")
+        self.assertEqual(next(t for t in tasks if t.title == "good").template, "chemistry_basic")
+
+
+def _scheduled_job(seconds, allocate_mb=0):
+    """调度器测试用任务（子进程中运行）"""
+    block = np.ones(allocate_mb * 1024 * 1024 // 8) if allocate_mb else None
+    time.sleep(seconds)
+    del block
+    return seconds
+
+
+class TestBatchScheduler(unittest.TestCase):
+    """批量调度器测试"""
+    
+    def test_cost_ordering(self):
+        """大文件优先调度；行数估计"""
+        with tempfile.TemporaryDirectory() as tmp:
+            small, big = Path(tmp) / "small.csv", Path(tmp) / "big.csv"
+            pd.DataFrame({'x': range(10)}).to_csv(small, index=False)
+            pd.DataFrame({'x': range(100000)}).to_csv(big, index=False)
+            tasks = [BatchTask(data_path=str(p), title=p.stem, output_format="html") for p in (small, big)]
+            estimates = [estimate_task(t) for t in tasks]
+            self.assertEqual(estimates[0].rows, 10)
+            self.assertAlmostEqual(estimates[1].rows, 100000, delta=20000)
+            self.assertEqual([t.title for t in order_by_cost(tasks, estimates)], ["big", "small"])
+    
+    def test_timeout_and_memory_limit(self):
+        """超时任务被终止，超出内存上限的任务报告失败，其余任务正常完成"""
+        results = {}
+        scheduler = TaskScheduler(max_workers=3, timeout=2.0, memory_limit_mb=64, grace=0.5)
+        stats = scheduler.run(
+            [(0.0, 0), (30.0, 0), (30.0, 256)], lambda item: _scheduled_job(*item),
+            on_result=lambda item, value, error, duration: results.__setitem__(item, (value, error, duration)),
+            estimates=[batch_scheduler.TaskEstimate(0, 0, c, 0) for c in (1, 2, 3)])
+        self.assertEqual(results[(0.0, 0)][:2], (0.0, None))
+        self.assertIn("超时", results[(30.0, 0)][1])
+        self.assertLess(results[(30.0, 0)][2], 10)
+        self.assertIn("内存", results[(30.0, 256)][1])
+        self.assertLess(results[(30.0, 256)][2], 2)
+        self.assertEqual((stats["timed_out"], stats["over_memory"]), (1, 1))
+    
+    def test_memory_limit_unsupported(self):
+        """无法读取子进程内存时警告，任务照常运行"""
+        scheduler = TaskScheduler(max_workers=1, memory_limit_mb=64)
+        with mock.patch.object(batch_scheduler, "process_memory", return_value=None), \
+                mock.patch("builtins.print") as printed:
+            stats = scheduler.run([(0.0, 0)], lambda item: _scheduled_job(*item),
+                                  estimates=[batch_scheduler.TaskEstimate(0, 0, 1, 0)])
+        self.assertEqual(stats["completed"], 1)
+        self.assertIn("不生效", printed.call_args[0][0])
+    
+    def test_auto_workers(self):
+        """可用内存不足时减少并发数"""
+        estimates = [estimate_task(BatchTask(data_path="missing.csv", title="m"))] * 8
+        with mock.patch.object(batch_scheduler, "available_memory", return_value=300 * 1024 * 1024):
+            self.assertEqual(batch_scheduler.auto_workers(estimates), 1)
+        with mock.patch.object(batch_scheduler, "available_memory", return_value=None), \
+                mock.patch("os.cpu_count", return_value=4):
+            self.assertEqual(batch_scheduler.auto_workers(estimates), 4)
+
+
+class TestBatchMetrics(unittest.TestCase):
+    """批量运行指标测试"""
+    
+    def test_stage_percentiles(self):
+        """各阶段百分位与占比"""
+        task = BatchTask(data_path="a.csv", title="a")
+        results = [BatchResult(task=task, success=True, timings={"load": t, "chart": 3 * t})
+                   for t in (1.0, 2.0, 3.0, 4.0)]
+        stages = summarize_stages(results)
+        self.assertEqual(list(stages), ["load", "chart"])
+        self.assertAlmostEqual(stages["load"]["p50"], 2.5)
+        self.assertAlmostEqual(stages["chart"]["max"], 12.0)
+        self.assertAlmostEqual(stages["chart"]["share"], 0.75)
+    
+    def test_batch_exports_metrics(self):
+        """批量运行记录阶段耗时并导出 JSON / CSV"""
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / "run.csv"
+            pd.DataFrame({'x': [1, 2, 3], 'y': [2, 4, 6]}).to_csv(csv_path, index=False)
+            batch = BatchReportGenerator(str(Path(tmp) / "out"))
+            with mock.patch('builtins.print'):
+                result = batch.process_batch([BatchTask(data_path=str(csv_path), title="run",
+                                                        output_format="html")])[0]
+            self.assertTrue({"load", "validate", "chart", "html", "io"} <= set(result.timings))
+            self.assertGreater(result.peak_rss_mb, 0)
+            
+            metrics = json.loads(Path(batch.metrics_files["json"]).read_text(encoding='utf-8'))
+            self.assertEqual(metrics["summary"]["executed"], 1)
+            self.assertIn("chart", metrics["stages"])
+            header = Path(batch.metrics_files["csv"]).read_text(encoding='utf-8').splitlines()[0]
+            self.assertTrue(header.startswith("title,data_path,status,duration,peak_rss_mb,load"))
+            self.assertIn("stages", batch.generate_report())
+
+
+class TestProfiling(unittest.TestCase):
+    """剖析钩子测试"""
+    
+    def test_disabled_is_noop(self):
+        """未注册钩子时 span 返回共享空上下文"""
+        self.assertFalse(profiling.profiling_enabled())
+        self.assertIs(profiling.span("a"), profiling.span("b"))
+    
+    def test_span_export(self):
+        """span 嵌套关系、错误状态与 Chrome / OTel 导出"""
+        chrome, otel = profiling.ChromeTraceRecorder(), profiling.OTelSpanRecorder()
+        profiling.register_hook(chrome)
+        profiling.register_hook(otel)
+        try:
+            with profiling.span("outer", rows=3):
+                ChartGenerator(pd.DataFrame({'x': [1, 2, 3], 'y': [2, 4, 6]})).fit_regressions('x', ['y'])
+                with self.assertRaises(ValueError):
+                    profiling.traced("failing")(lambda: int("x"))()
+        finally:
+            profiling.unregister_hook(chrome)
+            profiling.unregister_hook(otel)
+        
+        names = [s.name for s in chrome.spans]
+        self.assertEqual(names, ["chart.fit", "failing", "outer"])
+        outer = chrome.spans[-1]
+        self.assertTrue(all(s.parent_id == outer.span_id for s in chrome.spans[:-1]))
+        
+        events = chrome.to_dict()["traceEvents"]
+        self.assertEqual({e["ph"] for e in events}, {"X"})
+        self.assertIn("error", events[1]["args"])
+        
+        spans = otel.to_dict()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual(len({s["traceId"] for s in spans}), 1)
+        self.assertEqual(spans[1]["status"]["code"], 2)
+        self.assertIn({"key": "rows", "value": {"intValue": "3"}}, spans[2]["attributes"])
+        with self.assertRaises(TypeError):
+            profiling.SpanRecorder()
+    
+    def test_batch_thread_spans_nested(self):
+        """线程池中的 batch.task span 挂在 batch.run 之下"""
+        recorder = profiling.ChromeTraceRecorder()
+        with tempfile.TemporaryDirectory() as tmp:
+            tasks = []
+            for name in ("a", "b"):
+                path = Path(tmp) / f"{name}.csv"
+                pd.DataFrame({'x': [1, 2, 3], 'y': [2, 4, 6]}).to_csv(path, index=False)
+                tasks.append(BatchTask(data_path=str(path), title=name, output_format="md"))
+            profiling.register_hook(recorder)
+            try:
+                with mock.patch('builtins.print'):
+                    BatchReportGenerator(str(Path(tmp) / "out"), incremental=False).process_batch(
+                        tasks, parallel=True, max_workers=2)
+            finally:
+                profiling.unregister_hook(recorder)
+        
+        run = next(s for s in recorder.spans if s.name == "batch.run")
+        task_spans = [s for s in recorder.spans if s.name == "batch.task"]
+        self.assertEqual(len(task_spans), 2)
+        self.assertTrue(all(s.parent_id == run.span_id and s.trace_id == run.trace_id for s in task_spans))
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """基准测试数据集与基线对比测试"""
+    
+    @classmethod
+    def setUpClass(cls):
+        from benchmarks import datasets, run_benchmarks
+        cls.datasets, cls.bench = datasets, run_benchmarks
+    
+    def test_dataset_shapes(self):
+        """合成数据与示例同形态，可按需扩展行列"""
+        for shape in self.datasets.SHAPES:
+            data = self.datasets.make_dataset(shape, rows=50, cols=8)
+            self.assertEqual(data.shape, (50, 8))
+            self.assertTrue(data.columns.is_unique)
+            for cols in (0, 1, 8):
+                self.assertEqual(self.datasets.dataset_width(shape, cols),
+                                 self.datasets.make_dataset(shape, rows=3, cols=cols).shape[1])
+        chem = self.datasets.make_dataset("chemistry", rows=5)
+        self.assertEqual(list(chem.columns), ["样品编号", "体积(mL)", "浓度(M)"])
+        pd.testing.assert_frame_equal(self.datasets.make_dataset("physics", 20),
+                                      self.datasets.make_dataset("physics", 20))
+    
+    def test_compare_with_baseline(self):
+        """变慢超过阈值且差值足够大时判定为退化"""
+        baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 0.0001}, "d": {"median": 1.0}}
+        current = {"a": {"median": 1.5}, "b": {"median": 0.5}, "c": {"median": 0.0003}, "d": {"median": 1.1},
+                   "new": {"median": 1.0}}
+        status = {r["key"]: r["status"] for r in self.bench.compare(current, baseline, 0.2, 0.002)}
+        self.assertEqual(status, {"a": "regression", "b": "improved", "c": "ok", "d": "ok"})
+
+
+class TestLazyImports(unittest.TestCase):
+    """延迟导入测试"""
+    
+    def test_import_is_lazy(self):
+        """import src 不加载 pandas / matplotlib / python-docx；导入图表模块不加载 matplotlib"""
+        code = (
+            "import sys, src\n"
+            "assert not {'pandas', 'matplotlib', 'docx'} & set(sys.modules), 'src'\n"
+            "from src.generators import chart_generator\n"
+            "assert 'matplotlib' not in sys.modules, 'chart'\n"
+            "from src import ChartGenerator, BatchReportGenerator\n"
+            "assert 'docx' not in sys.modules, 'batch'\n"
+            "assert 'ChartGenerator' in dir(src)\n"
+        )
+        root = Path(__file__).resolve().parents[2]
+        proc = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        with self.assertRaises(AttributeError):
+            import src
+            src.NoSuchThing
+
+
+class TestFontResolver(unittest.TestCase):
+    """中文字体解析缓存测试"""
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.tmp.name, "font.json")
+        self.font = os.path.join(self.tmp.name, "wqy-test.ttc")
+        Path(self.font).write_bytes(b"font")
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(fonts.configure_font, None)
+        patcher = mock.patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop("SMART_LAB_FONT", None)
+    
+    def test_discovery_is_cached(self):
+        """首次发现后写入缓存，之后不再探测；字体文件变化时重新发现"""
+        config = fonts.resolve_font(refresh=True, cache_path=self.cache, candidates=[self.font], search_dirs=[])
+        self.assertEqual((config.path, config.source), (self.font, "discovered"))
+        self.assertTrue(os.path.exists(self.cache))
+        
+        with mock.patch.object(fonts, "discover_font") as discover:
+            fonts.configure_font(None)  # 清空进程内结果
+            config = fonts.resolve_font(cache_path=self.cache, search_dirs=[])
+            discover.assert_not_called()
+        self.assertEqual((config.path, config.source), (self.font, "cache"))
+        
+        Path(self.font).write_bytes(b"changed font")
+        fonts.configure_font(None)
+        config = fonts.resolve_font(cache_path=self.cache, candidates=[], search_dirs=[])
+        self.assertEqual(config.source, "fallback")
+    
+    def test_explicit_and_env_override(self):
+        """显式指定优先于环境变量，环境变量优先于缓存"""
+        os.environ["SMART_LAB_FONT"] = "Noto Sans CJK SC"
+        fonts.configure_font(None)
+        self.assertEqual(fonts.resolve_font(cache_path=self.cache).source, "env")
+        config = fonts.configure_font(self.font)
+        self.assertEqual((config.path, config.source), (self.font, "explicit"))
+        self.assertIs(fonts.resolve_font(cache_path=self.cache), config)
+    
+    def test_negative_result_rechecked(self):
+        """未找到字体的结果：子目录中新装字体或超过有效期后重新发现"""
+        root = Path(self.tmp.name) / "fonts"
+        nested = root / "opentype" / "noto"
+        nested.mkdir(parents=True)
+        resolve = lambda: fonts.resolve_font(cache_path=self.cache, candidates=[], search_dirs=[str(root)])
+        self.assertEqual(fonts.resolve_font(refresh=True, cache_path=self.cache, candidates=[],
+                                            search_dirs=[str(root)]).source, "fallback")
+        
+        with mock.patch.object(fonts.time, "time", return_value=time.time() + fonts.NEGATIVE_TTL + 1), \
+                mock.patch.object(fonts, "discover_font", return_value=fonts.FontConfig()) as discover:
+            fonts.configure_font(None)
+            resolve()
+        discover.assert_called_once()
+        
+        font = nested / "NotoSansCJK-Regular.ttc"
+        font.write_bytes(b"font")
+        os.utime(nested, ns=(time.time_ns(), time.time_ns() + 10**9))
+        fonts.configure_font(None)
+        self.assertEqual(resolve().path, str(font))
+
+
+class TestReportDaemon(unittest.TestCase):
+    """常驻报告服务测试"""
+    
+    def test_submit_jobs(self):
+        """预热后通过套接字提交任务，返回输出路径；错误任务返回错误信息"""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        address = os.path.join(tmp.name, "d.sock")
+        client = DaemonClient(address, timeout=60)
+        with self.assertRaises(DaemonUnavailable):
+            client.stats()
+        
+        daemon = ReportDaemon(address, output_dir=tmp.name, quiet=True)
+        with mock.patch.dict(os.environ):
+            daemon.start()
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            data = Path(__file__).resolve().parents[2] / "data" / "examples" / "欧姆定律数据.csv"
+            result = client.submit({"data_path": str(data), "title": "欧姆", "output_format": "html"})
+            self.assertTrue(result["success"], result["error"])
+            self.assertEqual(result["output_files"], [os.path.join(tmp.name, "欧姆.html")])
+            self.assertTrue(os.path.exists(result["output_files"][0]))
+            
+            with self.assertRaises(DaemonError):
+                client.submit({"data_path": str(data), "colour": "red"})
+            self.assertEqual(client.stats()["jobs"], 1)
+            
+            # 没有令牌的请求被拒绝；输出路径不能离开允许的目录
+            self.assertTrue(os.path.exists(address + ".token"))
+            self.assertEqual(os.stat(address + ".token").st_mode & 0o777, 0o600)
+            self.assertFalse(send_request({"op": "shutdown"}, address, timeout=10)["ok"])
+            for job in ({"output_name": "../escape"}, {"output_dir": os.path.dirname(tmp.name)}):
+                with self.assertRaisesRegex(DaemonError, "output_"):
+                    client.submit({"data_path": str(data), "output_format": "html", **job})
+            # 标题中的路径不会让输出离开输出目录
+            result = client.submit({"data_path": str(data), "title": "../../escaped", "output_format": "md"})
+            self.assertTrue(result["success"], result["error"])
+            self.assertEqual(os.path.dirname(result["output_files"][0]), tmp.name)
+            self.assertFalse(os.path.exists(os.path.join(os.path.dirname(tmp.name), "escaped.md")))
+        finally:
+            client.shutdown()
+            thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(address))
+        self.assertFalse(os.path.exists(address + ".token"))
+
+
+class TestReportService(unittest.TestCase):
+    """HTTP 报告服务测试"""
+    
+    def request(self, path, data=None, method=None):
+        req = urllib.request.Request(self.base + path, data=data, method=method)
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, resp.read()
+    
+    def test_upload_job_events_and_cache(self):
+        """上传 → 提交 → SSE 进度 → 下载；相同提交命中缓存"""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        service = ReportService(port=0, workers=1, root=tmp.name, quiet=True)
+        thread = threading.Thread(target=service.run)
+        thread.start()
+        self.addCleanup(thread.join, 30)
+        self.addCleanup(service.stop)
+        self.assertTrue(service.ready.wait(30))
+        self.base = f"http://127.0.0.1:{service.port}"
+        
+        data = (Path(__file__).resolve().parents[2] / "data" / "examples" / "欧姆定律数据.csv").read_bytes()
+        status, body = self.request("/uploads?filename=ohm.csv", data)
+        self.assertEqual(status, 201)
+        upload_id = json.loads(body)["upload_id"]
+        
+        job = json.dumps({"upload_id": upload_id, "title": "欧姆/定律", "output_format": "html"}).encode()
+        status, body = self.request("/jobs", job)
+        self.assertEqual(status, 202)
+        job_id = json.loads(body)["job_id"]
+        
+        _, body = self.request(f"/jobs/{job_id}/events")
+        events = [json.loads(line[6:]) for line in body.decode("utf-8").splitlines() if line.startswith("data: ")]
+        self.assertEqual(events[-1]["status"], "succeeded", events[-1].get("error"))
+        self.assertEqual([f["name"] for f in events[-1]["files"]], ["欧姆_定律.html"])
+        
+        status, body = self.request("/jobs", job)
+        self.assertEqual((status, json.loads(body)["job_id"], json.loads(body)["cached"]), (200, job_id, True))
+        
+        status, body = self.request(events[-1]["files"][0]["url"].replace("欧姆_定律", "%E6%AC%A7%E5%A7%86_%E5%AE%9A%E5%BE%8B"))
+        self.assertIn("<html", body.decode("utf-8").lower())
+        
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self.request("/jobs", json.dumps({"upload_id": "../../etc/passwd"}).encode())
+        self.assertEqual(ctx.exception.code, 400)
+        
+        # 格式错误的请求体长度返回 400 而非 500
+        import socket
+        for headers in ("Transfer-Encoding: chunked\r\n\r\nzz\r\n", "Content-Length: -5\r\n\r\n",
+                        "Content-Length: abc\r\n\r\n"):
+            with socket.create_connection(("127.0.0.1", service.port), timeout=30) as sock:
+                sock.sendall(f"POST /jobs HTTP/1.1\r\nHost: x\r\n{headers}".encode())
+                reply = sock.makefile("rb").read()
+            self.assertTrue(reply.startswith(b"HTTP/1.1 400"), reply[:80])
+    
+    def test_disk_cleanup(self):
+        """淘汰任务时删除其输出目录；过期且未被引用的上传文件被删除"""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        service = ReportService(root=tmp.name, history=1, upload_ttl=60, quiet=True)
+        service.upload_dir.mkdir(parents=True)
+        uploads = {name: service.upload_dir / name for name in ("a" * 32 + ".csv", "b" * 32 + ".csv")}
+        for path in uploads.values():
+            path.write_text("x,y\n1,2\n")
+        
+        for i, name in enumerate(uploads):
+            job = service_module.Job(job_id=f"job{i}", kind="report", key=f"k{i}",
+                                     params={"upload_id": name}, status="succeeded")
+            (service.jobs_dir / job.job_id).mkdir(parents=True)
+            service.jobs[job.job_id] = job
+            service.by_key[job.key] = job.job_id
+        service._evict()
+        self.assertEqual(list(service.jobs), ["job1"])
+        self.assertFalse((service.jobs_dir / "job0").exists())
+        self.assertTrue((service.jobs_dir / "job1").exists())
+        
+        self.assertEqual(service.sweep_uploads(), 0)  # 未过期
+        self.assertEqual(service.sweep_uploads(now=time.time() + 120), 1)
+        self.assertEqual(sorted(p.name for p in service.upload_dir.iterdir()), ["b" * 32 + ".csv"])
+
+
 if __name__ == "__main__":
     unittest.main()